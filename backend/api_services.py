@@ -1,4 +1,31 @@
-import requests
+import copy
+import os
+from backend.ttl_cache import TTLCache, cache_dir
+from backend.http_client import http_client
+from backend.soil_grid_cache import soil_grid_cache
+from backend.geocode_cache import geocode_cache
+
+# Weather responses are shared by every session asking for the same location
+# (WEATHER_CACHE_TTL seconds, WEATHER_CACHE_SIZE locations, persisted in SQLite)
+weather_cache = TTLCache(
+    "weather",
+    ttl=float(os.environ.get("WEATHER_CACHE_TTL", 3600)),
+    max_entries=int(os.environ.get("WEATHER_CACHE_SIZE", 1024)),
+    db_path=os.path.join(cache_dir, "api_cache.sqlite3")
+)
+
+# The server's public IP rarely changes, so its location is only looked up occasionally
+ip_location_cache = TTLCache("ip_location", ttl=float(os.environ.get("IP_LOCATION_CACHE_TTL", 3600)), max_entries=1)
+
+
+def _normalize_location(location):
+    """Normalize a location string so equivalent spellings share a cache entry"""
+    return " ".join(str(location).split()).lower()
+
+
+# Used when the location cannot be determined
+DEFAULT_LOCATION = "New Delhi, India"
+
 
 def get_location_from_ip():
     """
@@ -6,33 +33,43 @@ def get_location_from_ip():
     Returns the user's city and country as a string.
     """
     try:
-        # Using ipinfo.io to get location data from IP
-        response = requests.get("https://ipinfo.io/json")
-        if response.status_code == 200:
-            data = response.json()
-            city = data.get("city", "Unknown")
-            region = data.get("region", "")
-            country = data.get("country", "")
-
-            # Construct location string
-            if city != "Unknown":
-                location = f"{city}, {country}"
-                return location
-            else:
-                return "New Delhi, India"  # Default fallback
-        else:
-            return "New Delhi, India"  # Default fallback
+        return ip_location_cache.get_or_fetch("ipinfo", _fetch_location_from_ip)
     except Exception:
-        return "New Delhi, India"  # Default fallback
+        # Not cached, so the next call tries ipinfo again instead of keeping the default for an hour
+        return DEFAULT_LOCATION
+
+
+def _fetch_location_from_ip():
+    # Using ipinfo.io to get location data from IP
+    response = http_client.get("ipinfo", "https://ipinfo.io/json")
+    if response.status_code != 200:
+        raise Exception(f"ipinfo error: {response.status_code}")
+    data = response.json()
+    city = data.get("city", "Unknown")
+    country = data.get("country", "")
+
+    # Construct location string
+    if city != "Unknown":
+        return f"{city}, {country}"
+    # ipinfo answered but has no city for this IP - that will not change, so it may be cached
+    return DEFAULT_LOCATION
 
 
 def get_visualcrossing_weather(location, api_key):
     """
     Fetch weather data for given location (lat,lon or city name) from Visual Crossing API.
     Returns temperature (°C), rainfall (mm), and humidity (%) for today and forecast.
+    Responses are cached per location for WEATHER_CACHE_TTL seconds.
     """
+    weather_info = weather_cache.get_or_fetch(_normalize_location(location),
+                                              lambda: _fetch_visualcrossing_weather(location))
+    # Sessions keep the dict in their state - hand each one its own copy
+    return copy.deepcopy(weather_info)
+
+
+def _fetch_visualcrossing_weather(location):
     url = f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{location}?unitGroup=metric&key=YTZ9ZL9DDNTZCPM6D8T77WGTL&contentType=json"
-    response = requests.get(url)
+    response = http_client.get("visualcrossing", url)
     if response.status_code == 200:
         data = response.json()
         today = data['days'][0]  # today's weather
@@ -74,13 +111,22 @@ def get_soil_data(lat, lon):
     """
     Fetch soil data from the updated SoilGrids REST API v2.0.
     Returns pH, organic carbon, clay, sand, and silt from topsoil layer (0-5cm).
+    Results are cached per grid cell, so nearby points are served locally.
+    """
+    return soil_grid_cache.get_or_fetch(lat, lon, fetch_soil_data)
+
+
+def fetch_soil_data(lat, lon):
+    """
+    Query SoilGrids for a single point, bypassing the grid cache.
+    Returns the same dict as get_soil_data.
     """
     url = (
         f"https://rest.isric.org/soilgrids/v2.0/properties/query?"
         f"lon={lon}&lat={lat}&property=phh2o&property=ocd&property=clay&property=sand&property=silt&depth=0-5cm"
     )
 
-    response = requests.get(url)
+    response = http_client.get("soilgrids", url)
     if response.status_code == 200:
         data = response.json()
         props = data.get("properties", {})
@@ -107,26 +153,37 @@ def geocode_location(place_name):
     """
     Convert a place name into latitude and longitude coordinates.
     Returns a tuple of (latitude, longitude) or None if geocoding fails.
+    Known places are answered from the local geocode cache; Nominatim is
+    only asked about places never seen before.
     """
     try:
-        # Using the free Nominatim geocoding service by OpenStreetMap
-        url = f"https://nominatim.openstreetmap.org/search?q={place_name}&format=json&limit=1"
-        headers = {'User-Agent': 'PlantX Climate Risk App'}
-
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            if data and len(data) > 0:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                return (lat, lon)
-            else:
-                return None
-        else:
-            return None
+        return geocode_cache.get_or_fetch(place_name, fetch_geocode)
     except Exception:
         return None
 
+
+def fetch_geocode(place_name):
+    """
+    Ask Nominatim for the coordinates of a place, bypassing the cache.
+    Returns (latitude, longitude), or None if Nominatim does not know the place.
+    Raises an exception if the service could not be queried.
+    """
+    # Using the free Nominatim geocoding service by OpenStreetMap
+    url = f"https://nominatim.openstreetmap.org/search?q={place_name}&format=json&limit=1"
+    headers = {'User-Agent': 'PlantX Climate Risk App'}
+
+    response = http_client.get("nominatim", url, headers=headers)
+    if response.status_code == 200:
+        data = response.json()
+        if data and len(data) > 0:
+            lat = float(data[0]['lat'])
+            lon = float(data[0]['lon'])
+            return (lat, lon)
+        else:
+            return None
+    else:
+        raise Exception(f"Nominatim API error: {response.status_code} - {response.text}")
+
 # For troubleshooting import issues
 if __name__ == "__main__":
     print("API services module loaded successfully")
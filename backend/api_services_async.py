@@ -0,0 +1,114 @@
+"""
+asyncio versions of the external API helpers in api_services.
+
+Every call runs the synchronous helper on a dedicated thread pool, so the
+async functions return exactly the same shapes and share the same pooled
+HTTP client, retries, circuit breakers and caches. Concurrency is capped
+per upstream with semaphores.
+"""
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import api_services
+
+# Maximum concurrent calls per upstream (Nominatim's usage policy allows one at a time)
+CONCURRENCY_LIMITS = {
+    "visualcrossing": 8,
+    "soilgrids": 4,
+    "nominatim": 1,
+}
+
+_executor = ThreadPoolExecutor(max_workers=sum(CONCURRENCY_LIMITS.values()), thread_name_prefix="api-async")
+
+# Semaphores belong to one event loop, so they are created per running loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore(upstream):
+    loop = asyncio.get_running_loop()
+    per_loop = _semaphores.get(loop)
+    if per_loop is None:
+        per_loop = {name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY_LIMITS.items()}
+        _semaphores[loop] = per_loop
+    return per_loop[upstream]
+
+
+async def _call(upstream, func, *args):
+    async with _semaphore(upstream):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+
+
+async def get_visualcrossing_weather_async(location, api_key=None):
+    """Async version of get_visualcrossing_weather (same return value)"""
+    return await _call("visualcrossing", api_services.get_visualcrossing_weather, location, api_key)
+
+
+async def get_soil_data_async(lat, lon):
+    """Async version of get_soil_data (same return value)"""
+    return await _call("soilgrids", api_services.get_soil_data, lat, lon)
+
+
+async def geocode_location_async(place_name):
+    """Async version of geocode_location (same return value)"""
+    return await _call("nominatim", api_services.geocode_location, place_name)
+
+
+async def _fetch_one(location, include_weather, include_soil):
+    result = {"location": location, "coordinates": None, "weather": None, "soil": None, "errors": {}}
+
+    if isinstance(location, (tuple, list)):
+        result["coordinates"] = (float(location[0]), float(location[1]))
+    elif include_soil:
+        result["coordinates"] = await geocode_location_async(location)
+        if result["coordinates"] is None:
+            result["errors"]["geocode"] = f"Could not geocode '{location}'"
+
+    tasks = {}
+    if include_weather:
+        # Visual Crossing accepts both "lat,lon" and place names
+        query = f"{result['coordinates'][0]},{result['coordinates'][1]}" if result["coordinates"] else location
+        tasks["weather"] = get_visualcrossing_weather_async(query)
+    if include_soil and result["coordinates"] is not None:
+        tasks["soil"] = get_soil_data_async(*result["coordinates"])
+
+    values = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    for key, value in zip(tasks, values):
+        if isinstance(value, Exception):
+            result["errors"][key] = str(value)
+        else:
+            result[key] = value
+    return result
+
+
+async def fetch_locations(locations, include_weather=True, include_soil=True):
+    """
+    Fetch weather and soil data for many locations concurrently
+
+    Args:
+        locations: Place names or (lat, lon) pairs. Place names are geocoded
+            first when soil data is requested.
+        include_weather: Fetch Visual Crossing weather
+        include_soil: Fetch SoilGrids topsoil properties
+
+    Yields:
+        dict: location, coordinates, weather, soil and per-source errors,
+        in the order the lookups complete
+    """
+    tasks = [asyncio.ensure_future(_fetch_one(location, include_weather, include_soil)) for location in locations]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# For troubleshooting import issues
+if __name__ == "__main__":
+    async def _demo():
+        async for item in fetch_locations(["New Delhi, India", (12.9716, 77.5946)]):
+            print(item)
+
+    asyncio.run(_demo())
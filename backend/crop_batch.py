@@ -0,0 +1,225 @@
+"""
+Batch crop recommendation over CSV or Parquet files of soil samples.
+
+Usage:
+    python -m backend.crop_batch samples.csv recommendations.csv --workers 8 --top-k 3
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.model_registry import model_registry
+
+# Feature order expected by the crop recommendation model
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+# Alternative column names agronomists commonly use
+COLUMN_ALIASES = {
+    "nitrogen": "N",
+    "phosphorus": "P",
+    "potassium": "K",
+    "temp": "temperature",
+    "soil_ph": "ph",
+    "rain": "rainfall",
+}
+
+# Model instance of a worker process
+_worker_model = None
+
+
+def resolve_feature_columns(columns):
+    """
+    Map the columns of an input file onto the model's feature names
+
+    Returns:
+        dict: Model feature name -> column name in the file
+
+    Raises:
+        ValueError: If a feature column is missing
+    """
+    lookup = {}
+    for column in columns:
+        key = str(column).strip()
+        lookup.setdefault(key.lower(), column)
+        alias = COLUMN_ALIASES.get(key.lower())
+        if alias is not None:
+            lookup.setdefault(alias.lower(), column)
+
+    mapping = {}
+    missing = []
+    for feature in FEATURE_COLUMNS:
+        column = lookup.get(feature.lower())
+        if column is None:
+            missing.append(feature)
+        else:
+            mapping[feature] = column
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    return mapping
+
+
+def iter_sample_chunks(input_path, chunksize=50000):
+    """
+    Read a CSV or Parquet file in chunks of at most chunksize rows
+
+    Yields:
+        pandas.DataFrame: One chunk of samples
+    """
+    if input_path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            yield chunk
+
+
+def _init_worker():
+    global _worker_model
+    _worker_model = model_registry.get("crop_recommendation")
+    # Parallelism comes from the process pool - keep each worker single-threaded
+    if hasattr(_worker_model, "n_jobs"):
+        _worker_model.n_jobs = 1
+
+
+def score_features(model, features, top_k=3):
+    """
+    Score a block of samples with one vectorized predict_proba call
+
+    Args:
+        model: Fitted classifier with predict_proba and classes_
+        features: float array of shape (n_samples, 7) in FEATURE_COLUMNS order
+        top_k: Number of most likely crops to return per sample
+
+    Returns:
+        tuple: (top_k labels of shape (n, k), top_k probabilities of shape (n, k))
+    """
+    probabilities = model.predict_proba(features)
+    # Stable sort so ties resolve to the lowest class index, exactly like model.predict
+    best = np.argsort(-probabilities, axis=1, kind="stable")[:, :top_k]
+    best_probabilities = np.take_along_axis(probabilities, best, axis=1)
+    return np.asarray(model.classes_)[best], best_probabilities
+
+
+def _score_block(features, top_k):
+    return score_features(_worker_model, features, top_k)
+
+
+def _format_output(chunk, labels, probabilities):
+    result = chunk.copy()
+    result["recommended_crop"] = labels[:, 0]
+    for rank in range(labels.shape[1]):
+        result[f"crop_{rank + 1}"] = labels[:, rank]
+        result[f"probability_{rank + 1}"] = probabilities[:, rank]
+    return result
+
+
+class _OutputWriter:
+    """Append scored chunks to a CSV or Parquet file as they arrive"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.parquet = output_path.lower().endswith((".parquet", ".pq"))
+        self._writer = None
+        self._header_written = False
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.output_path, mode="a" if self._header_written else "w",
+                         header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def recommend_crops_batch(input_path, output_path, chunksize=50000, workers=None, top_k=3, progress=True):
+    """
+    Score every sample of a CSV/Parquet file and stream the recommendations to disk
+
+    Chunks are scored in a process pool; at most 2 * workers chunks are in flight
+    so memory stays bounded regardless of the file size, and results are written
+    in input order.
+
+    Args:
+        input_path: CSV or Parquet file with N, P, K, temperature, humidity, ph, rainfall columns
+        output_path: CSV or Parquet file to write (input columns + recommendations)
+        chunksize: Rows per chunk
+        workers: Number of worker processes (defaults to the CPU count)
+        top_k: Number of crops and probabilities to report per sample
+        progress: Print throughput after every chunk
+
+    Returns:
+        dict: Number of rows scored and elapsed time
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = _OutputWriter(output_path)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+    feature_map = None
+
+    def drain_one():
+        nonlocal rows
+        chunk, future = pending.popleft()
+        labels, probabilities = future.result()
+        writer.write(_format_output(chunk, labels, probabilities))
+        rows += len(chunk)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"Scored {rows} samples ({rows / max(elapsed, 1e-9):.0f} samples/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            for chunk in iter_sample_chunks(input_path, chunksize):
+                if feature_map is None:
+                    feature_map = resolve_feature_columns(chunk.columns)
+                features = chunk[[feature_map[f] for f in FEATURE_COLUMNS]].to_numpy(dtype=np.float64)
+                pending.append((chunk, executor.submit(_score_block, features, top_k)))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    return {"rows": rows, "seconds": time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch crop recommendation for CSV/Parquet soil samples")
+    parser.add_argument("input", help="CSV or Parquet file of soil samples")
+    parser.add_argument("output", help="CSV or Parquet file to write recommendations to")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--top-k", type=int, default=3, help="Crops to report per sample (default: 3)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress")
+    args = parser.parse_args(argv)
+
+    summary = recommend_crops_batch(args.input, args.output, chunksize=args.chunksize,
+                                    workers=args.workers, top_k=args.top_k, progress=not args.quiet)
+    print(f"Done: {summary['rows']} samples in {summary['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
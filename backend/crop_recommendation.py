@@ -0,0 +1,115 @@
+"""
+Memoized crop recommendation.
+
+Most users submit the Crop Recommendation form with its defaults or small
+tweaks. Inputs are snapped to the precision of the form's widgets (whole
+mg/kg for N, P and K, 0.1 for temperature and pH, 1 % humidity, 10 mm
+rainfall), so equivalent submissions share one entry in a bounded LRU and
+repeat queries skip the model. Each result lists the top-k crops from
+predict_proba.
+
+CROP_CACHE_SIZE sets the number of entries kept (default 4096).
+"""
+import os
+
+import numpy as np
+
+from backend.crop_batch import FEATURE_COLUMNS, score_features
+from backend.model_registry import model_registry
+from backend.ttl_cache import TTLCache
+
+# Step of each input on the Crop Recommendation page (number_input / slider step)
+INPUT_STEPS = {
+    "N": 1,
+    "P": 1,
+    "K": 1,
+    "temperature": 0.1,
+    "humidity": 1.0,
+    "ph": 0.1,
+    "rainfall": 10.0,
+}
+
+
+def normalize_inputs(params):
+    """
+    Snap inputs to the widget steps
+
+    Args:
+        params: dict with N, P, K, temperature, humidity, ph and rainfall
+
+    Returns:
+        tuple: Values in FEATURE_COLUMNS order, rounded to the nearest step
+
+    Raises:
+        ValueError: If a value is missing or not a number
+    """
+    missing = [feature for feature in FEATURE_COLUMNS if feature not in params]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    values = []
+    for feature in FEATURE_COLUMNS:
+        value = float(params[feature])
+        if not np.isfinite(value):
+            raise ValueError(f"{feature} must be a finite number")
+        step = INPUT_STEPS[feature]
+        if isinstance(step, int):
+            values.append(int(round(value / step)) * step)
+        else:
+            # round() again so 0.1 steps give 6.5 rather than 6.500000000000001
+            values.append(round(round(value / step) * step, 6))
+    return tuple(values)
+
+
+class CropRecommender:
+    def __init__(self, model_name="crop_recommendation", max_entries=4096):
+        """
+        Args:
+            model_name: Registry name of the crop classifier
+            max_entries: Number of distinct (normalized) queries remembered
+        """
+        self.model_name = model_name
+        # Entries never go stale on their own; a retrained model changes the key instead
+        self.cache = TTLCache("crop_recommendations", ttl=float("inf"), max_entries=max_entries)
+
+    def recommend(self, params, top_k=3):
+        """
+        Recommend crops for one set of soil and climate values
+
+        Args:
+            params: dict with N, P, K, temperature, humidity, ph and rainfall
+            top_k: Number of most likely crops to return
+
+        Returns:
+            dict: success, crop (the most likely one, as the model names it),
+            top_k (list of crop and probability) and the normalized inputs
+        """
+        features = normalize_inputs(params)
+        top_k = max(1, int(top_k))
+        # Also makes sure the model is loaded, so its hash is known
+        model = model_registry.get(self.model_name)
+        version = model_registry.stats()[self.model_name]["sha256"]
+        key = f"{version}:{top_k}:{','.join(map(str, features))}"
+
+        def fetch():
+            labels, probabilities = score_features(model, np.array([features], dtype=np.float64), top_k)
+            return [{"crop": str(label), "probability": float(p)} for label, p in zip(labels[0], probabilities[0])]
+
+        ranked = self.cache.get_or_fetch(key, fetch)
+        return {
+            "success": True,
+            "crop": ranked[0]["crop"],
+            "top_k": [dict(entry) for entry in ranked],
+            "inputs": dict(zip(FEATURE_COLUMNS, features)),
+        }
+
+    def stats(self):
+        """
+        Returns:
+            dict: Cache hits, misses, hit rate and entries
+        """
+        return self.cache.stats()
+
+
+# Create a singleton shared by every session in the process
+crop_recommender = CropRecommender(max_entries=int(os.environ.get("CROP_CACHE_SIZE", 4096)))
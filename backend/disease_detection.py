@@ -1,8 +1,19 @@
-import torch
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 from PIL import Image
+import numpy as np
 import os
 import io
+import json
+import threading
+from concurrent.futures import Future
+from backend.image_preprocessing import ImagePreprocessor
+from backend.result_cache import ResultCache, read_image_bytes, file_version, result_cache_settings
+from backend.inference_threads import configure_torch_threads
+from backend import disease_model_bundle
+
+MODEL_NAME = "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification"
+
+# torch and transformers are imported when the model is loaded, not with this module,
+# so pages and tools that never run the model start without them
 
 # Cache directory for the model
 cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "disease_model_cache")
@@ -10,34 +21,254 @@ cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file_
 # Ensure cache directory exists
 os.makedirs(cache_dir, exist_ok=True)
 
+# Inference backend: "torch" (default), "onnx" (ONNX Runtime, export with backend/export_disease_onnx.py)
+# or "onnx_int8" (int8-quantized ONNX model, build with backend/quantize_disease_model.py)
+MODEL_BACKEND = os.environ.get("DISEASE_MODEL_BACKEND", "torch")
+onnx_model_path = os.environ.get(
+    "DISEASE_ONNX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "disease_model.onnx")
+)
+onnx_int8_model_path = os.environ.get(
+    "DISEASE_ONNX_INT8_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "disease_model.int8.onnx")
+)
+# ONNX Runtime intra-op threads (0 lets ONNX Runtime use one per physical core)
+ONNX_THREADS = int(os.environ.get("DISEASE_ONNX_THREADS", 0))
+# Preprocess with backend/image_preprocessing.py instead of the Hugging Face processor (set to 0 to disable)
+FAST_PREPROCESS = os.environ.get("DISEASE_FAST_PREPROCESS", "1") != "0"
+
+
+def onnx_labels_path(model_path):
+    """Labels are stored next to the exported model (disease_model.onnx -> disease_model.labels.json)"""
+    return os.path.splitext(model_path)[0] + ".labels.json"
+
+
+def onnx_preprocessor_path(model_path):
+    """The image processor config is stored next to the exported model (disease_model.preprocessor.json)"""
+    return os.path.splitext(model_path)[0] + ".preprocessor.json"
+
+
+def load_onnx_preprocessor(model_path):
+    """
+    Preprocessor for an exported ONNX model, built without transformers or torch
+
+    Reads the processor config saved next to the model, or the local bundle's.
+
+    Returns:
+        ImagePreprocessor or None: None if neither config exists
+    """
+    for config_path in (onnx_preprocessor_path(model_path),
+                        os.path.join(disease_model_bundle.bundle_dir, "preprocessor_config.json")):
+        if os.path.exists(config_path):
+            return ImagePreprocessor.from_config(config_path)
+    return None
+
+
+def load_processor():
+    """The Hugging Face image processor, from the local bundle if there is one"""
+    if disease_model_bundle.has_bundle():
+        return disease_model_bundle.load_processor()
+    from transformers import AutoImageProcessor
+    return AutoImageProcessor.from_pretrained(MODEL_NAME, cache_dir=cache_dir)
+
+
+class TorchBackend:
+    """Runs the Hugging Face PyTorch model"""
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+
+    def probabilities(self, pixel_values):
+        """Class probabilities for a float32 batch of shape (N, 3, H, W)"""
+        import torch
+
+        with torch.no_grad():
+            outputs = self.model(pixel_values=torch.from_numpy(pixel_values))
+        return torch.nn.functional.softmax(outputs.logits, dim=-1).numpy()
+
+
+class OnnxBackend:
+    """Runs the exported model on ONNX Runtime's CPU execution provider"""
+    name = "onnx"
+
+    def __init__(self, model_path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        # One graph at a time - parallelism comes from intra-op threads and the request scheduler
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def probabilities(self, pixel_values):
+        """Class probabilities for a float32 batch of shape (N, 3, H, W)"""
+        logits = self.session.run(None, {self.input_name: pixel_values})[0]
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+
 class PlantDiseaseDetector:
-    def __init__(self):
+    def __init__(self, backend=None, result_cache=None):
         self.model = None
         self.processor = None
         self.labels = None
+        self.backend_name = backend or MODEL_BACKEND
+        self.backend = None
+        self.preprocessor = None
+        self.model_version = None
+        self.result_cache = result_cache
         self.initialized = False
+        self._load_lock = threading.Lock()
+        self._loading = None
 
     def load_model(self):
-        """Load the model only when needed to save memory"""
-        if not self.initialized:
-            try:
-                print("Loading plant disease detection model...")
-                self.processor = AutoImageProcessor.from_pretrained(
-                    "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification",
-                    cache_dir=cache_dir
-                )
-                self.model = AutoModelForImageClassification.from_pretrained(
-                    "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification",
-                    cache_dir=cache_dir
-                )
-                self.labels = self.model.config.id2label
-                self.initialized = True
-                print("Model loaded successfully.")
-                return True
-            except Exception as e:
-                print(f"Error loading model: {str(e)}")
-                return False
-        return True
+        """
+        Load the model only when needed to save memory
+
+        Safe to call from many threads: one caller loads the model while the
+        others wait for its outcome instead of loading their own copy.
+        """
+        if self.initialized:
+            return True
+
+        with self._load_lock:
+            future = self._loading
+            leader = future is None
+            if leader:
+                future = Future()
+                self._loading = future
+        if not leader:
+            return future.result()
+
+        try:
+            loaded = self._load()
+            future.set_result(loaded)
+            return loaded
+        finally:
+            with self._load_lock:
+                self._loading = None
+
+    def _load(self):
+        # A previous leader may have finished between our check and taking the lead
+        if self.initialized:
+            return True
+        try:
+            print(f"Loading plant disease detection model ({self.backend_name} backend)...")
+            model = None
+            processor = None
+            preprocessor = None
+            # A local bundle (backend/disease_model_bundle.py) needs no network and memory-maps the weights
+            use_bundle = disease_model_bundle.has_bundle()
+            if self.backend_name in ("onnx", "onnx_int8"):
+                model_path = onnx_int8_model_path if self.backend_name == "onnx_int8" else onnx_model_path
+                # The ONNX backend never needs transformers or torch: the processor
+                # settings come from the config saved with the export or in the bundle
+                preprocessor = load_onnx_preprocessor(model_path) if FAST_PREPROCESS else None
+                if preprocessor is None:
+                    processor = load_processor()
+                    preprocessor = ImagePreprocessor.from_processor(processor) if FAST_PREPROCESS else None
+                backend = OnnxBackend(model_path, ONNX_THREADS)
+                with open(onnx_labels_path(model_path)) as f:
+                    labels = {int(k): v for k, v in json.load(f).items()}
+                weights_version = file_version(model_path)
+            elif self.backend_name == "torch":
+                from transformers import AutoModelForImageClassification
+
+                processor = load_processor()
+                preprocessor = ImagePreprocessor.from_processor(processor) if FAST_PREPROCESS else None
+                configure_torch_threads()
+                if use_bundle:
+                    model = disease_model_bundle.load_model()
+                    weights_version = file_version(
+                        os.path.join(disease_model_bundle.bundle_dir, disease_model_bundle.WEIGHTS_NAME))
+                else:
+                    model = AutoModelForImageClassification.from_pretrained(MODEL_NAME, cache_dir=cache_dir)
+                    model.eval()
+                    weights_version = getattr(model.config, "_commit_hash", None) or "hub"
+                backend = TorchBackend(model)
+                labels = model.config.id2label
+            else:
+                raise ValueError(f"Unknown disease model backend: {self.backend_name}")
+
+            # Publish everything before flagging the detector as ready, so no
+            # caller ever sees a half-initialized detector
+            self.model = model
+            self.processor = processor
+            self.preprocessor = preprocessor
+            self.backend = backend
+            self.labels = labels
+            # Part of the result cache key: results change with the weights, backend and preprocessing
+            self.model_version = (f"{MODEL_NAME}:{self.backend_name}:{weights_version}:"
+                                  f"{('fast-draft' if preprocessor.draft else 'fast-exact') if preprocessor is not None else 'processor'}")
+            self.initialized = True
+            print("Model loaded successfully.")
+            return True
+        except Exception as e:
+            print(f"Error loading model: {str(e)}")
+            return False
+
+    def _open_image(self, image_path_or_bytes):
+        """Open a PIL image, path, file-like object or raw bytes as an RGB PIL image"""
+        # Check if input is an already decoded image, a file path, bytes stream, or raw bytes
+        if isinstance(image_path_or_bytes, Image.Image):
+            return image_path_or_bytes.convert("RGB")
+        elif isinstance(image_path_or_bytes, str):
+            # Handle path string
+            return Image.open(image_path_or_bytes).convert("RGB")
+        elif hasattr(image_path_or_bytes, 'read'):
+            # Handle BytesIO or file-like object
+            return Image.open(image_path_or_bytes).convert("RGB")
+        else:
+            # This is a fallback that shouldn't be needed now that we're passing BytesIO objects
+            return Image.open(io.BytesIO(image_path_or_bytes)).convert("RGB")
+
+    def _format_predictions(self, probabilities):
+        """Turn the class probabilities of one image into the top 3 result list"""
+        # Get top 3 predictions (stable sort so ties keep label order on every backend)
+        top_3_indices = np.argsort(-probabilities, kind="stable")[:3]
+
+        # Format results
+        results = []
+        for idx in top_3_indices:
+            idx = int(idx)
+            # Extract disease name and clean it up
+            disease_name = self.labels[idx]
+            # Remove plant name prefix if present (e.g., "Tomato_Late_blight" -> "Late blight")
+            if "_" in disease_name:
+                parts = disease_name.split("_")
+                plant_name = parts[0]
+                # Rejoin the rest with spaces
+                disease_part = " ".join([p.capitalize() for p in parts[1:]])
+                formatted_name = f"{plant_name} - {disease_part}"
+            else:
+                formatted_name = disease_name.replace("_", " ")
+
+            results.append({
+                "disease": formatted_name,
+                "confidence": float(probabilities[idx]) * 100  # Convert to percentage
+            })
+        return results
+
+    def predict_pixels(self, pixel_values):
+        """
+        Run already preprocessed images through the model
+
+        Args:
+            pixel_values: float32 array of shape (N, 3, H, W)
+
+        Returns:
+            list: One result dict per image, in the same format as detect_disease
+        """
+        # Get predicted class probabilities from the configured backend
+        probabilities = self.backend.probabilities(pixel_values)
+        return [
+            {"success": True, "predictions": self._format_predictions(row)}
+            for row in probabilities
+        ]
 
     def detect_disease(self, image_path_or_bytes):
         """
@@ -52,62 +283,63 @@ class PlantDiseaseDetector:
         if not self.load_model():
             return {"error": "Failed to load model"}
 
-        try:
-            # Check if input is a file path, bytes stream, or raw bytes
-            if isinstance(image_path_or_bytes, str):
-                # Handle path string
-                image = Image.open(image_path_or_bytes).convert("RGB")
-            elif hasattr(image_path_or_bytes, 'read'):
-                # Handle BytesIO or file-like object
-                image = Image.open(image_path_or_bytes).convert("RGB")
-            else:
-                # This is a fallback that shouldn't be needed now that we're passing BytesIO objects
-                image = Image.open(io.BytesIO(image_path_or_bytes)).convert("RGB")
-
-            # Preprocess image
-            inputs = self.processor(images=image, return_tensors="pt")
-
-            # Make prediction
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-
-            # Get predicted class probabilities
-            probabilities = torch.nn.functional.softmax(outputs.logits, dim=-1)[0]
-
-            # Get top 3 predictions
-            top_3_indices = torch.topk(probabilities, 3).indices
-
-            # Format results
-            results = []
-            for idx in top_3_indices:
-                idx = idx.item()
-                # Extract disease name and clean it up
-                disease_name = self.labels[idx]
-                # Remove plant name prefix if present (e.g., "Tomato_Late_blight" -> "Late blight")
-                if "_" in disease_name:
-                    parts = disease_name.split("_")
-                    plant_name = parts[0]
-                    # Rejoin the rest with spaces
-                    disease_part = " ".join([p.capitalize() for p in parts[1:]])
-                    formatted_name = f"{plant_name} - {disease_part}"
+        return self.detect_disease_batch([image_path_or_bytes])[0]
+
+    def detect_disease_batch(self, images):
+        """
+        Detect plant diseases for several images with a single forward pass
+
+        Args:
+            images: List of image paths, file-like objects or bytes
+
+        Returns:
+            list: One result dict per image, in the same format as detect_disease
+        """
+        if not self.load_model():
+            return [{"error": "Failed to load model"} for _ in images]
+
+        # Decode every image; a broken upload only fails its own result
+        results = [None] * len(images)
+        cache_keys = [None] * len(images)
+        decoded = []
+        for i, image_path_or_bytes in enumerate(images):
+            try:
+                # Images seen before under the same model are answered without decoding
+                if self.result_cache is not None:
+                    data = read_image_bytes(image_path_or_bytes)
+                    if data is not None:
+                        cache_keys[i] = self.result_cache.key_for(data, self.model_version)
+                        cached = self.result_cache.get(cache_keys[i])
+                        if cached is not None:
+                            results[i] = cached
+                            continue
+                        if not isinstance(image_path_or_bytes, str):
+                            image_path_or_bytes = io.BytesIO(data)
+                if self.preprocessor is not None:
+                    decoded.append((i, self.preprocessor.decode(image_path_or_bytes)))
                 else:
-                    formatted_name = disease_name.replace("_", " ")
+                    decoded.append((i, self._open_image(image_path_or_bytes)))
+            except Exception as e:
+                results[i] = {"success": False, "error": str(e)}
 
-                results.append({
-                    "disease": formatted_name,
-                    "confidence": float(probabilities[idx].item()) * 100  # Convert to percentage
-                })
+        if decoded:
+            try:
+                # Preprocess all images into one batch
+                if self.preprocessor is not None:
+                    pixel_values = self.preprocessor.to_batch([image for _, image in decoded])
+                else:
+                    inputs = self.processor(images=[image for _, image in decoded], return_tensors="np")
+                    pixel_values = np.ascontiguousarray(inputs["pixel_values"], dtype=np.float32)
 
-            return {
-                "success": True,
-                "predictions": results
-            }
+                for (i, _), result in zip(decoded, self.predict_pixels(pixel_values)):
+                    results[i] = result
+                    if cache_keys[i] is not None:
+                        self.result_cache.put(cache_keys[i], results[i])
+            except Exception as e:
+                for i, _ in decoded:
+                    results[i] = {"success": False, "error": str(e)}
 
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        return results
 
     def get_treatment_info(self, disease_name):
         """
@@ -156,5 +388,17 @@ class PlantDiseaseDetector:
                 "treatment_info": treatments["Generic"]
             }
 
-# Create a singleton instance
-disease_detector = PlantDiseaseDetector()
+# Create a singleton instance with a result cache
+# (sized with DISEASE_CACHE_MEMORY_MB and DISEASE_CACHE_DISK_MB, disk tier off by default)
+disease_detector = PlantDiseaseDetector(
+    result_cache=ResultCache("disease_results", **result_cache_settings("DISEASE"))
+)
+
+# Cheaper int8 model the request scheduler falls back to under load (shares the result cache,
+# whose keys include the model version)
+quantized_disease_detector = PlantDiseaseDetector(backend="onnx_int8", result_cache=disease_detector.result_cache)
+
+
+def quantized_model_available():
+    """Whether an int8 model has been built that is not already the detector's own model"""
+    return MODEL_BACKEND != "onnx_int8" and os.path.exists(onnx_int8_model_path)
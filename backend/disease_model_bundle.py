@@ -0,0 +1,205 @@
+"""
+Self-contained local bundle of the plant disease model.
+
+The bundle holds the image processor config, the model config and the
+weights as model.safetensors, plus a manifest. Loading from it never
+touches the network, and the weights are memory-mapped straight from the
+file: parameters point into a read-only mapping of model.safetensors, so
+every worker process on a node shares the same physical pages.
+
+Create it once (needs network access or a filled Hugging Face cache):
+    python -m backend.disease_model_bundle
+    python -m backend.disease_model_bundle --output /srv/plantx/disease_bundle
+
+The detector uses the bundle automatically when it exists.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MANIFEST_NAME = "bundle.json"
+WEIGHTS_NAME = "model.safetensors"
+
+bundle_dir = os.environ.get(
+    "DISEASE_MODEL_BUNDLE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "disease_model_bundle")
+)
+
+# safetensors dtype names -> torch dtype attribute names
+_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def has_bundle(path=bundle_dir):
+    return os.path.exists(os.path.join(path, MANIFEST_NAME))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_bundle(output_dir=bundle_dir, source=None, cache_dir=None):
+    """
+    Snapshot the processor and model into a local directory
+
+    The bundle is written to a temporary directory first and moved into
+    place at the end, so a running app never sees a half-written bundle.
+
+    Args:
+        output_dir: Bundle directory to create (replaced if it exists)
+        source: Hugging Face model id or local directory (defaults to the app's model)
+        cache_dir: Hugging Face cache to download into
+
+    Returns:
+        dict: The bundle manifest
+    """
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+    from backend.disease_detection import MODEL_NAME, cache_dir as default_cache_dir
+
+    source = source or MODEL_NAME
+    cache_dir = cache_dir or default_cache_dir
+    staging_dir = output_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    processor = AutoImageProcessor.from_pretrained(source, cache_dir=cache_dir)
+    model = AutoModelForImageClassification.from_pretrained(source, cache_dir=cache_dir)
+    processor.save_pretrained(staging_dir)
+    model.save_pretrained(staging_dir, safe_serialization=True)
+
+    files = {}
+    for name in sorted(os.listdir(staging_dir)):
+        path = os.path.join(staging_dir, name)
+        files[name] = {"size": os.path.getsize(path), "sha256": _sha256(path)}
+    manifest = {
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files,
+    }
+    with open(os.path.join(staging_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(staging_dir, output_dir)
+    print(f"Wrote model bundle to {output_dir}")
+    return manifest
+
+
+def load_safetensors_mmap(path):
+    """
+    Return a state dict whose tensors are views into a memory mapping of a safetensors file
+
+    The mapping is private and read-only in practice, so the pages stay
+    shared between processes unless a weight is modified.
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data_start = 8 + header_size
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    file_bytes = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        raw = file_bytes[data_start + begin:data_start + end]
+        if (data_start + begin) % torch.empty(0, dtype=dtype).element_size():
+            # Misaligned for its dtype - copy it (only ever tiny buffers in practice)
+            raw = raw.clone()
+        state_dict[name] = raw.view(dtype).reshape(info["shape"])
+    return state_dict
+
+
+def load_processor(path=bundle_dir):
+    from transformers import AutoImageProcessor
+    return AutoImageProcessor.from_pretrained(path, local_files_only=True)
+
+
+def load_model(path=bundle_dir):
+    """
+    Build the model from the bundle's config with memory-mapped weights
+
+    Returns:
+        The model in eval mode, without any network access
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForImageClassification
+
+    config = AutoConfig.from_pretrained(path, local_files_only=True)
+    # Build on the meta device so no memory is allocated for weights that are replaced anyway
+    with torch.device("meta"):
+        model = AutoModelForImageClassification.from_config(config)
+    state_dict = load_safetensors_mmap(os.path.join(path, WEIGHTS_NAME))
+    model.load_state_dict(state_dict, strict=True, assign=True)
+
+    left_on_meta = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+                    if tensor.is_meta]
+    if left_on_meta:
+        # Weights the file does not hold (e.g. non-persistent buffers) - let transformers build it
+        print(f"Bundle does not cover {left_on_meta[:3]}, loading it without memory mapping")
+        model = AutoModelForImageClassification.from_pretrained(path, local_files_only=True)
+    return model.eval()
+
+
+def verify_bundle(path=bundle_dir):
+    """
+    Check the bundle's files against its manifest and run one forward pass
+
+    Returns:
+        dict: Whether every file matched and the output shape of the test pass
+    """
+    import torch
+
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    mismatched = [name for name, info in manifest["files"].items()
+                  if _sha256(os.path.join(path, name)) != info["sha256"]]
+
+    processor = load_processor(path)
+    model = load_model(path)
+    size = processor.crop_size if getattr(processor, "do_center_crop", False) else processor.size
+    height = size.get("height", 224)
+    width = size.get("width", 224)
+    with torch.no_grad():
+        logits = model(pixel_values=torch.zeros(1, 3, height, width)).logits
+    return {"files_ok": not mismatched, "mismatched": mismatched, "output_shape": list(logits.shape)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create an offline bundle of the plant disease model")
+    parser.add_argument("--output", default=bundle_dir, help=f"Bundle directory (default: {bundle_dir})")
+    parser.add_argument("--source", default=None, help="Model id or local directory (default: the app's model)")
+    parser.add_argument("--verify", action="store_true", help="Only verify an existing bundle")
+    args = parser.parse_args(argv)
+
+    if not args.verify:
+        create_bundle(args.output, args.source)
+    report = verify_bundle(args.output)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if not report["files_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Export the plant disease model to ONNX and check it against PyTorch.
+
+Usage:
+    python -m backend.export_disease_onnx                     # writes models/disease_model.onnx
+    python -m backend.export_disease_onnx --verify leaves/    # also compares top-3 on a folder of images
+
+Then run the app with DISEASE_MODEL_BACKEND=onnx.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.disease_detection import (PlantDiseaseDetector, OnnxBackend, onnx_model_path, onnx_labels_path,
+                                       onnx_preprocessor_path)
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wrap the Hugging Face model so the exported graph maps pixel_values -> logits"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def _input_size(processor):
+    crop = getattr(processor, "crop_size", None) or {}
+    size = getattr(processor, "size", None) or {}
+    height = crop.get("height") or size.get("height") or size.get("shortest_edge") or 224
+    width = crop.get("width") or size.get("width") or size.get("shortest_edge") or 224
+    return height, width
+
+
+def export_onnx(output_path=onnx_model_path, opset=17, detector=None):
+    """
+    Export the PyTorch disease model to ONNX with a dynamic batch dimension
+
+    Also writes the class labels and the image processor config next to the
+    model, since the ONNX backend does not load the Hugging Face model.
+
+    Returns:
+        str: Path of the exported model
+    """
+    if detector is None:
+        detector = PlantDiseaseDetector(backend="torch")
+    if not detector.load_model():
+        raise RuntimeError("Failed to load plant disease detection model")
+
+    height, width = _input_size(detector.processor)
+    dummy = torch.zeros(1, 3, height, width, dtype=torch.float32)
+    wrapper = _LogitsOnly(detector.model).eval()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    export_kwargs = dict(
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    with torch.no_grad():
+        try:
+            # The TorchScript-based exporter handles dynamic_axes directly
+            torch.onnx.export(wrapper, (dummy,), output_path, dynamo=False, **export_kwargs)
+        except TypeError:
+            # Older torch versions without the dynamo switch
+            torch.onnx.export(wrapper, (dummy,), output_path, **export_kwargs)
+
+    with open(onnx_labels_path(output_path), "w") as f:
+        json.dump({str(k): v for k, v in detector.labels.items()}, f, indent=1)
+    # Lets the ONNX backend preprocess without loading transformers
+    detector.processor.to_json_file(onnx_preprocessor_path(output_path))
+
+    print(f"Exported ONNX model to {output_path}")
+    return output_path
+
+
+def compare_backends(model_path=onnx_model_path, image_paths=None, batch_size=8, tolerance=1e-4, detector=None):
+    """
+    Compare PyTorch and ONNX Runtime outputs on the same preprocessed inputs
+
+    Args:
+        model_path: Exported ONNX model
+        image_paths: Images to compare on; random inputs are used if None
+        batch_size: Images per forward pass
+        tolerance: Maximum allowed absolute difference of a class probability
+        detector: Torch-backed detector (defaults to a freshly loaded one)
+
+    Returns:
+        dict: Images compared, top-3 agreement, max probability difference,
+        per-image latency of both backends and whether the check passed
+    """
+    if detector is None:
+        detector = PlantDiseaseDetector(backend="torch")
+    if not detector.load_model():
+        raise RuntimeError("Failed to load plant disease detection model")
+    onnx_backend = OnnxBackend(model_path)
+
+    if image_paths:
+        decoded = []
+        for path in image_paths:
+            try:
+                decoded.append(detector._open_image(path))
+            except Exception as e:
+                print(f"Skipping {path}: {str(e)}")
+        batches = []
+        for start in range(0, len(decoded), batch_size):
+            images = decoded[start:start + batch_size]
+            inputs = detector.processor(images=images, return_tensors="np")
+            batches.append(np.ascontiguousarray(inputs["pixel_values"], dtype=np.float32))
+    else:
+        height, width = _input_size(detector.processor)
+        rng = np.random.default_rng(0)
+        batches = [rng.standard_normal((batch_size, 3, height, width)).astype(np.float32) for _ in range(4)]
+
+    images = 0
+    top3_agree = 0
+    max_diff = 0.0
+    torch_time = 0.0
+    onnx_time = 0.0
+    for pixel_values in batches:
+        start = time.perf_counter()
+        expected = detector.backend.probabilities(pixel_values)
+        torch_time += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = onnx_backend.probabilities(pixel_values)
+        onnx_time += time.perf_counter() - start
+
+        max_diff = max(max_diff, float(np.abs(expected - actual).max()))
+        for row in range(len(pixel_values)):
+            top_expected = np.argsort(-expected[row], kind="stable")[:3]
+            top_actual = np.argsort(-actual[row], kind="stable")[:3]
+            top3_agree += int(np.array_equal(top_expected, top_actual))
+        images += len(pixel_values)
+
+    return {
+        "images": images,
+        "top3_agreement": top3_agree / images if images else 0.0,
+        "max_probability_diff": max_diff,
+        "torch_ms_per_image": torch_time * 1000 / max(images, 1),
+        "onnx_ms_per_image": onnx_time * 1000 / max(images, 1),
+        "passed": max_diff <= tolerance,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the plant disease model to ONNX")
+    parser.add_argument("--output", default=onnx_model_path, help=f"ONNX file to write (default: {onnx_model_path})")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version (default: 17)")
+    parser.add_argument("--verify", metavar="IMAGE_DIR", nargs="?", const="", default=None,
+                        help="Compare against PyTorch, on images in IMAGE_DIR or on random inputs if omitted")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Allowed probability difference (default: 1e-4)")
+    args = parser.parse_args(argv)
+
+    detector = PlantDiseaseDetector(backend="torch")
+    export_onnx(args.output, args.opset, detector=detector)
+
+    if args.verify is not None:
+        image_paths = None
+        if args.verify:
+            from backend.leaf_scanner import find_images
+            image_paths = find_images(args.verify)
+        report = compare_backends(args.output, image_paths, tolerance=args.tolerance, detector=detector)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        if not report["passed"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
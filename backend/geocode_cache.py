@@ -0,0 +1,168 @@
+"""
+Persistent place-name -> (lat, lon) store in front of Nominatim.
+
+Every known place is held in memory as a dict keyed by a normalized name,
+plus a sorted array of those keys for prefix (type-ahead) search with
+bisect. Places are persisted in SQLite and preloaded from
+models/india_places.json, so only never-seen places reach the public API.
+"""
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from backend.ttl_cache import cache_dir
+
+places_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "india_places.json")
+
+# Places Nominatim could not find are retried after this many seconds
+NOT_FOUND_TTL = 24 * 3600
+
+
+def normalize_place_name(place_name):
+    """
+    Normalize a place name for lookups: strip accents, lowercase, drop
+    punctuation except commas and collapse whitespace
+    ("  Bengaluru ,India" -> "bengaluru, india")
+    """
+    text = unicodedata.normalize("NFKD", str(place_name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w,]+", " ", text)
+    parts = [" ".join(part.split()) for part in text.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class GeocodeCache:
+    def __init__(self, db_path, seed_path=None):
+        self._lock = threading.Lock()
+        self._places = {}       # normalized key -> (display name, lat, lon)
+        self._keys = []         # sorted normalized keys for prefix search
+        self._not_found = {}    # normalized key -> time of the failed lookup
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, lat REAL, lon REAL, fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        if seed_path is not None and os.path.exists(seed_path):
+            self.preload(seed_path)
+        for key, name, lat, lon, fetched_at in self._db.execute("SELECT key, name, lat, lon, fetched_at FROM places"):
+            if lat is None:
+                self._not_found[key] = fetched_at
+            else:
+                self._places[key] = (name, lat, lon)
+        self._keys = sorted(self._places)
+
+    def preload(self, seed_path):
+        """Load places (with aliases) from a JSON file of {"places": [{name, lat, lon, aliases}]}"""
+        with open(seed_path, encoding="utf-8") as f:
+            places = json.load(f)["places"]
+        with self._lock:
+            for place in places:
+                names = [place["name"]] + place.get("aliases", [])
+                for name in names:
+                    for key in self._keys_for(name):
+                        self._places.setdefault(key, (place["name"], place["lat"], place["lon"]))
+            self._keys = sorted(self._places)
+
+    def _keys_for(self, name):
+        key = normalize_place_name(name)
+        keys = [key]
+        # "Pune, India" is also found as plain "Pune"
+        if key.endswith(", india"):
+            keys.append(key[:-len(", india")])
+        return keys
+
+    def lookup(self, place_name):
+        """
+        Return (lat, lon) for a known place without calling the API
+
+        Returns:
+            tuple or None: Coordinates, or None if the place is unknown
+        """
+        place = self._places.get(normalize_place_name(place_name))
+        return (place[1], place[2]) if place is not None else None
+
+    def is_known_missing(self, place_name):
+        """True if the place was recently looked up and not found"""
+        failed_at = self._not_found.get(normalize_place_name(place_name))
+        return failed_at is not None and time.time() - failed_at < NOT_FOUND_TTL
+
+    def store(self, place_name, coordinates):
+        """Remember the geocoding result for a place (None records a failed lookup)"""
+        key = normalize_place_name(place_name)
+        now = time.time()
+        with self._lock:
+            if coordinates is None:
+                self._not_found[key] = now
+                lat = lon = None
+            else:
+                lat, lon = coordinates
+                if key not in self._places:
+                    bisect.insort(self._keys, key)
+                self._places[key] = (str(place_name).strip(), lat, lon)
+                self._not_found.pop(key, None)
+            self._db.execute(
+                "INSERT OR REPLACE INTO places (key, name, lat, lon, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, str(place_name).strip(), lat, lon, now)
+            )
+            self._db.commit()
+
+    def get_or_fetch(self, place_name, fetch):
+        """Return cached coordinates, calling fetch(place_name) only for places never seen"""
+        coordinates = self.lookup(place_name)
+        if coordinates is not None or self.is_known_missing(place_name):
+            with self._lock:
+                self.hits += 1
+            return coordinates
+        with self._lock:
+            self.misses += 1
+        coordinates = fetch(place_name)
+        self.store(place_name, coordinates)
+        return coordinates
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return display names of known places whose name starts with prefix
+
+        Results are in alphabetical order of the normalized name, one per place.
+        """
+        key = normalize_place_name(prefix)
+        if not key:
+            return []
+        suggestions = []
+        seen = set()
+        start = bisect.bisect_left(self._keys, key)
+        for candidate in self._keys[start:]:
+            if not candidate.startswith(key):
+                break
+            name = self._places[candidate][0]
+            if name not in seen:
+                seen.add(name)
+                suggestions.append(name)
+                if len(suggestions) >= limit:
+                    break
+        return suggestions
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "places": len(self._places),
+            }
+
+
+# Create a singleton cache preloaded with the districts and cities we serve
+geocode_cache = GeocodeCache(os.path.join(cache_dir, "geocode.sqlite3"), seed_path=places_path)
@@ -0,0 +1,225 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying - the upstream is overloaded or briefly unavailable
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast once an upstream keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go to the upstream now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """Give up a trial call that ended without a verdict, so the next call can be the trial"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class Upstream:
+    """Settings and counters for one external API"""
+
+    def __init__(self, name, timeout=(3.05, 10), retries=2, backoff=0.5, max_backoff=5.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            name: Name used in the counters
+            timeout: Seconds, or a (connect, read) tuple, passed to requests
+            retries: Extra attempts after a connection error, timeout or retryable status
+            backoff: Base delay for exponential backoff with full jitter
+            max_backoff: Upper bound for one backoff delay
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retried = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, error):
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if error:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retried,
+                "rejected": self.rejected,
+                "mean_latency": self.total_latency / self.requests if self.requests else 0.0,
+                "max_latency": self.max_latency,
+                "circuit": self.breaker.state,
+            }
+
+
+class HttpClient:
+    """
+    Shared HTTP client for the external APIs: one pooled requests.Session,
+    per-upstream timeouts, retries with jittered exponential backoff and a
+    circuit breaker per upstream.
+    """
+
+    def __init__(self, pool_size=20):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.upstreams = {}
+
+    def register(self, upstream):
+        self.upstreams[upstream.name] = upstream
+        return upstream
+
+    def get(self, upstream_name, url, **kwargs):
+        """GET a URL through the named upstream (see request)"""
+        return self.request("GET", upstream_name, url, **kwargs)
+
+    def post(self, upstream_name, url, **kwargs):
+        """POST to a URL through the named upstream (see request for which failures are retried)"""
+        return self.request("POST", upstream_name, url, **kwargs)
+
+    def request(self, method, upstream_name, url, **kwargs):
+        """
+        Send a request through the named upstream
+
+        The last response is returned even if its status is an error, so callers
+        can keep checking status_code. Exceptions are raised only when no
+        response could be obtained.
+
+        GET requests are retried on connection errors, timeouts and
+        RETRY_STATUS_CODES. Other methods may have been executed by the
+        upstream already, so they are only retried on connection errors.
+
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open
+            requests.RequestException: If every attempt failed without a response
+        """
+        upstream = self.upstreams[upstream_name]
+        kwargs.setdefault("timeout", upstream.timeout)
+
+        attempt = 0
+        while True:
+            if not upstream.breaker.allow():
+                with upstream._lock:
+                    upstream.rejected += 1
+                raise CircuitOpenError(f"{upstream.name} is unavailable (circuit open)")
+
+            start = time.perf_counter()
+            response = None
+            error = None
+            finished = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+                finished = True
+            except requests.RequestException as e:
+                error = e
+                finished = True
+            finally:
+                if not finished:
+                    # Any other exception is passed on, but must not leave a half-open trial claimed forever
+                    upstream.breaker.release()
+            latency = time.perf_counter() - start
+
+            failed = error is not None or response.status_code >= 500
+            upstream.record(latency, failed or response.status_code >= 400)
+            if failed:
+                upstream.breaker.record_failure()
+            else:
+                upstream.breaker.record_success()
+
+            if method == "GET":
+                retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            else:
+                # Not after a read timeout or an error status such as 429 - that would run the request twice
+                retryable = isinstance(error, requests.ConnectionError)
+            if not retryable or attempt >= upstream.retries:
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            with upstream._lock:
+                upstream.retried += 1
+            # Full jitter keeps many workers from retrying in lockstep
+            delay = random.uniform(0, min(upstream.max_backoff, upstream.backoff * (2 ** attempt)))
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), upstream.max_backoff))
+            time.sleep(delay)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per upstream - requests, errors, retries, rejected calls, latency and circuit state
+        """
+        return {name: upstream.stats() for name, upstream in self.upstreams.items()}
+
+
+# Create a singleton client shared by all API calls in the process
+http_client = HttpClient()
+http_client.register(Upstream("ipinfo", timeout=(3.05, 5), retries=1))
+http_client.register(Upstream("visualcrossing", timeout=(3.05, 10), retries=2))
+http_client.register(Upstream("soilgrids", timeout=(3.05, 15), retries=2))
+http_client.register(Upstream("nominatim", timeout=(3.05, 10), retries=1, backoff=1.0))
@@ -0,0 +1,259 @@
+"""
+Fast image preprocessing for the plant disease model.
+
+Does the same steps as the Hugging Face image processor (resize the
+shortest edge, centre crop, rescale, normalize) with less work per image:
+each image is resized once, and normalization runs in place into a reused
+float32 batch buffer instead of allocating new arrays at every step.
+
+The output matches the processor to within MAX_PIXEL_DIFF (float rounding).
+Draft decoding (draft=True) lets libjpeg decode large JPEGs at a reduced
+scale, which is several times faster on camera photos but changes the
+pixels (a few 8-bit levels), so it is off by default and the app does not
+use it.
+
+Compare against the processor and time both on a folder of images (fails
+if the output differs by more than MAX_PIXEL_DIFF):
+    python -m backend.image_preprocessing leaves/
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Largest difference from the processor's pixel values allowed without draft decoding
+MAX_PIXEL_DIFF = 1e-5
+
+
+class ImagePreprocessor:
+    def __init__(self, shortest_edge=256, crop_size=(224, 224), image_mean=(0.5, 0.5, 0.5),
+                 image_std=(0.5, 0.5, 0.5), rescale_factor=1 / 255, resample=Image.BILINEAR, draft=False):
+        """
+        Args:
+            shortest_edge: Length the shorter image side is resized to
+                (None resizes straight to crop_size)
+            crop_size: (height, width) of the centre crop fed to the model
+            image_mean: Per-channel mean subtracted after rescaling
+            image_std: Per-channel standard deviation divided by after rescaling
+            rescale_factor: Factor turning 0-255 pixel values into 0-1
+            resample: PIL resampling filter used for the resize
+            draft: Decode JPEGs at a reduced scale when they are much larger than needed
+                (faster, but no longer matches the processor's numerics)
+        """
+        self.shortest_edge = shortest_edge
+        self.crop_size = tuple(crop_size)
+        self.image_mean = tuple(float(m) for m in image_mean)
+        self.image_std = tuple(float(s) for s in image_std)
+        self.rescale_factor = float(rescale_factor)
+        self.resample = resample
+        self.draft = draft
+        # (x * rescale - mean) / std folded into one multiply and one subtract per pixel
+        image_mean = np.asarray(image_mean, dtype=np.float32)
+        image_std = np.asarray(image_std, dtype=np.float32)
+        self._scale = (np.float32(rescale_factor) / image_std).reshape(3, 1, 1)
+        self._offset = (image_mean / image_std).reshape(3, 1, 1)
+        # Batch buffers are reused per thread, since the request scheduler may run several workers
+        self._local = threading.local()
+
+    @classmethod
+    def from_processor(cls, processor, draft=False):
+        """Build a preprocessor with the same settings as a Hugging Face image processor"""
+        size = getattr(processor, "size", None) or {}
+        crop_size = getattr(processor, "crop_size", None) or {}
+        if getattr(processor, "do_center_crop", False) and crop_size:
+            crop = (crop_size["height"], crop_size["width"])
+        else:
+            crop = (size.get("height", 224), size.get("width", 224))
+        shortest_edge = size.get("shortest_edge") if getattr(processor, "do_resize", True) else None
+
+        mean = processor.image_mean if getattr(processor, "do_normalize", True) else (0.0, 0.0, 0.0)
+        std = processor.image_std if getattr(processor, "do_normalize", True) else (1.0, 1.0, 1.0)
+        rescale_factor = processor.rescale_factor if getattr(processor, "do_rescale", True) else 1.0
+        resample = getattr(processor, "resample", None)
+        return cls(shortest_edge, crop, mean, std, rescale_factor,
+                   Image.BILINEAR if resample is None else resample, draft)
+
+    @classmethod
+    def from_config(cls, config, draft=False):
+        """
+        Build a preprocessor from a Hugging Face preprocessor_config.json, without importing transformers
+
+        Args:
+            config: Path of the JSON file, or its contents as a dict
+        """
+        if isinstance(config, str):
+            with open(config) as f:
+                config = json.load(f)
+        # The config has the processor's attribute names, so read it the same way
+        return cls.from_processor(SimpleNamespace(**config), draft)
+
+    def settings(self):
+        """Constructor arguments that rebuild this preprocessor (e.g. in another process)"""
+        return {
+            "shortest_edge": self.shortest_edge,
+            "crop_size": self.crop_size,
+            "image_mean": self.image_mean,
+            "image_std": self.image_std,
+            "rescale_factor": self.rescale_factor,
+            "resample": int(self.resample),
+            "draft": self.draft,
+        }
+
+    def _resized_size(self, width, height):
+        """Output size of the resize step, using the processor's rounding"""
+        if self.shortest_edge is None:
+            return self.crop_size[1], self.crop_size[0]
+        if width <= height:
+            return self.shortest_edge, int(self.shortest_edge * height / width)
+        return int(self.shortest_edge * width / height), self.shortest_edge
+
+    def decode(self, image):
+        """
+        Decode and resize one image to the model's input resolution
+
+        Args:
+            image: PIL image, path, file-like object or raw bytes
+
+        Returns:
+            PIL.Image: RGB image of the resized size, ready for cropping
+        """
+        if not isinstance(image, Image.Image):
+            if isinstance(image, (bytes, bytearray)):
+                image = io.BytesIO(image)
+            image = Image.open(image)
+            if self.draft and image.format == "JPEG":
+                # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying
+                # at least twice the target, so the resize still averages enough pixels
+                target = self._resized_size(*image.size)
+                image.draft("RGB", (target[0] * 2, target[1] * 2))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        size = self._resized_size(*image.size)
+        if image.size != size:
+            image = image.resize(size, self.resample)
+        return image
+
+    def _buffer(self, batch_size):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) < batch_size:
+            height, width = self.crop_size
+            buffer = np.empty((batch_size, 3, height, width), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:batch_size]
+
+    def to_batch(self, images, out=None):
+        """
+        Normalize decoded images into a float32 (N, 3, H, W) batch
+
+        Unless out is given, the returned array is a view of a buffer reused by
+        the next call from the same thread, so it has to be consumed (or
+        copied) before then.
+
+        Args:
+            images: Decoded images from decode()
+            out: Optional float32 array of shape (N, 3, H, W) to write into
+        """
+        batch = self._buffer(len(images)) if out is None else out
+        height, width = self.crop_size
+        for i, image in enumerate(images):
+            pixels = np.asarray(image)
+            # Centre crop (same offsets as the processor) is just a slice
+            top = (pixels.shape[0] - height) // 2
+            left = (pixels.shape[1] - width) // 2
+            if top < 0 or left < 0:
+                raise ValueError(f"Image of size {pixels.shape[1]}x{pixels.shape[0]} is smaller than the crop")
+            pixels = pixels[top:top + height, left:left + width]
+            # HWC uint8 -> CHW float32 written straight into the batch, then normalized in place
+            np.multiply(pixels.transpose(2, 0, 1), self._scale, out=batch[i], casting="unsafe")
+            batch[i] -= self._offset
+        return batch
+
+    def __call__(self, images):
+        """Decode and normalize a list of images into a float32 (N, 3, H, W) batch"""
+        return self.to_batch([self.decode(image) for image in images])
+
+
+def benchmark(image_paths, processor, repeat=3):
+    """
+    Time the Hugging Face processor against ImagePreprocessor, one image at a time
+
+    Raises:
+        AssertionError: If ImagePreprocessor (without draft decoding) differs
+            from the processor by more than MAX_PIXEL_DIFF
+
+    Returns:
+        dict: Images, per-image milliseconds for the processor and for
+        ImagePreprocessor with and without draft decoding, speed-up and max
+        absolute difference of the produced pixel values
+    """
+    from backend.disease_detection import PlantDiseaseDetector
+
+    fast = ImagePreprocessor.from_processor(processor)
+    draft = ImagePreprocessor.from_processor(processor, draft=True)
+    opener = PlantDiseaseDetector()
+    images = []
+    for path in image_paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+
+    max_diff = 0.0
+    max_diff_draft = 0.0
+    for data in images:
+        expected = processor(images=[opener._open_image(data)], return_tensors="np")["pixel_values"]
+        max_diff = max(max_diff, float(np.abs(fast([data]) - expected).max()))
+        max_diff_draft = max(max_diff_draft, float(np.abs(draft([data]) - expected).max()))
+    assert max_diff <= MAX_PIXEL_DIFF, \
+        f"Preprocessing differs from the processor by {max_diff:.2e} (allowed: {MAX_PIXEL_DIFF:.0e})"
+
+    def per_image_ms(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for data in images:
+                fn(data)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000 / len(images)
+
+    processor_ms = per_image_ms(lambda data: processor(images=[opener._open_image(data)], return_tensors="np"))
+    fast_ms = per_image_ms(lambda data: fast([data]))
+    draft_ms = per_image_ms(lambda data: draft([data]))
+    return {
+        "images": len(images),
+        "processor_ms_per_image": processor_ms,
+        "fast_ms_per_image": fast_ms,
+        "draft_ms_per_image": draft_ms,
+        "speedup": processor_ms / fast_ms if fast_ms else 0.0,
+        "max_pixel_diff": max_diff,
+        "max_pixel_diff_with_draft": max_diff_draft,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fast preprocessing against the Hugging Face image processor")
+    parser.add_argument("images", help="Folder of images to benchmark on")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum images to use (default: 50)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions, best is reported (default: 3)")
+    args = parser.parse_args(argv)
+
+    from transformers import AutoImageProcessor
+    from backend.disease_detection import MODEL_NAME, cache_dir
+    from backend.leaf_scanner import find_images
+    processor = AutoImageProcessor.from_pretrained(MODEL_NAME, cache_dir=cache_dir)
+    report = benchmark(find_images(args.images)[:args.limit], processor, args.repeat)
+    for key, value in report.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
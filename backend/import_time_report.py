@@ -0,0 +1,177 @@
+"""
+Measure how long the app's modules take to import and what they drag in.
+
+Each module is imported in a fresh interpreter with -X importtime, so the
+numbers are cold-start costs. The report lists wall time, resident memory
+after the import, which heavy ML packages got loaded and the slowest
+packages pulled in. Pages need streamlit installed; the model warm-up is
+turned off (MODEL_WARMUP=0) so only the imports themselves are measured.
+
+With --baseline-root the same modules are also measured in another checkout
+of the project, e.g. the tree before the lazy imports, and every row shows
+before -> after.
+
+Usage:
+    python -m backend.import_time_report                    # prints the report
+    git worktree add /tmp/plantx-before <commit>
+    python -m backend.import_time_report --baseline-root /tmp/plantx-before --output docs/import_time_report.txt
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a Streamlit worker imports: app.py (rendering Home), then each page when it is opened
+MODULES = [
+    "app",
+    "backend.api_services",
+    "backend.geocode_cache",
+    "pages.Crop_Recommendation",
+    "pages.Yield_Prediction",
+    "pages.Climate_Risk_Alerts",
+    "pages.Plant_Disease_Detection",
+    "pages.Soil_Analysis",
+    "backend.disease_detection",
+    "backend.soil_classifier",
+    "backend.yield_model",
+]
+
+# Packages that should only be imported once a model is actually used
+HEAVY_PACKAGES = ["torch", "transformers", "tensorflow", "sklearn", "joblib", "onnxruntime"]
+
+_PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss / 1e6, "heavy": heavy}}))
+"""
+
+
+def _parse_importtime(stderr, top, exclude=()):
+    """Return the slowest packages from -X importtime output as (package, ms) pairs"""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(cumulative) / 1000
+        except ValueError:
+            continue
+        # A package's cost is its slowest (outermost) import, wherever it was first pulled in
+        package = name.strip().split(".")[0]
+        if package not in exclude:
+            packages[package] = max(packages.get(package, 0.0), cumulative)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure_import(module, top=5, root=project_root):
+    """
+    Import one module in a fresh interpreter
+
+    Args:
+        module: Module name, e.g. "backend.yield_model", "pages.Soil_Analysis" or "app"
+        top: Number of slowest packages to list
+        root: Project checkout to import the module from
+
+    Returns:
+        dict: module, seconds, rss_mb, heavy packages loaded and the slowest
+        packages imported, or an error if the import failed
+    """
+    env = dict(os.environ)
+    # Pages are imported as "pages.X" and app.py as "app" from frontend/, backend modules from the project root
+    env["PYTHONPATH"] = os.pathsep.join([root, os.path.join(root, "frontend"), env.get("PYTHONPATH", "")])
+    # Measure the imports only, not models loading in the background
+    env["MODEL_WARMUP"] = "0"
+    code = _PROBE.format(module=module, heavy=HEAVY_PACKAGES)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                               capture_output=True, text=True, cwd=root, env=env)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"
+        return {"module": module, "error": error}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["module"] = module
+    # Leave out the app's own packages and interpreter start-up
+    exclude = {module.split(".")[0], "site", "encodings"}
+    result["slowest"] = _parse_importtime(completed.stderr, top, exclude)
+    return result
+
+
+def build_report(modules=MODULES, top=5, baseline_root=None):
+    """
+    Measure every module and format the results as a plain-text report
+
+    Args:
+        modules: Modules to measure
+        top: Slowest packages listed per module
+        baseline_root: Another checkout to measure the same modules in, shown as before -> after
+    """
+    lines = [
+        "Import-time report (python -m backend.import_time_report)",
+        f"Python {platform.python_version()} on {platform.system()} {platform.machine()}",
+    ]
+    if baseline_root:
+        lines.append(f"Before: {_describe_tree(baseline_root)}")
+        lines.append(f"After:  {_describe_tree(project_root)}")
+    if "app" in modules:
+        lines.append("app is timed rendering Home, so it includes the IP location and weather requests "
+                     "and Home's 0.5 s loading spinner")
+    lines += ["", f"{'module':<34} {'seconds':>14} {'RSS MB':>12}  heavy packages loaded"]
+    details = []
+    for module in modules:
+        result = measure_import(module, top)
+        before = measure_import(module, top, baseline_root) if baseline_root else None
+        if "error" in result:
+            lines.append(f"{module:<34} {'-':>14} {'-':>12}  not importable here: {result['error']}")
+            continue
+        heavy = ", ".join(result["heavy"]) or "none"
+        if before is None:
+            lines.append(f"{module:<34} {result['seconds']:>14.2f} {result['rss_mb']:>12.0f}  {heavy}")
+        elif "error" in before:
+            lines.append(f"{module:<34} {'- -> ' + format(result['seconds'], '.2f'):>14} "
+                         f"{'- -> ' + format(result['rss_mb'], '.0f'):>12}  {heavy} (before: {before['error']})")
+        else:
+            heavy_before = ", ".join(before["heavy"]) or "none"
+            seconds = f"{before['seconds']:.2f} -> {result['seconds']:.2f}"
+            rss = f"{before['rss_mb']:.0f} -> {result['rss_mb']:.0f}"
+            lines.append(f"{module:<34} {seconds:>14} {rss:>12}  {heavy_before} -> {heavy}")
+        slowest = ", ".join(f"{name} {ms:.0f} ms" for name, ms in result["slowest"])
+        details.append(f"  {module}: {slowest}")
+
+    lines += ["", "Slowest packages imported:"] + details
+    return "\n".join(lines) + "\n"
+
+
+def _describe_tree(root):
+    """The checkout's commit, for the report header"""
+    completed = subprocess.run(["git", "log", "-1", "--format=%h %s"], capture_output=True, text=True, cwd=root)
+    return completed.stdout.strip() or root
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold import time of the app's modules")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to measure (default: the app's)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per module (default: 5)")
+    parser.add_argument("--output", default=None, help="Also write the report to this file")
+    parser.add_argument("--baseline-root", default=None,
+                        help="Checkout of an earlier tree to compare against (e.g. made with git worktree add)")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.modules, args.top, args.baseline_root)
+    print(report, end="")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
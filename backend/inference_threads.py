@@ -0,0 +1,69 @@
+"""
+Thread counts for the deep learning runtimes.
+
+Every Streamlit session shares one process, so letting torch and
+TensorFlow each size their thread pools to all cores makes concurrent
+inferences fight over them. The pools are configured once per process,
+before the runtime runs its first operation:
+
+    TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS
+    TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS
+
+Intra-op threads default to the number of CPUs divided by the disease
+scheduler's batch workers; inter-op threads default to 1, since the models run
+one graph at a time.
+"""
+import os
+import threading
+
+_lock = threading.Lock()
+_configured = set()
+
+
+def thread_settings(prefix):
+    """
+    Read {prefix}_INTRA_OP_THREADS and {prefix}_INTER_OP_THREADS
+
+    Returns:
+        tuple: (intra_op_threads, inter_op_threads)
+    """
+    workers = max(1, int(os.environ.get("DISEASE_BATCH_WORKERS", 1)))
+    default_intra = max(1, (os.cpu_count() or 1) // workers)
+    intra = int(os.environ.get(f"{prefix}_INTRA_OP_THREADS", default_intra))
+    inter = int(os.environ.get(f"{prefix}_INTER_OP_THREADS", 1))
+    return max(1, intra), max(1, inter)
+
+
+def configure_torch_threads():
+    """Apply the torch thread counts (only the first call per process does anything)"""
+    with _lock:
+        if "torch" in _configured:
+            return
+        _configured.add("torch")
+        import torch
+
+        intra, inter = thread_settings("TORCH")
+        torch.set_num_threads(intra)
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            # Only possible before torch has started any parallel work
+            print(f"Could not set torch inter-op threads: {str(e)}")
+        print(f"torch using {intra} intra-op and {torch.get_num_interop_threads()} inter-op threads")
+
+
+def configure_tensorflow_threads(tf):
+    """Apply the TensorFlow thread counts (only the first call per process does anything)"""
+    with _lock:
+        if "tensorflow" in _configured:
+            return
+        _configured.add("tensorflow")
+
+        intra, inter = thread_settings("TF")
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+            print(f"TensorFlow using {intra} intra-op and {inter} inter-op threads")
+        except RuntimeError as e:
+            # Only possible before TensorFlow has been initialized
+            print(f"Could not set TensorFlow threads: {str(e)}")
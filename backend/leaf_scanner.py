@@ -0,0 +1,222 @@
+"""
+Offline bulk scanner for folders of leaf photos.
+
+Usage:
+    python -m backend.leaf_scanner photos/ results.csv --batch-size 32 --workers 4
+
+Images are decoded and downsized in a process pool while batched inference
+runs in the main process. Files already present in the output are skipped,
+so an interrupted scan can simply be started again.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+# Top 3 predictions are written as disease_1, confidence_1, ... disease_3, confidence_3
+CSV_FIELDS = ["path", "success", "error"] + [
+    f"{field}_{rank}" for rank in range(1, 4) for field in ("disease", "confidence")
+]
+
+
+def find_images(root):
+    """Walk a directory tree and return the image files in a stable order"""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, filename))
+    return paths
+
+
+def load_finished(output_path):
+    """Return the set of image paths already recorded in an existing output file"""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, newline="", encoding="utf-8") as f:
+        if output_path.lower().endswith(".jsonl"):
+            for line in f:
+                try:
+                    finished.add(json.loads(line)["path"])
+                except (ValueError, KeyError):
+                    # A line cut short by an interruption - that image is scanned again
+                    continue
+        else:
+            for row in csv.DictReader(f):
+                if row.get("path"):
+                    finished.add(row["path"])
+    return finished
+
+
+def decode_image(path, shortest_edge=256):
+    """
+    Decode an image and shrink it so its shortest edge is at most shortest_edge
+
+    The processor still does the final resize and crop; shrinking here keeps the
+    pixels sent back from the worker processes small.
+
+    Returns:
+        tuple: (path, RGB PIL image or None, error message or None)
+    """
+    try:
+        with Image.open(path) as image:
+            if image.format == "JPEG":
+                # Let libjpeg decode at reduced resolution, never below what we need
+                image.draft("RGB", (shortest_edge * 2, shortest_edge * 2))
+            image = image.convert("RGB")
+        width, height = image.size
+        short = min(width, height)
+        if short > shortest_edge:
+            scale = shortest_edge / short
+            image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+        return path, image, None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class _ResultWriter:
+    """Append scan results to a CSV or JSONL file, flushing after every batch"""
+
+    def __init__(self, output_path):
+        self.jsonl = output_path.lower().endswith(".jsonl")
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self._file = open(output_path, "a", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, path, result):
+        success = bool(result.get("success"))
+        if self.jsonl:
+            record = {"path": path, "success": success}
+            if success:
+                record["predictions"] = result["predictions"]
+            else:
+                record["error"] = result.get("error", "")
+            self._file.write(json.dumps(record) + "\n")
+        else:
+            row = {"path": path, "success": success, "error": "" if success else result.get("error", "")}
+            for rank, prediction in enumerate(result.get("predictions", [])[:3], start=1):
+                row[f"disease_{rank}"] = prediction["disease"]
+                row[f"confidence_{rank}"] = f"{prediction['confidence']:.4f}"
+            self._csv.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def scan_directory(root, output_path, batch_size=32, workers=None, detector=None, progress=True):
+    """
+    Scan every image below root and write its top-3 diseases to CSV or JSONL
+
+    Args:
+        root: Directory to walk
+        output_path: .csv or .jsonl file; existing entries are kept and skipped
+        batch_size: Images per forward pass
+        workers: Decoder processes (defaults to the CPU count)
+        detector: PlantDiseaseDetector to use (defaults to the shared instance)
+        progress: Print throughput after every batch
+
+    Returns:
+        dict: Images scanned, images skipped, failures and images/sec
+    """
+    if detector is None:
+        from backend.disease_detection import disease_detector as detector
+    if not detector.load_model():
+        raise RuntimeError("Failed to load plant disease detection model")
+
+    finished = load_finished(output_path)
+    paths = [path for path in find_images(root) if path not in finished]
+    skipped = len(finished)
+    workers = workers or os.cpu_count() or 1
+
+    writer = _ResultWriter(output_path)
+    scanned = 0
+    failures = 0
+    start = time.perf_counter()
+
+    def run_batch(batch):
+        nonlocal scanned, failures
+        decoded = [(path, image) for path, image, error in batch if image is not None]
+        results = detector.detect_disease_batch([image for _, image in decoded]) if decoded else []
+        by_path = {path: result for (path, _), result in zip(decoded, results)}
+        for path, image, error in batch:
+            result = by_path.get(path) or {"success": False, "error": error}
+            if not result.get("success"):
+                failures += 1
+            writer.write(path, result)
+        writer.flush()
+        scanned += len(batch)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"Scanned {scanned}/{len(paths)} images ({scanned / max(elapsed, 1e-9):.1f} images/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a few batches of decodes in flight so workers stay busy during inference
+            pending = deque()
+            path_iter = iter(paths)
+            for path in path_iter:
+                pending.append(executor.submit(decode_image, path))
+                if len(pending) >= batch_size * 3:
+                    break
+
+            batch = []
+            while pending:
+                batch.append(pending.popleft().result())
+                next_path = next(path_iter, None)
+                if next_path is not None:
+                    pending.append(executor.submit(decode_image, next_path))
+                if len(batch) >= batch_size:
+                    run_batch(batch)
+                    batch = []
+            if batch:
+                run_batch(batch)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "scanned": scanned,
+        "skipped": skipped,
+        "failures": failures,
+        "seconds": elapsed,
+        "images_per_second": scanned / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a folder of leaf photos for plant diseases")
+    parser.add_argument("directory", help="Folder of leaf images (searched recursively)")
+    parser.add_argument("output", help="Output file (.csv or .jsonl); existing results are skipped")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per forward pass (default: 32)")
+    parser.add_argument("--workers", type=int, default=None, help="Decoder processes (default: CPU count)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress")
+    args = parser.parse_args(argv)
+
+    summary = scan_directory(args.directory, args.output, batch_size=args.batch_size,
+                             workers=args.workers, progress=not args.quiet)
+    print(f"Done: {summary['scanned']} images in {summary['seconds']:.1f} s "
+          f"({summary['images_per_second']:.1f} images/s), {summary['skipped']} already scanned, "
+          f"{summary['failures']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,20 @@
 # backend/load_model.py
 
-import pickle
-import os
+from backend.model_registry import model_registry, crop_model_path
+from backend.yield_model import yield_model_path
 
-# Crop recommendation model
-CROP_MODEL_PATH = os.path.join("models", "crop_recommendation_model.pkl")
+# Crop recommendation model (shared through the model registry)
+CROP_MODEL_PATH = crop_model_path
 
 def predict_crop(features: list):
-    with open(CROP_MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
+    model = model_registry.get("crop_recommendation")
     prediction = model.predict([features])
     return prediction[0]
 
 # ✅ Yield prediction model (AdaBoost + TabNet)
-YIELD_MODEL_PATH = os.path.join("models", "ada_best_yield_model.pkl")
+YIELD_MODEL_PATH = yield_model_path
 
 def predict_yield(features: list):
-    with open(YIELD_MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
+    model = model_registry.get("yield")
     prediction = model.predict([features])
     return prediction[0]
@@ -0,0 +1,196 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _Request:
+    __slots__ = ("item", "future")
+
+    def __init__(self, item, future):
+        self.item = item
+        self.future = future
+
+
+class MicroBatcher:
+    """
+    Request queue in front of a batch inference function.
+
+    Callers submit single items; worker threads collect items for up to
+    max_wait_ms or until max_batch_size items are waiting, run the batch
+    function once and hand every caller its own result.
+
+    Subclasses change the queue order by overriding _push/_pop/_depth and
+    what happens to a collected batch by overriding _process (see
+    request_scheduler.RequestScheduler).
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10, workers=1, name="batcher"):
+        """
+        Args:
+            batch_fn: Callable taking a list of items and returning a list of results in the same order
+            max_batch_size: Maximum number of items per batch
+            max_wait_ms: How long to wait for more items after the first one arrives
+            workers: Number of worker threads running batches concurrently
+            name: Name used for the worker threads
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._batches = 0
+        self._items = 0
+        self._failed = 0
+        self._largest_batch = 0
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    # Queue of waiting requests, called with self._cond held
+    def _push(self, request):
+        self._pending.append(request)
+
+    def _pop(self):
+        return self._pending.popleft()
+
+    def _depth(self):
+        return len(self._pending)
+
+    def submit(self, item):
+        """
+        Queue one item for inference
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result for this item
+        """
+        self._ensure_started()
+        future = Future()
+        with self._cond:
+            self._push(_Request(item, future))
+            self._cond.notify()
+        return future
+
+    def run(self, item, timeout=None):
+        """Submit one item and block until its result is ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        """Wait for a first request, then take more for up to max_wait; returns (batch, depth left)"""
+        with self._cond:
+            while not self._depth() and not self._stopping:
+                self._cond.wait()
+            if not self._depth():
+                return None, 0
+            batch = [self._pop()]
+            wait_until = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if self._depth():
+                    batch.append(self._pop())
+                    continue
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0 or self._stopping:
+                    break
+                self._cond.wait(remaining)
+            return batch, self._depth()
+
+    def _call(self, batch_fn, requests):
+        """
+        Run a batch function over the requests' items
+
+        Returns:
+            list or None: One result per request, or None if the function
+            raised, in which case every request's future has the exception
+        """
+        try:
+            results = batch_fn([request.item for request in requests])
+            if len(results) != len(requests):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(requests)} items")
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return None
+        return results
+
+    def _process(self, batch, depth):
+        # Skip callers that cancelled while waiting in the queue
+        live = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        results = self._call(self.batch_fn, live)
+        if results is not None:
+            for request, result in zip(live, results):
+                request.future.set_result(result)
+
+        with self._cond:
+            self._batches += 1
+            if results is None:
+                self._failed += len(live)
+            else:
+                self._items += len(live)
+                self._largest_batch = max(self._largest_batch, len(live))
+
+    def _run(self):
+        while True:
+            batch, depth = self._collect()
+            if batch is None:
+                return
+            self._process(batch, depth)
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads after the queued items are processed"""
+        with self._cond:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Batches run, items processed, items whose batch failed, mean
+            and largest batch size and queue depth
+        """
+        with self._cond:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "failed": self._failed,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "queue_depth": self._depth(),
+            }
+
+
+def batcher_settings(prefix, max_batch_size=16, max_wait_ms=10, workers=1):
+    """
+    Read batcher settings from environment variables
+
+    For a prefix of DISEASE the variables are DISEASE_BATCH_SIZE,
+    DISEASE_BATCH_WAIT_MS and DISEASE_BATCH_WORKERS.
+
+    Returns:
+        dict: Keyword arguments for MicroBatcher
+    """
+    return {
+        "max_batch_size": int(os.environ.get(f"{prefix}_BATCH_SIZE", max_batch_size)),
+        "max_wait_ms": float(os.environ.get(f"{prefix}_BATCH_WAIT_MS", max_wait_ms)),
+        "workers": int(os.environ.get(f"{prefix}_BATCH_WORKERS", workers)),
+    }
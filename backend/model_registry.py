@@ -0,0 +1,200 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+# Directory holding the pickled model artifacts
+model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+crop_model_path = os.path.join(model_dir, "crop_recommendation_model.pkl")
+climate_model_path = os.path.join(model_dir, "climate_risk_model.pkl")
+
+
+def _current_rss():
+    """
+    Return the current resident set size of this process in bytes, or None
+    if it cannot be determined on this platform.
+
+    Read from /proc on Linux, otherwise from psutil if it is installed. The
+    peak RSS from getrusage is deliberately not used: load-time deltas of a
+    high-water mark are zero for every model loaded after the largest one.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def _file_sha256(path):
+    """Hash a file in chunks so large artifacts do not have to fit in memory twice"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pickle_loader(path):
+    """Default loader for plain pickled models"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def tree_model_loader(path):
+    """Pickle loader that compiles tree ensembles into node arrays (see backend.tree_compiler)"""
+    # Imported on first load so the registry itself does not pull in numpy
+    from backend.tree_compiler import compiled_loader
+    return compiled_loader(pickle_loader)(path)
+
+
+class _ModelEntry:
+    def __init__(self, name, path, loader):
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.model = None
+        self.mtime = None
+        self.size = None
+        self.sha256 = None
+        self.load_time = None
+        self.memory = None
+        self.load_count = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model artifact once and shares it
+    between all Streamlit sessions. A model is reloaded only when its file
+    changes on disk (mtime/size first, then content hash to ignore plain touches).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path=None, loader=None):
+        """
+        Register a model under a name
+
+        Args:
+            name: Name used to fetch the model
+            path: Path to the artifact. If None, the loader is called without
+                arguments and the result is never reloaded (e.g. synthetic models)
+            loader: Callable that builds the model. Defaults to pickle.load on the path
+        """
+        if loader is None:
+            loader = pickle_loader
+        with self._lock:
+            existing = self._entries.get(name)
+            if existing is not None and existing.path == path and existing.loader is loader:
+                return
+            self._entries[name] = _ModelEntry(name, path, loader)
+
+    def is_registered(self, name):
+        return name in self._entries
+
+    def get(self, name):
+        """
+        Return the loaded model, loading or reloading it if needed
+
+        Raises:
+            KeyError: If no model is registered under the name
+            FileNotFoundError: If the artifact does not exist
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"No model registered under '{name}'")
+
+        if entry.path is None:
+            if entry.model is None:
+                with entry.lock:
+                    if entry.model is None:
+                        self._load(entry)
+            return entry.model
+
+        stat = os.stat(entry.path)
+        if entry.model is not None and stat.st_mtime == entry.mtime and stat.st_size == entry.size:
+            return entry.model
+
+        with entry.lock:
+            # Another session may have finished the (re)load while we waited
+            stat = os.stat(entry.path)
+            if entry.model is not None and stat.st_mtime == entry.mtime and stat.st_size == entry.size:
+                return entry.model
+
+            sha256 = _file_sha256(entry.path)
+            if entry.model is not None and sha256 == entry.sha256:
+                # Touched but unchanged - remember the new mtime and keep the model
+                entry.mtime = stat.st_mtime
+                entry.size = stat.st_size
+                return entry.model
+
+            self._load(entry)
+            entry.mtime = stat.st_mtime
+            entry.size = stat.st_size
+            entry.sha256 = sha256
+        return entry.model
+
+    def _load(self, entry):
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        model = entry.loader(entry.path) if entry.path is not None else entry.loader()
+        entry.load_time = time.perf_counter() - start
+        rss_after = _current_rss()
+        entry.memory = max(rss_after - rss_before, 0) if rss_before is not None and rss_after is not None else None
+        entry.model = model
+        entry.load_count += 1
+        entry.loaded_at = time.time()
+        print(f"Loaded model '{entry.name}' in {entry.load_time * 1000:.1f} ms")
+
+    def unload(self, name):
+        """Drop a loaded model so the next get() loads it again"""
+        entry = self._entries.get(name)
+        if entry is not None:
+            with entry.lock:
+                entry.model = None
+                entry.mtime = None
+                entry.size = None
+                entry.sha256 = None
+
+    def stats(self):
+        """
+        Report load statistics for every registered model
+
+        Returns:
+            dict: Per model name - loaded flag, load time (s), resident memory
+            delta at load (bytes), number of loads and artifact hash
+        """
+        report = {}
+        for name, entry in list(self._entries.items()):
+            report[name] = {
+                "path": entry.path,
+                "loaded": entry.model is not None,
+                "load_time": entry.load_time,
+                "memory": entry.memory,
+                "load_count": entry.load_count,
+                "loaded_at": entry.loaded_at,
+                "sha256": entry.sha256,
+            }
+        return report
+
+
+# Create a singleton instance shared by every session in the process
+model_registry = ModelRegistry()
+model_registry.register("crop_recommendation", crop_model_path, tree_model_loader)
+model_registry.register("climate_risk", climate_model_path)
+
+# For testing
+if __name__ == "__main__":
+    model_registry.get("crop_recommendation")
+    for model_name, model_stats in model_registry.stats().items():
+        print(model_name, model_stats)
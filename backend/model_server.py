@@ -0,0 +1,505 @@
+"""
+Local model server holding the plant disease and soil models for every UI worker.
+
+Each Streamlit worker process that ran the models itself held its own copy
+of the weights. With MODEL_SERVER_ADDRESS set, workers instead decode and
+preprocess images themselves and hand the model-ready tensors to one
+long-lived server process:
+
+    - the tensor is written straight into a multiprocessing.shared_memory
+      segment owned by the worker, and only its name, shape and dtype are
+      sent over a local socket
+    - the server maps the same segment and runs the model on it in place,
+      without copying the pixels
+    - the result dicts are exactly those detect_disease and classify_soil return
+
+The server also owns the result caches, so a photo seen by any worker is
+answered from the cache for all of them.
+
+Start it next to the app (MODEL_SERVER_ADDRESS defaults to a Unix socket in the cache directory):
+    python -m backend.model_server
+    MODEL_SERVER_ADDRESS=/cache/model_server.sock streamlit run frontend/app.py
+
+Clients authenticate with MODEL_SERVER_AUTHKEY if it is set. Otherwise the
+server generates a random key at every start and writes it next to the
+socket (model_server.sock.key, readable by its owner only), where the app
+workers, running as the same user, read it.
+"""
+import argparse
+import atexit
+import io
+import os
+import secrets
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+from PIL import Image
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.image_preprocessing import ImagePreprocessor
+from backend.result_cache import ResultCache, read_image_bytes
+from backend.ttl_cache import cache_dir
+
+default_address = os.path.join(cache_dir, "model_server.sock")
+
+# Input size of the soil model and of the fallback classifier's colour analysis
+SOIL_MODEL_SIZE = (224, 224)
+SOIL_FALLBACK_SIZE = (100, 100)
+
+
+def authkey_path(address):
+    """The generated key is stored next to the socket (model_server.sock -> model_server.sock.key)"""
+    return address + ".key"
+
+
+def _server_authkey(address):
+    """MODEL_SERVER_AUTHKEY, or a new random key written to a file only the owner can read"""
+    key = os.environ.get("MODEL_SERVER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    key = secrets.token_hex(32)
+    path = authkey_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    return key.encode("utf-8")
+
+
+def _client_authkey(address):
+    """MODEL_SERVER_AUTHKEY, or the key the running server wrote next to its socket"""
+    key = os.environ.get("MODEL_SERVER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    # Read again for every connection, since a restarted server has a new key
+    with open(authkey_path(address)) as f:
+        return f.read().strip().encode("utf-8")
+
+
+def _attach(name):
+    """Map an existing shared memory segment without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        # The creating worker unlinks the segment; stop this process's tracker from doing so at exit
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+class ModelServer:
+    def __init__(self, address=default_address):
+        self.address = address
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @staticmethod
+    def _detector(kind):
+        """The disease detector serving "disease" or "disease_int8" (the scheduler's degraded model)"""
+        from backend.disease_detection import disease_detector, quantized_disease_detector
+        return quantized_disease_detector if kind == "disease_int8" else disease_detector
+
+    def info(self):
+        """What clients need to prepare tensors: preprocessing settings and model versions"""
+        from backend.disease_detection import quantized_model_available
+        from backend.soil_classifier import soil_classifier, TF_AVAILABLE
+
+        info = {}
+        kinds = ["disease", "disease_int8"] if quantized_model_available() else ["disease"]
+        for kind in kinds:
+            detector = self._detector(kind)
+            if detector.load_model():
+                preprocessor = detector.preprocessor or ImagePreprocessor.from_processor(detector.processor)
+                info[kind] = {"preprocessor": preprocessor.settings(), "model_version": detector.model_version}
+            else:
+                info[kind] = {"error": "Failed to load model"}
+        keras = TF_AVAILABLE and soil_classifier.load_model()
+        info["soil"] = {"mode": "keras" if keras else "fallback", "model_version": soil_classifier.model_version()}
+        return info
+
+    def cached(self, kind, keys):
+        """Cached results for cache keys (None where there is no entry)"""
+        from backend.soil_classifier import soil_classifier
+
+        cache = (soil_classifier if kind == "soil" else self._detector(kind)).result_cache
+        if cache is None:
+            return [None] * len(keys)
+        return [cache.get(key) if key is not None else None for key in keys]
+
+    def predict(self, kind, batch, keys):
+        """
+        Run a batch of preprocessed images and cache the results
+
+        Args:
+            kind: "disease", "disease_int8", "soil" (float32 tensor for the Keras
+                model) or "soil_fallback" (uint8 images for the fallback classifier)
+            batch: Array mapped from the client's shared memory segment
+            keys: Result cache key per image, or None
+        """
+        from backend.soil_classifier import soil_classifier
+
+        if kind in ("disease", "disease_int8"):
+            detector = self._detector(kind)
+            if not detector.load_model():
+                return [{"error": "Failed to load model"} for _ in range(len(batch))]
+            results = detector.predict_pixels(batch)
+            cache = detector.result_cache
+        else:
+            if kind == "soil":
+                per_class = soil_classifier.predict_tensor(batch)
+            else:
+                per_class = soil_classifier._per_class_results(soil_classifier.fallback_confidences(batch))
+            results = [soil_classifier._build_result(image_results) for image_results in per_class]
+            cache = soil_classifier.result_cache
+
+        if cache is not None:
+            for key, result in zip(keys, results):
+                if key is not None:
+                    cache.put(key, result)
+        return results
+
+    def _serve_connection(self, conn):
+        # Segments stay mapped between requests, since a client reuses its segment
+        segments = {}
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    return
+                with self._lock:
+                    self.requests += 1
+                try:
+                    if message[0] == "info":
+                        reply = self.info()
+                    elif message[0] == "cached":
+                        _, kind, keys = message
+                        reply = self.cached(kind, keys)
+                    elif message[0] == "predict":
+                        _, kind, name, shape, dtype, keys = message
+                        if name not in segments:
+                            segments[name] = _attach(name)
+                        batch = np.ndarray(shape, dtype=dtype, buffer=segments[name].buf)
+                        try:
+                            reply = self.predict(kind, batch, keys)
+                        finally:
+                            del batch
+                    elif message[0] == "release":
+                        # No reply - the client does not wait for one
+                        segment = segments.pop(message[1], None)
+                        if segment is not None:
+                            try:
+                                segment.close()
+                            except BufferError:
+                                pass
+                        continue
+                    else:
+                        raise ValueError(f"Unknown request {message[0]!r}")
+                    conn.send(("ok", reply))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+        finally:
+            for segment in segments.values():
+                try:
+                    segment.close()
+                except BufferError:
+                    pass
+            conn.close()
+
+    def serve_forever(self):
+        """Accept clients until interrupted, one thread per client connection"""
+        if os.path.exists(self.address):
+            # Stale socket of a previous run
+            os.unlink(self.address)
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)), exist_ok=True)
+        authkey = _server_authkey(self.address)
+        # Create the socket owner-only from the start, rather than chmod-ing it after bind
+        old_umask = os.umask(0o077)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(old_umask)
+        with listener:
+            print(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # e.g. a client with the wrong key
+                    print(f"Model server rejected a connection: {str(e)}")
+                    continue
+                with self._lock:
+                    self.connections += 1
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+class _Channel:
+    """One connection to the server plus the shared memory segment used for its tensors"""
+
+    def __init__(self, address):
+        self.conn = Client(address, family="AF_UNIX", authkey=_client_authkey(address))
+        self.segment = None
+        # False while a reply is outstanding; a channel interrupted then cannot be reused
+        self.in_sync = True
+
+    def call(self, *message):
+        self.in_sync = False
+        self.conn.send(message)
+        status, reply = self.conn.recv()
+        self.in_sync = True
+        if status != "ok":
+            raise RuntimeError(reply)
+        return reply
+
+    def buffer(self, shape, dtype):
+        """An array of the given shape backed by this channel's segment (grown if too small)"""
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if self.segment is None or self.segment.size < nbytes:
+            self._release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        return np.ndarray(shape, dtype=dtype, buffer=self.segment.buf)
+
+    def _release_segment(self):
+        if self.segment is None:
+            return
+        try:
+            self.conn.send(("release", self.segment.name))
+        except OSError:
+            pass
+        self.segment.close()
+        self.segment.unlink()
+        self.segment = None
+
+    def close(self):
+        try:
+            self._release_segment()
+        finally:
+            self.conn.close()
+
+
+class ModelServerClient:
+    """
+    Runs disease detection and soil classification through the model server
+
+    detect_disease_batch and classify_soil_batch take and return the same
+    things as the PlantDiseaseDetector and SoilTypeClassifier methods.
+    """
+
+    def __init__(self, address=None):
+        """
+        Args:
+            address: Socket path of the model server; None leaves the client disabled
+        """
+        self.address = address
+        self._idle = []
+        self._lock = threading.Lock()
+        self._info = None
+        self._preprocessors = {}
+        # Unlink this process's segments on exit rather than leaving them to the resource tracker
+        atexit.register(self.close)
+
+    @property
+    def enabled(self):
+        return self.address is not None
+
+    def _with_channel(self, work):
+        """Run work(channel) on an idle channel, opening a new one if all are busy"""
+        # Pooled rather than per thread, since Streamlit runs each rerun in a new thread
+        with self._lock:
+            channel = self._idle.pop() if self._idle else None
+        if channel is None:
+            channel = _Channel(self.address)
+        try:
+            reply = work(channel)
+        except (OSError, EOFError):
+            # Server restarted - drop every channel and the settings it sent
+            self._discard(channel)
+            with self._lock:
+                idle, self._idle = self._idle, []
+                self._info = None
+            for stale in idle:
+                self._discard(stale)
+            raise
+        except BaseException:
+            # An error reply from the server or a failure before sending (e.g. an image
+            # too small to crop) leaves the channel usable; anything mid-call does not
+            if channel.in_sync:
+                with self._lock:
+                    self._idle.append(channel)
+            else:
+                self._discard(channel)
+            raise
+        with self._lock:
+            self._idle.append(channel)
+        return reply
+
+    @staticmethod
+    def _discard(channel):
+        """Close a channel and unlink its segment, ignoring a connection that is already gone"""
+        try:
+            channel.close()
+        except OSError:
+            pass
+
+    def close(self):
+        """Close every idle connection and free its shared memory segment"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for channel in idle:
+            self._discard(channel)
+
+    def _call(self, *message):
+        return self._with_channel(lambda channel: channel.call(*message))
+
+    def _predict(self, kind, shape, dtype, fill, keys):
+        def work(channel):
+            # The caller's fill function writes the tensor straight into shared memory
+            fill(channel.buffer(shape, dtype))
+            return channel.call("predict", kind, channel.segment.name, shape, dtype, keys)
+        return self._with_channel(work)
+
+    def info(self):
+        """Preprocessing settings and model versions from the server (fetched once per server run)"""
+        if self._info is None:
+            info = self._call("info")
+            self._preprocessors = {kind: ImagePreprocessor(**entry["preprocessor"])
+                                   for kind, entry in info.items() if "preprocessor" in entry}
+            self._info = info
+        return self._info
+
+    def _run_batch(self, kind, images, model_version, decode, prepare):
+        """
+        Shared flow of both models: cache lookup, decode, one predict call
+
+        Args:
+            kind: Model name on the server ("disease", "disease_int8" or "soil")
+            images: List of image paths, file-like objects or bytes
+            model_version: Version string for the result cache keys
+            decode: Callable decoding one image
+            prepare: Callable returning (kind, shape, dtype, fill) for the decoded images
+        """
+        results = [None] * len(images)
+        keys = [None] * len(images)
+        data = []
+        for i, image in enumerate(images):
+            try:
+                raw = read_image_bytes(image)
+            except Exception as e:
+                results[i] = {"success": False, "error": str(e)}
+                raw = None
+            data.append(raw)
+            if raw is not None:
+                keys[i] = ResultCache.key_for(raw, model_version)
+
+        # Photos any worker has seen before are answered without decoding
+        lookup = [i for i in range(len(images)) if keys[i] is not None]
+        if lookup:
+            for i, cached in zip(lookup, self._call("cached", kind, [keys[i] for i in lookup])):
+                results[i] = cached
+
+        decoded = []
+        for i, image in enumerate(images):
+            if results[i] is not None:
+                continue
+            try:
+                source = image if data[i] is None or isinstance(image, str) else io.BytesIO(data[i])
+                decoded.append((i, decode(source)))
+            except Exception as e:
+                # A broken image only fails its own result
+                results[i] = {"success": False, "error": str(e)}
+
+        if decoded:
+            server_kind, shape, dtype, fill = prepare([image for _, image in decoded])
+            try:
+                predictions = self._predict(server_kind, shape, dtype, fill, [keys[i] for i, _ in decoded])
+            except RuntimeError as e:
+                predictions = [{"success": False, "error": str(e)} for _ in decoded]
+            for (i, _), result in zip(decoded, predictions):
+                results[i] = result
+        return results
+
+    def detect_disease_batch(self, images, quantized=False):
+        """
+        Same as PlantDiseaseDetector.detect_disease_batch, with the model in the server
+
+        With quantized=True the server's int8 model is used instead (the
+        request scheduler's degraded mode).
+        """
+        kind = "disease_int8" if quantized else "disease"
+        try:
+            info = self.info().get(kind, {"error": "The int8 disease model is not available on the model server"})
+        except (OSError, EOFError, RuntimeError) as e:
+            return [{"success": False, "error": f"Model server unavailable: {str(e)}"} for _ in images]
+        if "error" in info:
+            return [{"error": info["error"]} for _ in images]
+
+        preprocessor = self._preprocessors[kind]
+        height, width = preprocessor.crop_size
+
+        def prepare(decoded):
+            return (kind, (len(decoded), 3, height, width), "float32",
+                    lambda out: preprocessor.to_batch(decoded, out=out))
+
+        try:
+            return self._run_batch(kind, images, info["model_version"], preprocessor.decode, prepare)
+        except (OSError, EOFError) as e:
+            return [{"success": False, "error": f"Model server unavailable: {str(e)}"} for _ in images]
+
+    def classify_soil_batch(self, images):
+        """Same as SoilTypeClassifier.classify_soil_batch, with the model in the server"""
+        try:
+            info = self.info()["soil"]
+        except (OSError, EOFError, RuntimeError) as e:
+            return [{"success": False, "error": f"Model server unavailable: {str(e)}"} for _ in images]
+
+        def decode(source):
+            return Image.open(source).convert("RGB")
+
+        def prepare(decoded):
+            if info["mode"] == "keras":
+                def fill(out):
+                    # Same values as SoilTypeClassifier.preprocess_image
+                    for i, image in enumerate(decoded):
+                        out[i] = np.asarray(image.resize(SOIL_MODEL_SIZE), dtype=np.float32)
+                        out[i] /= 255.0
+                return "soil", (len(decoded),) + SOIL_MODEL_SIZE + (3,), "float32", fill
+
+            def fill(out):
+                # Same images as SoilTypeClassifier._fallback_classifier_batch analyses
+                for i, image in enumerate(decoded):
+                    out[i] = np.asarray(image.resize(SOIL_FALLBACK_SIZE))
+            return "soil_fallback", (len(decoded),) + SOIL_FALLBACK_SIZE + (3,), "uint8", fill
+
+        try:
+            return self._run_batch("soil", images, info["model_version"], decode, prepare)
+        except (OSError, EOFError) as e:
+            return [{"success": False, "error": f"Model server unavailable: {str(e)}"} for _ in images]
+
+
+# Create a singleton client, enabled by MODEL_SERVER_ADDRESS
+model_server_client = ModelServerClient(os.environ.get("MODEL_SERVER_ADDRESS") or None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the plant disease and soil models to local app workers")
+    parser.add_argument("--address", default=os.environ.get("MODEL_SERVER_ADDRESS") or default_address,
+                        help=f"Unix socket path (default: {default_address})")
+    args = parser.parse_args(argv)
+
+    server = ModelServer(args.address)
+    # Load the models before the first client asks
+    server.info()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Background warm-up of the app's models.
+
+At process start each registered model is loaded and run once on a dummy
+input in a background thread, so the first user of a page does not pay
+for the download, deserialization and first-inference setup. The warm-up
+publishes per-model state, load duration and memory for the sidebar.
+
+By default only the cheap scikit-learn models are warmed in the app: the
+image models pull in torch/transformers and TensorFlow, which a worker that
+only serves Home should never import, so they load when their page is
+first used. MODEL_WARMUP=all warms every model, MODEL_WARMUP=disease,soil
+only the listed ones and MODEL_WARMUP=0 none. The prediction service warms
+every model by default. Models held by the shared model server
+(MODEL_SERVER_ADDRESS) are never loaded here, and nothing is when the pages
+use the prediction service (PREDICTION_SERVICE_URL).
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from backend.model_registry import _current_rss
+
+
+class _WarmupTask:
+    def __init__(self, name, label, warm):
+        self.name = name
+        self.label = label
+        self.warm = warm
+        self.state = "pending"      # pending -> loading -> ready | failed, or skipped
+        self.note = None
+        self.error = None
+        self.load_time = None
+        self.memory = None
+
+
+class ModelWarmup:
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, label, warm):
+        """
+        Register a model to warm up
+
+        Args:
+            name: Short name used in MODEL_WARMUP
+            label: Name shown to users
+            warm: Callable that loads the model and runs one dummy inference.
+                It may return a short note (e.g. "fallback classifier") and
+                raises if the model cannot be used.
+        """
+        with self._lock:
+            self._tasks[name] = _WarmupTask(name, label, warm)
+
+    def start(self, names=None, skip_notes=None):
+        """
+        Start warming up in a background thread (only the first call per process does anything)
+
+        Models are warmed one after another so the memory of each can be
+        told apart, in the order they were registered.
+
+        Args:
+            names: Models to warm up (None for all)
+            skip_notes: Note shown for a skipped model, by name (e.g. where it is loaded instead)
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            tasks = []
+            for name, task in self._tasks.items():
+                if names is None or name in names:
+                    tasks.append(task)
+                else:
+                    # Loaded on first use instead
+                    task.state = "skipped"
+                    task.note = (skip_notes or {}).get(name, "loaded on first use")
+            self._thread = threading.Thread(target=self._run, args=(tasks,), name="model-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self, tasks):
+        for task in tasks:
+            task.state = "loading"
+            rss_before = _current_rss()
+            start = time.perf_counter()
+            try:
+                task.note = task.warm()
+                task.state = "ready"
+            except Exception as e:
+                task.error = str(e)
+                task.state = "failed"
+                print(f"Warm-up of {task.label} failed: {task.error}")
+            task.load_time = time.perf_counter() - start
+            rss_after = _current_rss()
+            if rss_before is not None and rss_after is not None:
+                task.memory = max(0, rss_after - rss_before)
+
+    def wait(self, timeout=None):
+        """Block until the warm-up has finished (mainly for scripts)"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        """
+        Returns:
+            dict: Per model - label, state, load time in seconds, memory in
+            bytes, note and error
+        """
+        with self._lock:
+            return {
+                name: {
+                    "label": task.label,
+                    "state": task.state,
+                    "load_time": task.load_time,
+                    "memory": task.memory,
+                    "note": task.note,
+                    "error": task.error,
+                }
+                for name, task in self._tasks.items()
+            }
+
+    def progress(self):
+        """Fraction of the models being warmed up that are ready"""
+        status = [s for s in self.status().values() if s["state"] != "skipped"]
+        if not status:
+            return 1.0
+        return sum(1 for s in status if s["state"] == "ready") / len(status)
+
+
+def _warm_crop():
+    from backend.model_registry import model_registry
+    model = model_registry.get("crop_recommendation")
+    # N, P, K, temperature, humidity, ph, rainfall - the page's default inputs
+    model.predict(np.array([[50, 50, 50, 25.0, 50.0, 6.5, 100.0]]))
+
+
+def _warm_yield():
+    import pandas as pd
+    from backend.model_registry import model_registry
+    from backend.yield_model import predict_yield_batch
+    model = model_registry.get("yield")
+    # The same one-row prediction the Yield Prediction page makes
+    sample = pd.DataFrame([{
+        "crop": "Rice", "state": "Karnataka", "area": 5.0, "pesticide": 10.0, "temperature": 25.0,
+        "humidity": 65.0, "rainfall": 1000.0, "soil_pH": 6.5, "organic_carbon": 1.0,
+    }])
+    result = predict_yield_batch(sample, model).iloc[0]
+    if result["used_backup_calculation"]:
+        return "using backup calculation"
+    return None
+
+
+def _warm_climate():
+    from backend.model_registry import model_registry, climate_model_path
+    if not os.path.exists(climate_model_path):
+        # The model is optional - the page falls back to a rule-based estimate
+        return "no model file, using rule-based estimate"
+    model_registry.get("climate_risk")
+
+
+def _warm_disease():
+    from backend.disease_detection import disease_detector, quantized_disease_detector, quantized_model_available
+    detectors = [disease_detector]
+    if quantized_model_available():
+        # The request scheduler's degraded model, so the first overload does not wait for it to load
+        detectors.append(quantized_disease_detector)
+    for detector in detectors:
+        if not detector.load_model():
+            raise RuntimeError(f"Failed to load plant disease detection model ({detector.backend_name} backend)")
+        height, width = detector.preprocessor.crop_size if detector.preprocessor else (224, 224)
+        detector.backend.probabilities(np.zeros((1, 3, height, width), dtype=np.float32))
+    return " + ".join(f"{detector.backend_name} backend" for detector in detectors)
+
+
+def _warm_soil():
+    from PIL import Image
+    from backend.soil_classifier import soil_classifier, TF_AVAILABLE
+    # Runs the Keras model if it loads, otherwise the fallback classifier
+    soil_classifier._predict([Image.new("RGB", (224, 224))])
+    if not (TF_AVAILABLE and soil_classifier.initialized):
+        return "fallback classifier"
+    return None
+
+
+# Models only warmed when asked for, since they import torch/transformers or TensorFlow
+ON_DEMAND = {"disease", "soil"}
+
+# Create a singleton with the app's models (cheap ones first so they show as ready early)
+model_warmup = ModelWarmup()
+model_warmup.register("crop", "Crop recommendation", _warm_crop)
+model_warmup.register("yield", "Yield prediction", _warm_yield)
+model_warmup.register("climate", "Climate risk", _warm_climate)
+model_warmup.register("disease", "Plant disease", _warm_disease)
+model_warmup.register("soil", "Soil type", _warm_soil)
+
+
+def start_warmup(serving=False):
+    """
+    Start the warm-up configured by MODEL_WARMUP
+
+    By default the app warms the cheap models only and the prediction
+    service warms every model.
+
+    Args:
+        serving: True in the prediction service itself, which loads its
+            models even if PREDICTION_SERVICE_URL is set in its environment
+    """
+    setting = os.environ.get("MODEL_WARMUP", "1").strip()
+    if setting == "0":
+        return
+    every = set(model_warmup.status())
+    skip_notes = {}
+    if setting == "all" or (setting == "1" and serving):
+        names = every
+    elif setting == "1":
+        names = every - ON_DEMAND
+        skip_notes.update({name: "loaded when its page is first used (MODEL_WARMUP=all warms it at start)"
+                           for name in ON_DEMAND})
+    else:
+        names = {name.strip() for name in setting.split(",")}
+    if os.environ.get("PREDICTION_SERVICE_URL") and not serving:
+        # The pages only call the prediction service, which holds every model
+        names = set()
+        skip_notes = {name: "served by the prediction service" for name in every}
+    elif os.environ.get("MODEL_SERVER_ADDRESS"):
+        # Loaded once by backend/model_server.py for all workers
+        names -= {"disease", "soil"}
+        skip_notes.update({name: "held by the model server" for name in ("disease", "soil")})
+    model_warmup.start(names, skip_notes)
@@ -0,0 +1,90 @@
+"""
+Client of the prediction service used by the Streamlit pages.
+
+With PREDICTION_SERVICE_URL set (e.g. http://127.0.0.1:8502) every
+prediction is a request to backend.prediction_service, so the models live
+in the service process and not in each UI worker. Without it the same
+prediction functions run in-process, as before.
+
+Either way the result is the dict the service would return.
+"""
+import os
+
+import requests
+
+from backend.http_client import http_client, Upstream
+
+# No retries: a shed (429) or timed-out prediction must not be sent again to an overloaded service
+http_client.register(Upstream(
+    "prediction",
+    timeout=(3.05, float(os.environ.get("PREDICTION_SERVICE_TIMEOUT", 60))),
+    retries=0,
+))
+
+
+class PredictionClient:
+    def __init__(self, base_url=None):
+        """
+        Args:
+            base_url: Prediction service URL; None runs the predictions in-process
+        """
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    @property
+    def remote(self):
+        return self.base_url is not None
+
+    def _post(self, path, **kwargs):
+        try:
+            response = http_client.post("prediction", self.base_url + path, **kwargs)
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            return {"success": False, "error": f"Prediction service unavailable: {str(e)}"}
+
+    def crop(self, params):
+        """Recommend crops for {"N", "P", "K", "temperature", "humidity", "ph", "rainfall"} (optionally "top_k")"""
+        if not self.remote:
+            from backend.prediction_service import predict_crop
+            return _local(predict_crop, params)
+        return self._post("/predict/crop", json=params)
+
+    def yield_(self, params):
+        """Predict a yield; params as in backend.prediction_service.predict_yield"""
+        if not self.remote:
+            from backend.prediction_service import predict_yield
+            return _local(predict_yield, params)
+        return self._post("/predict/yield", json=params)
+
+    def climate_risk(self, params):
+        """Predict a flood risk; params as in backend.prediction_service.predict_climate_risk"""
+        if not self.remote:
+            from backend.prediction_service import predict_climate_risk
+            return _local(predict_climate_risk, params)
+        return self._post("/predict/climate-risk", json=params)
+
+    def disease(self, image_bytes, priority="interactive"):
+        """Detect plant diseases in encoded image bytes ("batch" priority for bulk work)"""
+        if not self.remote:
+            from backend.prediction_service import predict_disease
+            return _local(predict_disease, image_bytes, priority)
+        return self._post("/predict/disease", data=image_bytes, params={"priority": priority},
+                          headers={"Content-Type": "application/octet-stream"})
+
+    def soil(self, image_bytes, priority="interactive"):
+        """Classify the soil type in encoded image bytes ("batch" priority for bulk work)"""
+        if not self.remote:
+            from backend.prediction_service import predict_soil
+            return _local(predict_soil, image_bytes, priority)
+        return self._post("/predict/soil", data=image_bytes, params={"priority": priority},
+                          headers={"Content-Type": "application/octet-stream"})
+
+
+def _local(predict, *args):
+    try:
+        return predict(*args)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# Create a singleton client configured by PREDICTION_SERVICE_URL
+prediction_client = PredictionClient(os.environ.get("PREDICTION_SERVICE_URL") or None)
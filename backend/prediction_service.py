@@ -0,0 +1,394 @@
+"""
+HTTP prediction service for the app's models.
+
+Serves the crop, yield, climate risk, plant disease and soil models as JSON
+endpoints, so model serving can be scaled separately from the Streamlit
+sessions and other clients (e.g. the mobile app) can use the same models:
+
+    GET  /health                  models warm-up state
+    GET  /stats                   request counters and scheduler/cache stats
+    POST /predict/crop            {"N", "P", "K", "temperature", "humidity", "ph", "rainfall", "top_k"}
+    POST /predict/yield           {"crop", "state", "area", "pesticide", "temperature",
+                                   "humidity", "rainfall", "soil_pH", "organic_carbon"}
+    POST /predict/climate-risk    {"latitude", "longitude", "rainfall", "temperature", "humidity",
+                                   "river_discharge", "water_level", "elevation", "land_cover",
+                                   "soil_type", "population_density", "infrastructure",
+                                   "historical_floods"}
+    POST /predict/disease         raw image bytes, or {"image": "<base64>"}
+    POST /predict/soil            raw image bytes, or {"image": "<base64>"}
+
+The image endpoints take ?priority=batch for bulk work (served after
+interactive requests and shed first) and ?deadline_s=N.
+
+Every response is a JSON object with a "success" field, like the backend
+functions return. Requests are handled by a pool of worker threads sized to
+the number of CPUs (PREDICTION_SERVICE_WORKERS overrides it).
+
+Usage:
+    python -m backend.prediction_service --host 0.0.0.0 --port 8502
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.model_registry import model_registry, climate_model_path
+
+YIELD_FIELDS = ["crop", "state", "area", "pesticide", "temperature", "humidity", "rainfall",
+                "soil_pH", "organic_carbon"]
+
+# Feature order expected by the climate risk model (land cover and soil type as names)
+CLIMATE_FEATURES = ["latitude", "longitude", "rainfall", "temperature", "humidity", "river_discharge",
+                    "water_level", "elevation", "land_cover", "soil_type", "population_density",
+                    "infrastructure", "historical_floods"]
+LAND_COVER_MAP = {"Forest": 0, "Urban": 1, "Agriculture": 2, "Water": 3}
+SOIL_TYPE_MAP = {"Sandy": 0, "Clay": 1, "Silt": 2, "Peat": 3, "Chalk": 4, "Loam": 5}
+
+# Largest request body accepted (images included)
+MAX_BODY_BYTES = int(os.environ.get("PREDICTION_SERVICE_MAX_BODY_MB", 20)) << 20
+
+
+def _require(params, fields):
+    missing = [field for field in fields if field not in params]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+
+def predict_crop(params):
+    """
+    Recommend crops for one set of soil and climate values (memoized, see backend.crop_recommendation)
+
+    Args:
+        params: dict with N, P, K, temperature, humidity, ph and rainfall,
+            and optionally top_k (default 3)
+
+    Returns:
+        dict: success, the recommended crop (as the model names it), the
+        top_k crops with probabilities and the normalized inputs
+    """
+    from backend.crop_recommendation import crop_recommender
+    return crop_recommender.recommend(params, params.get("top_k", 3))
+
+
+def predict_yield(params):
+    """
+    Predict the yield of one crop, state, farm and climate combination
+
+    Args:
+        params: dict with crop, state, area, pesticide, temperature, humidity,
+            rainfall, soil_pH and organic_carbon
+
+    Returns:
+        dict: success, every column of predict_yield_batch (adjustment factors,
+        predicted_yield, yield_level, ...) and the model used ("yield" or
+        "yield_backup")
+    """
+    import pandas as pd
+    from backend.yield_model import predict_yield_batch
+
+    _require(params, YIELD_FIELDS)
+    try:
+        model = model_registry.get("yield")
+        model_name = "yield"
+    except Exception as e:
+        print(f"Failed to load yield model: {str(e)}. Using backup model.")
+        model = model_registry.get("yield_backup")
+        model_name = "yield_backup"
+
+    sample = pd.DataFrame([{field: params[field] for field in YIELD_FIELDS}])
+    result = predict_yield_batch(sample, model).iloc[0].to_dict()
+    result.update({"success": True, "model": model_name})
+    return result
+
+
+def predict_climate_risk(params):
+    """
+    Predict the flood risk of one location
+
+    Uses the climate risk model when its file exists and loads, otherwise a
+    rule-based estimate from the inputs.
+
+    Args:
+        params: dict with the CLIMATE_FEATURES (land_cover and soil_type by name)
+
+    Returns:
+        dict: success, prediction (1 = high risk), flood_risk_probability,
+        mock_prediction, model_status ("loaded", "missing" or "failed") and
+        model_error
+    """
+    _require(params, CLIMATE_FEATURES)
+    land_cover = params["land_cover"]
+    soil_type = params["soil_type"]
+    if land_cover not in LAND_COVER_MAP or soil_type not in SOIL_TYPE_MAP:
+        raise ValueError(f"Unknown land cover {land_cover!r} or soil type {soil_type!r}")
+
+    model = None
+    model_error = None
+    if not os.path.exists(climate_model_path):
+        model_status = "missing"
+    else:
+        try:
+            model = model_registry.get("climate_risk")
+            model_status = "loaded"
+        except Exception as e:
+            model_status = "failed"
+            model_error = str(e)
+
+    if model is not None:
+        values = [params[feature] for feature in CLIMATE_FEATURES]
+        values[CLIMATE_FEATURES.index("land_cover")] = LAND_COVER_MAP[land_cover]
+        values[CLIMATE_FEATURES.index("soil_type")] = SOIL_TYPE_MAP[soil_type]
+        input_features = np.array([values], dtype=np.float64)
+        flood_risk_prob = model.predict_proba(input_features)[0][1] if hasattr(model, 'predict_proba') else 0.65
+        prediction = model.predict(input_features)[0]
+    else:
+        # Higher rainfall, river discharge, previous floods, and lower elevation increase risk
+        base_risk = 0.2
+        if params["rainfall"] > 100: base_risk += 0.2
+        if params["river_discharge"] > 200: base_risk += 0.15
+        if params["historical_floods"] > 3: base_risk += 0.1
+        if params["elevation"] < 50: base_risk += 0.15
+        if params["water_level"] > 4: base_risk += 0.2
+        if land_cover == "Urban": base_risk += 0.05
+        if soil_type == "Clay": base_risk += 0.05
+
+        flood_risk_prob = min(base_risk, 0.95)
+        prediction = 1 if flood_risk_prob > 0.5 else 0
+
+    return {
+        "success": True,
+        "prediction": int(prediction),
+        "flood_risk_probability": float(flood_risk_prob),
+        "mock_prediction": model is None,
+        "model_status": model_status,
+        "model_error": model_error,
+    }
+
+
+def predict_disease(image_bytes, priority="interactive", deadline=None):
+    """
+    Detect plant diseases in one encoded image
+
+    Goes through the disease scheduler (bounded queue, deadlines, batching)
+    and runs in the shared model server when MODEL_SERVER_ADDRESS is set.
+
+    Args:
+        image_bytes: Encoded image
+        priority: "interactive" or "batch"
+        deadline: Seconds the request may wait for the model (default: DISEASE_DEADLINE_S)
+    """
+    from backend.request_scheduler import disease_scheduler, PRIORITIES
+    return disease_scheduler.run(io.BytesIO(image_bytes), PRIORITIES[priority], deadline)
+
+
+def predict_soil(image_bytes, priority="interactive", deadline=None):
+    """Classify the soil type in one encoded image (arguments as for predict_disease)"""
+    from backend.request_scheduler import soil_scheduler, PRIORITIES
+    return soil_scheduler.run(io.BytesIO(image_bytes), PRIORITIES[priority], deadline)
+
+
+JSON_ENDPOINTS = {
+    "/predict/crop": predict_crop,
+    "/predict/yield": predict_yield,
+    "/predict/climate-risk": predict_climate_risk,
+}
+
+IMAGE_ENDPOINTS = {
+    "/predict/disease": predict_disease,
+    "/predict/soil": predict_soil,
+}
+
+
+def _to_json(value):
+    """json.dumps fallback for the NumPy values the models return"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, path, latency, error):
+        with self._lock:
+            entry = self._endpoints.setdefault(path, {"requests": 0, "errors": 0, "total_latency": 0.0,
+                                                      "max_latency": 0.0})
+            entry["requests"] += 1
+            entry["total_latency"] += latency
+            entry["max_latency"] = max(entry["max_latency"], latency)
+            if error:
+                entry["errors"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                path: {
+                    "requests": entry["requests"],
+                    "errors": entry["errors"],
+                    "mean_latency": entry["total_latency"] / entry["requests"],
+                    "max_latency": entry["max_latency"],
+                }
+                for path, entry in self._endpoints.items()
+            }
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PlantXPrediction/1.0"
+    # HTTP/1.0: one request per connection, so idle keep-alive clients never hold a worker
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=_to_json).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body larger than {MAX_BODY_BYTES >> 20} MB")
+        return self.rfile.read(length)
+
+    def _read_image(self):
+        body = self._read_body()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            payload = json.loads(body or b"{}")
+            if "image" not in payload:
+                raise ValueError("Missing field: image")
+            return base64.b64decode(payload["image"])
+        return body
+
+    def do_GET(self):
+        if self.path == "/health":
+            from backend.model_warmup import model_warmup
+            self._send_json(200, {"success": True, "models": model_warmup.status()})
+        elif self.path == "/stats":
+            from backend.crop_recommendation import crop_recommender
+            from backend.request_scheduler import disease_scheduler, soil_scheduler
+            self._send_json(200, {
+                "success": True,
+                "workers": self.server.workers,
+                "endpoints": self.server.stats.snapshot(),
+                "disease_scheduler": disease_scheduler.stats(),
+                "soil_scheduler": soil_scheduler.stats(),
+                "crop_cache": crop_recommender.stats(),
+                "models": model_registry.stats(),
+            })
+        else:
+            self._send_json(404, {"success": False, "error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        status = 200
+        url = urlsplit(self.path)
+        path = url.path
+        try:
+            if path in JSON_ENDPOINTS:
+                params = json.loads(self._read_body() or b"{}")
+                if not isinstance(params, dict):
+                    raise ValueError("Request body must be a JSON object")
+                result = JSON_ENDPOINTS[path](params)
+            elif path in IMAGE_ENDPOINTS:
+                query = parse_qs(url.query)
+                priority = query.get("priority", ["interactive"])[0]
+                if priority not in ("interactive", "batch"):
+                    raise ValueError(f"Unknown priority {priority!r}")
+                deadline = float(query["deadline_s"][0]) if "deadline_s" in query else None
+                result = IMAGE_ENDPOINTS[path](self._read_image(), priority, deadline)
+                if result.get("shed"):
+                    # Overloaded - clients back off and retry (429 does not trip their circuit breakers)
+                    status = 429
+            else:
+                self._read_body()
+                status = 404
+                result = {"success": False, "error": f"Unknown endpoint {path}"}
+        except (ValueError, TypeError, KeyError) as e:
+            # Malformed request (bad JSON, missing or unknown values)
+            status = 400
+            result = {"success": False, "error": str(e)}
+        except Exception as e:
+            status = 500
+            result = {"success": False, "error": str(e)}
+
+        self._send_json(status, result)
+        if status != 404:
+            self.server.stats.record(path, time.perf_counter() - start,
+                                     status != 200 or not result.get("success", False))
+
+    def log_message(self, format, *args):
+        if os.environ.get("PREDICTION_SERVICE_ACCESS_LOG") == "1":
+            super().log_message(format, *args)
+
+
+class PredictionServer(HTTPServer):
+    """
+    HTTP server that hands each connection to a fixed pool of worker threads
+
+    Unlike ThreadingHTTPServer the number of concurrent requests is bounded,
+    so a burst queues up instead of starting a thread per connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=None):
+        super().__init__(address, PredictionRequestHandler)
+        self.workers = max(1, int(workers or os.environ.get("PREDICTION_SERVICE_WORKERS", 0) or os.cpu_count() or 1))
+        self.stats = _Stats()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prediction")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the PlantX models over HTTP")
+    parser.add_argument("--host", default=os.environ.get("PREDICTION_SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PREDICTION_SERVICE_PORT", 8502)))
+    parser.add_argument("--workers", type=int, default=None, help="Worker threads (default: number of CPUs)")
+    parser.add_argument("--no-warmup", action="store_true", help="Load models on first request instead")
+    args = parser.parse_args(argv)
+
+    if not args.no_warmup:
+        from backend.model_warmup import start_warmup
+        start_warmup(serving=True)
+
+    server = PredictionServer((args.host, args.port), args.workers)
+    print(f"Prediction service on http://{args.host}:{args.port} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
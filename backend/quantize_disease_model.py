@@ -0,0 +1,249 @@
+"""
+Build an int8-quantized copy of the exported ONNX disease model and measure
+what it costs in accuracy and what it saves in latency and memory.
+
+Usage:
+    python -m backend.quantize_disease_model                          # dynamic int8
+    python -m backend.quantize_disease_model --static leaves/         # static int8, calibrated on leaves/
+    python -m backend.quantize_disease_model --report leaves/         # compare against the float model
+
+Then run the app with DISEASE_MODEL_BACKEND=onnx_int8.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.disease_detection import (PlantDiseaseDetector, OnnxBackend, onnx_model_path, onnx_int8_model_path,
+                                       onnx_labels_path, onnx_preprocessor_path, load_onnx_preprocessor,
+                                       load_processor)
+from backend.image_preprocessing import ImagePreprocessor
+from backend.model_registry import _current_rss
+
+
+def _load_preprocessor(float_path):
+    """Preprocessing for the images fed to the model at float_path (its exported config, or the app's processor)"""
+    return load_onnx_preprocessor(float_path) or ImagePreprocessor.from_processor(load_processor())
+
+
+def _preprocess(preprocessor, image_paths, batch_size=8):
+    """Decode and preprocess images into float32 batches, skipping files that cannot be read"""
+    decoded = []
+    for path in image_paths:
+        try:
+            decoded.append(preprocessor.decode(path))
+        except Exception as e:
+            print(f"Skipping {path}: {str(e)}")
+    batches = []
+    for start in range(0, len(decoded), batch_size):
+        images = decoded[start:start + batch_size]
+        # The preprocessor reuses its buffer, so every batch needs its own array
+        out = np.empty((len(images), 3) + preprocessor.crop_size, dtype=np.float32)
+        batches.append(preprocessor.to_batch(images, out=out))
+    return batches
+
+
+class _CalibrationReader:
+    """Feeds preprocessed sample leaves to the static quantizer one batch at a time"""
+
+    def __init__(self, input_name, batches):
+        self.input_name = input_name
+        self._batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self._batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+    def rewind(self):
+        pass
+
+
+def quantize_model(float_path=onnx_model_path, output_path=onnx_int8_model_path, calibration_images=None,
+                   calibration_size=64, preprocessor=None):
+    """
+    Quantize the float ONNX model to int8
+
+    Without calibration images the weights are quantized ahead of time and
+    activations per batch at run time (dynamic). With calibration images,
+    activation ranges are fixed from those samples (static, QDQ format),
+    which is usually faster on CPU.
+
+    Args:
+        float_path: Float ONNX model written by export_disease_onnx
+        output_path: Where to write the int8 model
+        calibration_images: Sample leaf images for static quantization, or None for dynamic
+        calibration_size: Maximum number of calibration images to use
+        preprocessor: ImagePreprocessor for the calibration images (default: the one exported with float_path)
+
+    Returns:
+        str: Path of the quantized model
+    """
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # Fold constants and infer shapes first so more of the graph can be quantized
+    prepared_path = output_path + ".prep"
+    try:
+        quant_pre_process(float_path, prepared_path)
+    except Exception as e:
+        print(f"Skipping pre-processing: {str(e)}")
+        shutil.copyfile(float_path, prepared_path)
+
+    try:
+        if calibration_images:
+            if preprocessor is None:
+                preprocessor = _load_preprocessor(float_path)
+            batches = _preprocess(preprocessor, calibration_images[:calibration_size])
+            if not batches:
+                raise ValueError("No readable calibration images")
+            input_name = OnnxBackend(float_path).input_name
+            quantize_static(prepared_path, output_path, _CalibrationReader(input_name, batches),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+            mode = f"static, {sum(len(b) for b in batches)} calibration images"
+        else:
+            quantize_dynamic(prepared_path, output_path, weight_type=QuantType.QUInt8)
+            mode = "dynamic"
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+
+    shutil.copyfile(onnx_labels_path(float_path), onnx_labels_path(output_path))
+    if os.path.exists(onnx_preprocessor_path(float_path)):
+        shutil.copyfile(onnx_preprocessor_path(float_path), onnx_preprocessor_path(output_path))
+    print(f"Wrote int8 model ({mode}) to {output_path}: "
+          f"{os.path.getsize(float_path) / 1e6:.1f} MB -> {os.path.getsize(output_path) / 1e6:.1f} MB")
+    return output_path
+
+
+def _measure(backend_name, model_path, batches, threads):
+    """
+    Run one model over the batches in a fresh process, so its memory is not
+    mixed up with the other model's
+
+    Returns:
+        dict: Probabilities, per-image latency, resident memory after loading
+        and the growth caused by loading and running the model
+    """
+    rss_before = _current_rss() or 0
+    if backend_name == "torch":
+        import torch
+        torch.set_num_threads(threads or torch.get_num_threads())
+        detector = PlantDiseaseDetector(backend="torch")
+        if not detector.load_model():
+            raise RuntimeError("Failed to load plant disease detection model")
+        backend = detector.backend
+    else:
+        backend = OnnxBackend(model_path, threads)
+
+    # One untimed pass so lazy initialisation does not count as latency
+    backend.probabilities(batches[0][:1])
+
+    probabilities = []
+    elapsed = 0.0
+    for pixel_values in batches:
+        start = time.perf_counter()
+        probabilities.append(backend.probabilities(pixel_values))
+        elapsed += time.perf_counter() - start
+    rss_after = _current_rss() or 0
+
+    images = sum(len(b) for b in batches)
+    return {
+        "probabilities": np.concatenate(probabilities),
+        "ms_per_image": elapsed * 1000 / images,
+        "rss_mb": rss_after / 1e6,
+        "model_rss_mb": (rss_after - rss_before) / 1e6,
+    }
+
+
+def compare_models(image_paths, baseline="onnx", float_path=onnx_model_path, int8_path=onnx_int8_model_path,
+                   batch_size=1, threads=0, preprocessor=None):
+    """
+    Compare the int8 model against the float model on the same images
+
+    Args:
+        image_paths: Images to compare on
+        baseline: Float model to compare against, "onnx" (float_path) or "torch"
+        float_path: Float ONNX model
+        int8_path: Quantized ONNX model
+        batch_size: Images per forward pass (1 matches the interactive pages)
+        threads: Intra-op threads for both models (0 for the runtime default)
+        preprocessor: ImagePreprocessor for the images (default: the one exported with float_path)
+
+    Returns:
+        dict: Images compared, top-1 and top-3 agreement, mean and max
+        probability difference, and latency and memory of both models
+    """
+    if preprocessor is None:
+        preprocessor = _load_preprocessor(float_path)
+    batches = _preprocess(preprocessor, image_paths, batch_size)
+    if not batches:
+        raise ValueError("No readable images to compare on")
+
+    # Each model gets its own process so resident memory is measured in isolation
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        reference = executor.submit(_measure, baseline, float_path, batches, threads).result()
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        quantized = executor.submit(_measure, "onnx", int8_path, batches, threads).result()
+
+    expected = reference["probabilities"]
+    actual = quantized["probabilities"]
+    top3_expected = np.argsort(-expected, axis=1, kind="stable")[:, :3]
+    top3_actual = np.argsort(-actual, axis=1, kind="stable")[:, :3]
+    diff = np.abs(expected - actual)
+
+    return {
+        "images": len(expected),
+        "top1_agreement": float(np.mean(top3_expected[:, 0] == top3_actual[:, 0])),
+        # The same three classes in the same order
+        "top3_agreement": float(np.mean(np.all(top3_expected == top3_actual, axis=1))),
+        "mean_probability_diff": float(diff.mean()),
+        "max_probability_diff": float(diff.max()),
+        "float_ms_per_image": reference["ms_per_image"],
+        "int8_ms_per_image": quantized["ms_per_image"],
+        "float_rss_mb": reference["rss_mb"],
+        "int8_rss_mb": quantized["rss_mb"],
+        "float_model_rss_mb": reference["model_rss_mb"],
+        "int8_model_rss_mb": quantized["model_rss_mb"],
+        "float_file_mb": os.path.getsize(float_path) / 1e6 if baseline == "onnx" else None,
+        "int8_file_mb": os.path.getsize(int8_path) / 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize the plant disease model to int8 and report the trade-off")
+    parser.add_argument("--input", default=onnx_model_path, help=f"Float ONNX model (default: {onnx_model_path})")
+    parser.add_argument("--output", default=onnx_int8_model_path, help=f"Int8 model to write (default: {onnx_int8_model_path})")
+    parser.add_argument("--static", metavar="CALIBRATION_DIR", default=None,
+                        help="Use static quantization calibrated on the images in CALIBRATION_DIR")
+    parser.add_argument("--calibration-size", type=int, default=64, help="Calibration images to use (default: 64)")
+    parser.add_argument("--report", metavar="IMAGE_DIR", default=None,
+                        help="Compare the int8 model against the float model on IMAGE_DIR instead of quantizing")
+    parser.add_argument("--baseline", choices=["onnx", "torch"], default="onnx",
+                        help="Float model to compare against (default: onnx)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Images per forward pass in the report (default: 1)")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads in the report (default: runtime default)")
+    args = parser.parse_args(argv)
+
+    from backend.leaf_scanner import find_images
+    if args.report:
+        report = compare_models(find_images(args.report), baseline=args.baseline, float_path=args.input,
+                                int8_path=args.output, batch_size=args.batch_size, threads=args.threads)
+        for key, value in report.items():
+            print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    else:
+        calibration_images = find_images(args.static) if args.static else None
+        quantize_model(args.input, args.output, calibration_images, args.calibration_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Admission control in front of the plant disease and soil models.
+
+Without a limit, a spike of uploads queues up behind the models until every
+user times out together. The schedulers here bound that:
+
+    - the queue holds at most {PREFIX}_QUEUE_SIZE requests; beyond that new
+      requests are shed at once with a "busy" result (an interactive request
+      first evicts the newest queued batch request instead)
+    - every request has a deadline ({PREFIX}_DEADLINE_S by default); one
+      still waiting when it passes is dropped rather than run for nobody
+    - interactive requests are always served before batch requests
+    - once {PREFIX}_DEGRADE_AT requests are waiting, or the full model is
+      not expected to finish before a request's deadline, batches are served
+      by a cheaper model: the soil fallback classifier, or the int8 ONNX
+      disease model when one has been built
+
+Shed, expired and degraded requests are counted in stats(). Results are
+the usual result dicts; shed ones carry "shed": True and degraded ones
+"degraded": True.
+"""
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import Future
+
+from backend.micro_batcher import MicroBatcher, _Request as _BatchRequest, batcher_settings
+
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+
+class _Request(_BatchRequest):
+    __slots__ = ("priority", "seq", "deadline")
+
+    def __init__(self, priority, seq, item, future, deadline):
+        super().__init__(item, future)
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+
+    def __lt__(self, other):
+        # Higher priority first, then first come first served
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RequestScheduler(MicroBatcher):
+    """
+    Bounded priority queue with deadlines and load shedding in front of a batch inference function.
+
+    Batching is the MicroBatcher's: worker threads collect waiting requests
+    into batches of up to max_batch_size, waiting up to max_wait_ms for more
+    after the first, and run the batch function once per batch, so
+    concurrent uploads share one forward pass.
+    """
+
+    def __init__(self, batch_fn, degraded_fn=None, max_queue=64, degrade_at=16, deadline=10.0,
+                 max_batch_size=16, max_wait_ms=10, workers=1, name="scheduler", degraded_available=None):
+        """
+        Args:
+            batch_fn: Callable taking a list of items and returning a list of results in the same order
+            degraded_fn: Cheaper callable with the same signature, used under load (None never degrades)
+            max_queue: Most requests waiting at once; further ones are shed
+            degrade_at: Queue depth from which batches go to degraded_fn
+            deadline: Default seconds a request may wait before it is dropped
+            max_batch_size: Maximum number of items per batch
+            max_wait_ms: How long to wait for more items after the first one arrives
+            workers: Number of worker threads running batches concurrently
+            name: Name used for the worker threads
+            degraded_available: Callable telling whether degraded_fn can be used right now,
+                checked each time a batch would degrade (None: always)
+        """
+        super().__init__(batch_fn, max_batch_size, max_wait_ms, workers, name)
+        self.degraded_fn = degraded_fn
+        self.degraded_available = degraded_available
+        self.max_queue = max(1, int(max_queue))
+        self.degrade_at = max(1, int(degrade_at))
+        self.deadline = float(deadline)
+        # Waiting requests are a heap ordered by priority, then arrival
+        self._pending = []
+        self._seq = itertools.count()
+        # Smoothed seconds per batch of the full model, to tell whether it can still meet a deadline
+        self._latency = None
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "shed": 0, "expired": 0, "degraded": 0, "batches": 0}
+
+    def _push(self, request):
+        heapq.heappush(self._pending, request)
+
+    def _pop(self):
+        return heapq.heappop(self._pending)
+
+    def submit(self, item, priority=INTERACTIVE, deadline=None):
+        """
+        Queue one item for inference
+
+        Args:
+            item: Item passed to the batch function
+            priority: INTERACTIVE or BATCH
+            deadline: Seconds the request may wait in the queue (default: the scheduler's)
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result for this item
+        """
+        self._ensure_started()
+        future = Future()
+        timeout = self.deadline if deadline is None else float(deadline)
+        request = _Request(priority, next(self._seq), item, future, time.monotonic() + timeout)
+        shed = None
+        with self._cond:
+            self._counts["submitted"] += 1
+            if len(self._pending) >= self.max_queue:
+                shed = request
+                if priority == INTERACTIVE:
+                    # Make room by dropping the most recently queued batch request, if any
+                    queued_batch = [r for r in self._pending if r.priority == BATCH]
+                    if queued_batch:
+                        shed = max(queued_batch, key=lambda r: r.seq)
+                        self._pending.remove(shed)
+                        heapq.heapify(self._pending)
+                self._counts["shed"] += 1
+            if shed is not request:
+                self._push(request)
+                self._cond.notify()
+        if shed is not None:
+            shed.future.set_result({
+                "success": False,
+                "error": "The server is busy, please try again in a moment",
+                "shed": True,
+            })
+        return future
+
+    def run(self, item, priority=INTERACTIVE, deadline=None):
+        """Submit one item and block until its result is ready"""
+        return self.submit(item, priority, deadline).result()
+
+    def _process(self, batch, depth):
+        # Drop requests whose deadline passed while queued, and callers that cancelled
+        now = time.monotonic()
+        live = []
+        expired = []
+        for request in batch:
+            if request.deadline <= now:
+                expired.append(request)
+            elif request.future.set_running_or_notify_cancel():
+                live.append(request)
+        for request in expired:
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_result({
+                    "success": False,
+                    "error": "The request timed out waiting for the model, please try again",
+                    "shed": True,
+                })
+        if not live:
+            with self._cond:
+                self._counts["expired"] += len(expired)
+            return
+
+        slack = min(request.deadline for request in live) - now
+        degrade = self.degraded_fn is not None and (
+            depth >= self.degrade_at or (self._latency is not None and slack < self._latency)
+        ) and (self.degraded_available is None or self.degraded_available())
+
+        start = time.perf_counter()
+        results = self._call(self.degraded_fn if degrade else self.batch_fn, live)
+        elapsed = time.perf_counter() - start
+
+        if results is not None:
+            for request, result in zip(live, results):
+                if degrade and isinstance(result, dict):
+                    result = dict(result, degraded=True)
+                request.future.set_result(result)
+
+        with self._cond:
+            self._counts["expired"] += len(expired)
+            self._counts["batches"] += 1
+            if results is None:
+                # A model that fails fast must not look fast, or it would never be degraded away from
+                self._counts["failed"] += len(live)
+            elif degrade:
+                self._counts["completed"] += len(live)
+                self._counts["degraded"] += len(live)
+            else:
+                self._counts["completed"] += len(live)
+                self._latency = elapsed if self._latency is None else 0.8 * self._latency + 0.2 * elapsed
+
+    def stats(self):
+        """
+        Returns:
+            dict: Requests submitted, completed, failed (the model raised), shed
+            (queue full or deadline passed), expired, degraded, batches run,
+            queue depth and the smoothed full-model batch latency in seconds
+        """
+        with self._cond:
+            stats = dict(self._counts)
+            stats["shed"] += stats["expired"]
+            stats["queue_depth"] = len(self._pending)
+            stats["batch_latency"] = self._latency
+            return stats
+
+
+def scheduler_settings(prefix, max_queue=64, degrade_at=16, deadline=10.0, **batcher_defaults):
+    """
+    Read scheduler settings from environment variables
+
+    For a prefix of DISEASE the variables are DISEASE_QUEUE_SIZE,
+    DISEASE_DEGRADE_AT and DISEASE_DEADLINE_S, plus the batcher_settings
+    variables (DISEASE_BATCH_SIZE, DISEASE_BATCH_WAIT_MS, DISEASE_BATCH_WORKERS).
+
+    Returns:
+        dict: Keyword arguments for RequestScheduler
+    """
+    settings = batcher_settings(prefix, **batcher_defaults)
+    settings.update({
+        "max_queue": int(os.environ.get(f"{prefix}_QUEUE_SIZE", max_queue)),
+        "degrade_at": int(os.environ.get(f"{prefix}_DEGRADE_AT", degrade_at)),
+        "deadline": float(os.environ.get(f"{prefix}_DEADLINE_S", deadline)),
+    })
+    return settings
+
+
+def _detect_disease(images):
+    from backend.model_server import model_server_client
+    if model_server_client.enabled:
+        return model_server_client.detect_disease_batch(images)
+    from backend.disease_detection import disease_detector
+    return disease_detector.detect_disease_batch(images)
+
+
+def _detect_disease_quantized(images):
+    from backend.model_server import model_server_client
+    if model_server_client.enabled:
+        return model_server_client.detect_disease_batch(images, quantized=True)
+    from backend.disease_detection import quantized_disease_detector
+    return quantized_disease_detector.detect_disease_batch(images)
+
+
+def _classify_soil(images):
+    from backend.model_server import model_server_client
+    if model_server_client.enabled:
+        return model_server_client.classify_soil_batch(images)
+    from backend.soil_classifier import soil_classifier
+    return soil_classifier.classify_soil_batch(images)
+
+
+def _classify_soil_fallback(images):
+    from backend.soil_classifier import soil_classifier
+    return soil_classifier.classify_soil_batch(images, fallback=True)
+
+
+def _quantized_disease_available():
+    """Whether the int8 model has been built (checked per batch, so one built after start-up is used)"""
+    from backend.disease_detection import quantized_model_available
+    return quantized_model_available()
+
+
+# Create the schedulers for the image models (configured with the DISEASE_* and SOIL_* variables)
+disease_scheduler = RequestScheduler(_detect_disease, _detect_disease_quantized, name="disease-scheduler",
+                                     degraded_available=_quantized_disease_available,
+                                     **scheduler_settings("DISEASE", max_batch_size=16, max_wait_ms=10, workers=1))
+soil_scheduler = RequestScheduler(_classify_soil, _classify_soil_fallback, name="soil-scheduler",
+                                  **scheduler_settings("SOIL", max_batch_size=16, max_wait_ms=10, workers=1))
@@ -0,0 +1,189 @@
+"""
+Content-addressed cache for image model results.
+
+Entries are keyed by the SHA-256 of the image bytes together with a model
+version string, so re-submitting the same photo skips decoding and
+inference, and any change of model (or backend) starts from a clean slate.
+Results are held as JSON in a size-bounded in-memory LRU, optionally backed
+by a size-bounded SQLite file shared between app processes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend.ttl_cache import cache_dir
+
+
+def read_image_bytes(image_path_or_bytes):
+    """
+    Return the raw bytes of an image given as a path, file-like object or bytes
+
+    File-like objects are rewound afterwards so they can still be decoded.
+    Returns None for inputs that have no byte representation (decoded PIL images).
+    """
+    if isinstance(image_path_or_bytes, (bytes, bytearray)):
+        return bytes(image_path_or_bytes)
+    if isinstance(image_path_or_bytes, str):
+        with open(image_path_or_bytes, "rb") as f:
+            return f.read()
+    if hasattr(image_path_or_bytes, "read"):
+        position = image_path_or_bytes.tell() if hasattr(image_path_or_bytes, "tell") else None
+        data = image_path_or_bytes.read()
+        if position is not None:
+            image_path_or_bytes.seek(position)
+        return data
+    return None
+
+
+def file_version(path):
+    """Cheap version string for a model file: its size and modification time"""
+    try:
+        stat = os.stat(path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return "missing"
+
+
+class ResultCache:
+    def __init__(self, name, max_memory_bytes=32 << 20, db_path=None, max_disk_bytes=256 << 20):
+        """
+        Args:
+            name: Namespace of the entries (one SQLite table per name)
+            max_memory_bytes: Size of the in-memory tier (least recently used are evicted)
+            db_path: SQLite file for the on-disk tier, or None for memory only
+            max_disk_bytes: Size of the on-disk tier
+        """
+        self.name = name
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.db_path = db_path
+        self._memory = OrderedDict()    # key -> JSON text
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if db_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            try:
+                self._db.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" ('
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key_for(data, model_version):
+        """Cache key of an image's bytes under a model version"""
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{model_version}:{digest}"
+
+    def _remember(self, key, text):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = text
+        self._memory_bytes += len(text)
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return a fresh copy of the cached result for key, or None"""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(text)
+            if self._db is not None:
+                row = self._db.execute(f'SELECT value FROM "{self.name}" WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self._db.execute(f'UPDATE "{self.name}" SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable result for key"""
+        text = json.dumps(value)
+        with self._lock:
+            self._remember(key, text)
+            if self._db is not None:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, text, len(text), time.time())
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _evict_disk(self):
+        total = self._db.execute(f'SELECT COALESCE(SUM(size), 0) FROM "{self.name}"').fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used rows until the table fits again
+        excess = total - self.max_disk_bytes
+        freed = 0
+        stale = []
+        for key, size in self._db.execute(f'SELECT key, size FROM "{self.name}" ORDER BY last_access'):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany(f'DELETE FROM "{self.name}" WHERE key = ?', stale)
+        self.evictions += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}"')
+                self._db.commit()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hits per tier, misses, hit rate, evictions and memory use
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+
+def result_cache_settings(prefix, memory_mb=32, disk_mb=0):
+    """
+    Read cache sizes from {prefix}_CACHE_MEMORY_MB and {prefix}_CACHE_DISK_MB
+
+    A disk size of 0 keeps the cache in memory only.
+    """
+    memory_mb = float(os.environ.get(f"{prefix}_CACHE_MEMORY_MB", memory_mb))
+    disk_mb = float(os.environ.get(f"{prefix}_CACHE_DISK_MB", disk_mb))
+    return {
+        "max_memory_bytes": int(memory_mb * (1 << 20)),
+        "db_path": os.path.join(cache_dir, "results.sqlite3") if disk_mb > 0 else None,
+        "max_disk_bytes": int(disk_mb * (1 << 20)),
+    }
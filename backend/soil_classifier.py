@@ -1,50 +1,108 @@
-try:
-    import tensorflow as tf
-    TF_AVAILABLE = True
-except ImportError:
+import importlib.util
+
+# Only check that TensorFlow is installed here; importing it takes seconds,
+# so that happens when the model is first loaded
+TF_AVAILABLE = importlib.util.find_spec("tensorflow") is not None
+if not TF_AVAILABLE:
     print("TensorFlow not available. Using fallback classification.")
-    TF_AVAILABLE = False
+tf = None
 
 import numpy as np
 from PIL import Image
 import os
 import io
 import random
+import threading
+from concurrent.futures import Future
+from backend.inference_threads import configure_tensorflow_threads
+from backend.result_cache import ResultCache, read_image_bytes, file_version, result_cache_settings
 
 # Cache directory for the model
 model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
 model_path = os.path.join(model_dir, "soil_type_classifier.keras")
 
+
+def _import_tensorflow():
+    """Import TensorFlow into the module namespace on first use"""
+    global tf
+    if tf is None:
+        import tensorflow
+        # Thread pools can only be sized before TensorFlow runs anything
+        configure_tensorflow_threads(tensorflow)
+        tf = tensorflow
+    return tf
+
+
 class SoilTypeClassifier:
-    def __init__(self):
+    def __init__(self, result_cache=None):
         self.model = None
         self.labels = [
             "Clay", "Loamy", "Sandy", "Silty", "Peaty", "Chalky"
         ]
+        self._forward = None
+        self.result_cache = result_cache
         self.initialized = False
+        self._load_lock = threading.Lock()
+        self._loading = None
 
     def load_model(self):
-        """Load the model only when needed to save memory"""
+        """
+        Load the model only when needed to save memory
+
+        Safe to call from many threads: one caller loads the model while the
+        others wait for its outcome instead of loading their own copy.
+        """
         if not TF_AVAILABLE:
             print("TensorFlow not available. Using fallback classification.")
             return False
+        if self.initialized:
+            return True
+
+        with self._load_lock:
+            future = self._loading
+            leader = future is None
+            if leader:
+                future = Future()
+                self._loading = future
+        if not leader:
+            return future.result()
 
-        if not self.initialized:
-            try:
-                print("Loading soil type classification model...")
-                self.model = tf.keras.models.load_model(model_path)
-                self.initialized = True
-                print("Soil classification model loaded successfully.")
-                return True
-            except Exception as e:
-                print(f"Error loading soil model: {str(e)}")
-                return False
-        return True
+        try:
+            loaded = self._load()
+            future.set_result(loaded)
+            return loaded
+        finally:
+            with self._load_lock:
+                self._loading = None
+
+    def _load(self):
+        # A previous leader may have finished between our check and taking the lead
+        if self.initialized:
+            return True
+        try:
+            print("Loading soil type classification model...")
+            _import_tensorflow()
+            model = tf.keras.models.load_model(model_path)
+            # Traced once for any batch size; calling it skips model.predict's per-call setup
+            forward = tf.function(
+                lambda batch: model(batch, training=False),
+                input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)]
+            )
+            # Publish both before flagging the classifier as ready
+            self.model = model
+            self._forward = forward
+            self.initialized = True
+            print("Soil classification model loaded successfully.")
+            return True
+        except Exception as e:
+            print(f"Error loading soil model: {str(e)}")
+            return False
 
     def preprocess_image(self, image):
         """Preprocess image for the model"""
         if not TF_AVAILABLE:
             return None
+        _import_tensorflow()
 
         # Resize to the expected input size (assumed to be 224x224, adjust if different)
         target_size = (224, 224)
@@ -57,6 +115,74 @@ class SoilTypeClassifier:
 
         return img_array
 
+    def preprocess_batch(self, images):
+        """Preprocess a list of PIL images into one (N, 224, 224, 3) float32 array"""
+        batch = np.empty((len(images), 224, 224, 3), dtype=np.float32)
+        for i, image in enumerate(images):
+            batch[i] = self.preprocess_image(image)[0]
+        return batch
+
+    def model_version(self):
+        """Identifies the classifier that produces results, for the result cache key"""
+        if TF_AVAILABLE and self.load_model():
+            return f"keras:{file_version(model_path)}"
+        return "fallback"
+
+    def _open_image(self, image_path_or_bytes):
+        """Open a path, file-like object or raw bytes as an RGB PIL image"""
+        # Check if input is a file path, bytes stream, or raw bytes
+        if isinstance(image_path_or_bytes, str):
+            # Handle path string
+            return Image.open(image_path_or_bytes).convert("RGB")
+        elif hasattr(image_path_or_bytes, 'read'):
+            # Handle BytesIO or file-like object
+            return Image.open(image_path_or_bytes).convert("RGB")
+        else:
+            # Handle raw bytes
+            return Image.open(io.BytesIO(image_path_or_bytes)).convert("RGB")
+
+    def _predict(self, images):
+        """Return the unsorted per-class results for each decoded image"""
+        # If TensorFlow is available, use the model
+        if TF_AVAILABLE and self.load_model():
+            return self.predict_tensor(self.preprocess_batch(images))
+
+        # Fallback: Use image characteristics for a rough estimation
+        # This is a simplified approach that analyzes image colors/textures
+        return self._fallback_classifier_batch(images)
+
+    def predict_tensor(self, batch):
+        """
+        Return the unsorted per-class results for preprocessed images
+
+        Args:
+            batch: float32 array of shape (N, 224, 224, 3) scaled to [0, 1]
+        """
+        # One forward pass for the whole batch
+        predictions = self._forward(tf.convert_to_tensor(batch)).numpy()
+        # Convert probabilities to percentages
+        return self._per_class_results(predictions * 100)
+
+    def _per_class_results(self, confidences):
+        """Per-class result lists for each row of (N, 6) confidences in percent"""
+        return [
+            [{"soil_type": label, "confidence": float(c)} for label, c in zip(self.labels, row)]
+            for row in confidences
+        ]
+
+    def _build_result(self, results):
+        # Sort results by confidence (highest first)
+        results = sorted(results, key=lambda x: x["confidence"], reverse=True)
+
+        # Get soil characteristics
+        soil_info = self.get_soil_characteristics(results[0]["soil_type"])
+
+        return {
+            "success": True,
+            "predictions": results,
+            "soil_characteristics": soil_info
+        }
+
     def classify_soil(self, image_path_or_bytes):
         """
         Classify soil type from an image
@@ -67,120 +193,140 @@ class SoilTypeClassifier:
         Returns:
             dict: Top soil type predictions with probabilities
         """
-        try:
-            # Check if input is a file path, bytes stream, or raw bytes
-            if isinstance(image_path_or_bytes, str):
-                # Handle path string
-                image = Image.open(image_path_or_bytes).convert("RGB")
-            elif hasattr(image_path_or_bytes, 'read'):
-                # Handle BytesIO or file-like object
-                image = Image.open(image_path_or_bytes).convert("RGB")
-            else:
-                # Handle raw bytes
-                image = Image.open(io.BytesIO(image_path_or_bytes)).convert("RGB")
-
-            # If TensorFlow is available, use the model
-            if TF_AVAILABLE and self.load_model():
-                # Preprocess image
-                preprocessed_img = self.preprocess_image(image)
-
-                # Make prediction
-                predictions = self.model.predict(preprocessed_img)
-
-                # Get predicted class probabilities
-                results = []
-                for i, prob in enumerate(predictions[0]):
-                    results.append({
-                        "soil_type": self.labels[i],
-                        "confidence": float(prob * 100)  # Convert to percentage
-                    })
-            else:
-                # Fallback: Use image characteristics for a rough estimation
-                # This is a simplified approach that analyzes image colors/textures
-                results = self._fallback_classifier(image)
-
-            # Sort results by confidence (highest first)
-            results = sorted(results, key=lambda x: x["confidence"], reverse=True)
-
-            # Get soil characteristics
-            soil_info = self.get_soil_characteristics(results[0]["soil_type"])
-
-            return {
-                "success": True,
-                "predictions": results,
-                "soil_characteristics": soil_info
-            }
+        return self.classify_soil_batch([image_path_or_bytes])[0]
 
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+    def classify_soil_batch(self, images, batch_size=64, fallback=False):
+        """
+        Classify soil types for many images, one forward pass per batch_size images
+
+        Args:
+            images: List of image paths, file-like objects or bytes
+            batch_size: Images preprocessed and run through the model together
+            fallback: Use the fallback classifier even if the model is available
+                (a cheap answer under heavy load)
+
+        Returns:
+            list: One result dict per image, in the same format as classify_soil
+        """
+        results = [None] * len(images)
+        cache_keys = [None] * len(images)
+        decoded = []
+        if fallback:
+            model_version = "fallback"
+        else:
+            model_version = self.model_version() if self.result_cache is not None else None
+        for i, image_path_or_bytes in enumerate(images):
+            try:
+                # Images seen before under the same model are answered without decoding
+                if self.result_cache is not None:
+                    data = read_image_bytes(image_path_or_bytes)
+                    if data is not None:
+                        cache_keys[i] = self.result_cache.key_for(data, model_version)
+                        cached = self.result_cache.get(cache_keys[i])
+                        if cached is not None:
+                            results[i] = cached
+                            continue
+                        if not isinstance(image_path_or_bytes, str):
+                            image_path_or_bytes = io.BytesIO(data)
+                decoded.append((i, self._open_image(image_path_or_bytes)))
+            except Exception as e:
+                # A broken image only fails its own result
+                results[i] = {
+                    "success": False,
+                    "error": str(e)
+                }
+
+        for start in range(0, len(decoded), batch_size):
+            chunk = decoded[start:start + batch_size]
+            try:
+                chunk_images = [image for _, image in chunk]
+                if fallback:
+                    predictions = self._fallback_classifier_batch(chunk_images)
+                else:
+                    predictions = self._predict(chunk_images)
+                for (i, _), image_results in zip(chunk, predictions):
+                    results[i] = self._build_result(image_results)
+                    if cache_keys[i] is not None:
+                        self.result_cache.put(cache_keys[i], results[i])
+            except Exception as e:
+                for i, _ in chunk:
+                    results[i] = {
+                        "success": False,
+                        "error": str(e)
+                    }
+
+        return results
+
+    # Base confidences (Clay, Loamy, Sandy, Silty, Peaty, Chalky) for each colour rule of
+    # the fallback classifier, in the order the rules are checked; the last row is the default
+    _fallback_base_confidences = np.array([
+        [65, 15, 5, 5, 5, 5],   # Dark brown -> likely Clay
+        [10, 15, 55, 10, 5, 5],  # Light brown or beige -> likely Sandy
+        [15, 55, 15, 5, 5, 5],  # Dark with some red tint -> likely Loamy
+        [10, 10, 15, 55, 5, 5],  # Grayish -> likely Silty
+        [10, 15, 5, 10, 55, 5],  # Dark with organic look -> likely Peaty
+        [5, 5, 10, 15, 5, 60],  # Light colored -> likely Chalky
+        [25, 35, 20, 10, 5, 5],  # Balanced distribution with slight preference for common soils
+    ], dtype=np.float64)
 
     def _fallback_classifier(self, image):
         """
         Fallback classifier that uses basic image analysis when TensorFlow is not available
         """
-        # Analyze image to get basic color features
-        img_array = np.array(image.resize((100, 100)))
+        return self._fallback_classifier_batch([image])[0]
 
-        # Extract basic color features
-        avg_color = np.mean(img_array, axis=(0, 1))
-        r, g, b = avg_color
+    def _fallback_classifier_batch(self, images):
+        """Fallback classification of several PIL images (see fallback_confidences)"""
+        # Analyze images at a common 100x100 size so they stack into one array
+        stack = np.stack([np.asarray(image.resize((100, 100))) for image in images])
+        # Create prediction results
+        return self._per_class_results(self.fallback_confidences(stack))
+
+    def fallback_confidences(self, stack):
+        """
+        Estimate soil type confidences from basic colour features
+
+        Args:
+            stack: uint8 array of N RGB images, shape (N, H, W, 3)
+
+        Returns:
+            np.ndarray: (N, 6) confidences in percent, in the order of self.labels
+        """
+        # Extract basic color features for the whole stack at once. Integer sums are
+        # exact, so this equals a per-image np.mean; summing one channel at a time is
+        # several times faster than reducing over the middle axis of (N, H*W, 3)
+        pixels = stack.reshape(len(stack), -1, 3)
+        sums = np.stack([pixels[:, :, channel].sum(axis=1, dtype=np.int64) for channel in range(3)], axis=1)
+        avg_color = sums / pixels.shape[1]
 
         # Calculate basic color ratios
-        r_ratio = r / 255.0
-        g_ratio = g / 255.0
-        b_ratio = b / 255.0
-
-        # Add some randomness to make predictions look realistic
-        # but still be somewhat consistent for the same image
-        random.seed(int(sum(avg_color)))
-
-        # Create base confidences that sum to 100 (roughly)
-        confidences = []
-
-        # Dark brown -> likely Clay
-        if r_ratio < 0.5 and g_ratio < 0.4 and b_ratio < 0.4:
-            confidences = [65, 15, 5, 5, 5, 5]
-        # Light brown or beige -> likely Sandy
-        elif r_ratio > 0.5 and g_ratio > 0.4 and b_ratio < 0.4:
-            confidences = [10, 15, 55, 10, 5, 5]
-        # Dark with some red tint -> likely Loamy
-        elif r_ratio > 0.4 and g_ratio < 0.4 and r_ratio > g_ratio:
-            confidences = [15, 55, 15, 5, 5, 5]
-        # Grayish -> likely Silty
-        elif abs(r_ratio - g_ratio) < 0.1 and abs(g_ratio - b_ratio) < 0.1:
-            confidences = [10, 10, 15, 55, 5, 5]
-        # Dark with organic look -> likely Peaty
-        elif r_ratio < 0.3 and g_ratio < 0.3 and b_ratio < 0.3:
-            confidences = [10, 15, 5, 10, 55, 5]
-        # Light colored -> likely Chalky
-        elif r_ratio > 0.6 and g_ratio > 0.6 and b_ratio > 0.6:
-            confidences = [5, 5, 10, 15, 5, 60]
-        else:
-            # Default to a balanced distribution with slight preference for common soils
-            confidences = [25, 35, 20, 10, 5, 5]
+        r_ratio, g_ratio, b_ratio = (avg_color / 255.0).T
+
+        # First matching rule wins, as in a chain of elif
+        rules = [
+            (r_ratio < 0.5) & (g_ratio < 0.4) & (b_ratio < 0.4),
+            (r_ratio > 0.5) & (g_ratio > 0.4) & (b_ratio < 0.4),
+            (r_ratio > 0.4) & (g_ratio < 0.4) & (r_ratio > g_ratio),
+            (np.abs(r_ratio - g_ratio) < 0.1) & (np.abs(g_ratio - b_ratio) < 0.1),
+            (r_ratio < 0.3) & (g_ratio < 0.3) & (b_ratio < 0.3),
+            (r_ratio > 0.6) & (g_ratio > 0.6) & (b_ratio > 0.6),
+        ]
+        rule = np.select(rules, np.arange(len(rules)), default=len(rules))
+        confidences = self._fallback_base_confidences[rule]
 
-        # Add some variation to make it look more realistic
-        confidences = [c + (random.random() * 10 - 5) for c in confidences]
+        # Add some variation to make predictions look realistic but consistent for
+        # the same image: each image seeds its own generator from its colour, so the
+        # process-wide random module is left alone
+        seeds = avg_color.sum(axis=1).astype(np.int64)
+        jitter = np.array([[rng.random() for _ in range(confidences.shape[1])]
+                           for rng in map(random.Random, seeds.tolist())]).reshape(confidences.shape)
+        confidences = confidences + (jitter * 10 - 5)
 
         # Ensure all confidences are positive
-        confidences = [max(1, c) for c in confidences]
+        confidences = np.maximum(confidences, 1)
 
         # Normalize to sum to 100
-        total = sum(confidences)
-        confidences = [c * 100 / total for c in confidences]
-
-        # Create prediction results
-        results = []
-        for i, label in enumerate(self.labels):
-            results.append({
-                "soil_type": label,
-                "confidence": confidences[i]
-            })
-
-        return results
+        return confidences * 100 / confidences.sum(axis=1, keepdims=True)
 
     def get_soil_characteristics(self, soil_type):
         """
@@ -282,8 +428,11 @@ class SoilTypeClassifier:
             "management_tips": ["Conduct a detailed soil test for more information"]
         })
 
-# Create a singleton instance
-soil_classifier = SoilTypeClassifier()
+# Create a singleton instance with a result cache
+# (sized with SOIL_CACHE_MEMORY_MB and SOIL_CACHE_DISK_MB, disk tier off by default)
+soil_classifier = SoilTypeClassifier(
+    result_cache=ResultCache("soil_results", **result_cache_settings("SOIL", memory_mb=16))
+)
 
 # For testing
 if __name__ == "__main__":
@@ -0,0 +1,237 @@
+"""
+Persistent spatial cache for SoilGrids topsoil properties.
+
+Coordinates are snapped to a square grid cell of cell_size degrees and each
+cell is fetched once, at its centre. Lookups for a point are answered from
+its own cell or, failing that, from the nearest cached cell within
+max_distance_cells, so neighbouring points never hit the API twice.
+
+Warm up a bounding box (min_lat min_lon max_lat max_lon) once, then serve it offline.
+The cells are warmed at SOIL_GRID_CELL_SIZE, the size the app looks them up at:
+    python -m backend.soil_grid_cache 8.0 74.8 12.8 77.5
+    SOIL_GRID_CELL_SIZE=0.05 python -m backend.soil_grid_cache 8.0 74.8 12.8 77.5
+"""
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.ttl_cache import cache_dir
+
+SOIL_PROPERTIES = ["ph", "organic_carbon", "clay", "sand", "silt"]
+
+
+class SoilGridCache:
+    def __init__(self, db_path, cell_size=0.01, max_distance_cells=1):
+        """
+        Args:
+            db_path: SQLite file holding the cells
+            cell_size: Grid cell size in degrees (0.01 is roughly 1 km)
+            max_distance_cells: How many cells away a cached neighbour may be used
+                for a point whose own cell is missing (0 disables neighbour lookups)
+        """
+        self.db_path = db_path
+        self.cell_size = float(cell_size)
+        self.max_distance_cells = int(max_distance_cells)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = 0
+        self.neighbour_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass
+        # The primary key doubles as the spatial index: cells are looked up by integer row/column
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS soil_cells ("
+            "cell_size REAL NOT NULL, cell_lat INTEGER NOT NULL, cell_lon INTEGER NOT NULL, "
+            "ph, organic_carbon, clay, sand, silt, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (cell_size, cell_lat, cell_lon))"
+        )
+        self._db.commit()
+
+    def cell_of(self, lat, lon):
+        """Return the integer (row, column) of the grid cell containing a point"""
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def cell_centre(self, cell):
+        return (round((cell[0] + 0.5) * self.cell_size, 6), round((cell[1] + 0.5) * self.cell_size, 6))
+
+    def _row_to_soil(self, row):
+        return dict(zip(SOIL_PROPERTIES, row))
+
+    def lookup(self, lat, lon):
+        """
+        Return cached soil data for a point without calling the API
+
+        Returns:
+            dict or None: Soil properties from the point's cell or the nearest cached neighbour
+        """
+        cell = self.cell_of(lat, lon)
+        columns = ", ".join(SOIL_PROPERTIES)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {columns} FROM soil_cells WHERE cell_size = ? AND cell_lat = ? AND cell_lon = ?",
+                (self.cell_size, cell[0], cell[1])
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                return self._row_to_soil(row)
+            if self.max_distance_cells <= 0:
+                return None
+
+            k = self.max_distance_cells
+            rows = self._db.execute(
+                f"SELECT cell_lat, cell_lon, {columns} FROM soil_cells "
+                "WHERE cell_size = ? AND cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?",
+                (self.cell_size, cell[0] - k, cell[0] + k, cell[1] - k, cell[1] + k)
+            ).fetchall()
+        if not rows:
+            return None
+
+        # Nearest neighbouring cell centre to the query point
+        def distance(r):
+            centre = self.cell_centre((r[0], r[1]))
+            return (centre[0] - lat) ** 2 + ((centre[1] - lon) * math.cos(math.radians(lat))) ** 2
+
+        nearest = min(rows, key=distance)
+        with self._lock:
+            self.neighbour_hits += 1
+        return self._row_to_soil(nearest[2:])
+
+    def store(self, cell, soil):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO soil_cells (cell_size, cell_lat, cell_lon, ph, organic_carbon, clay, sand, silt, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.cell_size, cell[0], cell[1]) + tuple(soil.get(p) for p in SOIL_PROPERTIES) + (time.time(),)
+            )
+            self._db.commit()
+
+    def has_cell(self, cell):
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM soil_cells WHERE cell_size = ? AND cell_lat = ? AND cell_lon = ?",
+                (self.cell_size, cell[0], cell[1])
+            ).fetchone() is not None
+
+    def get_or_fetch(self, lat, lon, fetch):
+        """
+        Return soil data for a point, calling fetch(lat, lon) for the cell centre on a miss
+
+        Concurrent misses for the same cell share one fetch.
+        """
+        soil = self.lookup(lat, lon)
+        if soil is not None:
+            return soil
+
+        cell = self.cell_of(lat, lon)
+        with self._lock:
+            future = self._in_flight.get(cell)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[cell] = future
+                self.misses += 1
+        if not leader:
+            return dict(future.result())
+
+        try:
+            soil = fetch(*self.cell_centre(cell))
+            self.store(cell, soil)
+            future.set_result(soil)
+            return dict(soil)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(cell, None)
+
+    def warm_up(self, min_lat, min_lon, max_lat, max_lon, fetch, workers=4, progress=True):
+        """
+        Fetch every missing cell of a bounding box
+
+        Args:
+            min_lat, min_lon, max_lat, max_lon: Bounding box in degrees
+            fetch: Callable(lat, lon) returning the soil dict for a point
+            workers: Concurrent requests to the upstream
+            progress: Print progress every 100 cells
+
+        Returns:
+            dict: Cells in the box, fetched now, already cached and failed
+        """
+        first = self.cell_of(min_lat, min_lon)
+        last = self.cell_of(max_lat, max_lon)
+        cells = [(r, c) for r in range(first[0], last[0] + 1) for c in range(first[1], last[1] + 1)]
+        missing = [cell for cell in cells if not self.has_cell(cell)]
+        summary = {"cells": len(cells), "cached": len(cells) - len(missing), "fetched": 0, "failed": 0}
+
+        def fetch_cell(cell):
+            self.store(cell, fetch(*self.cell_centre(cell)))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch_cell, cell) for cell in missing]
+            for done, future in enumerate(futures, start=1):
+                try:
+                    future.result()
+                    summary["fetched"] += 1
+                except Exception as e:
+                    summary["failed"] += 1
+                    print(f"Failed to fetch soil cell: {str(e)}")
+                if progress and done % 100 == 0:
+                    print(f"Fetched {done}/{len(missing)} soil cells")
+        return summary
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.neighbour_hits + self.misses
+            cells = self._db.execute(
+                "SELECT COUNT(*) FROM soil_cells WHERE cell_size = ?", (self.cell_size,)
+            ).fetchone()[0]
+            return {
+                "hits": self.hits,
+                "neighbour_hits": self.neighbour_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.neighbour_hits) / total if total else 0.0,
+                "cells": cells,
+            }
+
+
+# Create a singleton cache (SOIL_GRID_CELL_SIZE degrees, SOIL_GRID_MAX_DISTANCE_CELLS neighbour radius)
+soil_grid_cache = SoilGridCache(
+    os.path.join(cache_dir, "soil_grid.sqlite3"),
+    cell_size=float(os.environ.get("SOIL_GRID_CELL_SIZE", 0.01)),
+    max_distance_cells=int(os.environ.get("SOIL_GRID_MAX_DISTANCE_CELLS", 1))
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm up the SoilGrids cache for a bounding box")
+    parser.add_argument("min_lat", type=float)
+    parser.add_argument("min_lon", type=float)
+    parser.add_argument("max_lat", type=float)
+    parser.add_argument("max_lon", type=float)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent SoilGrids requests (default: 4)")
+    args = parser.parse_args(argv)
+
+    from backend.api_services import fetch_soil_data
+    # Always the app's own cell size (SOIL_GRID_CELL_SIZE), or the warmed cells would never be read
+    print(f"Warming {soil_grid_cache.cell_size} degree cells")
+    summary = soil_grid_cache.warm_up(args.min_lat, args.min_lon, args.max_lat, args.max_lon, fetch_soil_data, workers=args.workers)
+    print(f"Done: {summary['cells']} cells, {summary['fetched']} fetched, "
+          f"{summary['cached']} already cached, {summary['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
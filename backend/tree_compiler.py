@@ -0,0 +1,419 @@
+"""
+Compiled evaluation of the tree ensembles (crop recommender and yield model).
+
+scikit-learn's predict goes through input validation, a joblib dispatch and
+one Cython call per tree, which costs far more than the arithmetic when a
+page asks about one row or a small batch. compile_model flattens every
+fitted tree of an ensemble into contiguous NumPy node arrays:
+
+    feature    intp     split feature of each node
+    threshold  float64  split threshold of each node (inf for leaves)
+    left       intp     left child; the right child is left + 1, leaves point at themselves
+    value      float64  (n_nodes, k) output of each node
+
+and evaluates the whole batch against all trees at once, one tree level per
+step. Decisions are made exactly as scikit-learn makes them (inputs cast to
+float32, x <= threshold goes left, NaN follows the node's missing-value
+direction), and the forest average and AdaBoost's weighted median are
+computed with the same operations in the same order, so the outputs are
+bit-identical.
+
+The registry compiles the crop and yield models when it loads them
+(TREE_COMPILE=0 turns this off). Batches larger than max_rows still go to
+scikit-learn, whose compiled loops win once the per-call overhead no longer
+dominates; TREE_COMPILE_MAX_ROWS overrides the per-model default.
+
+Compare against scikit-learn and time both:
+    python -m backend.tree_compiler
+    python -m backend.tree_compiler --rows 1 100 1000000 --output docs/tree_compiler_benchmark.txt
+"""
+import argparse
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Rows evaluated together; large batches are split into pieces of this size
+CHUNK_ROWS = 4096
+
+
+def _float32_threshold(threshold):
+    """
+    Largest float32 at or below each float64 threshold
+
+    For a float32 input x, x <= threshold exactly when x <= this value, so the
+    comparison can stay in float32.
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledTrees:
+    """
+    The nodes of several fitted trees laid out in shared contiguous arrays.
+
+    Nodes are renumbered breadth first with the two children of a node next
+    to each other, so the next node is left[node] + (x > threshold[node]).
+    Leaves have an infinite threshold and point at themselves.
+    """
+
+    def __init__(self, trees, values):
+        """
+        Args:
+            trees: Fitted sklearn.tree._tree.Tree objects (estimator.tree_)
+            values: Per tree, the (node_count, k) output of each node
+        """
+        n_nodes = sum(tree.node_count for tree in trees)
+        self.n_trees = len(trees)
+        self.roots = np.empty(self.n_trees, dtype=np.intp)
+        self.feature = np.zeros(n_nodes, dtype=np.intp)
+        self.threshold = np.full(n_nodes, np.inf, dtype=np.float64)
+        self.left = np.empty(n_nodes, dtype=np.intp)
+        self.missing_left = np.ones(n_nodes, dtype=bool)
+        self.value = np.empty((n_nodes, values[0].shape[1]), dtype=np.float64)
+        self.depth = max(tree.max_depth for tree in trees)
+        self.supports_missing = all(hasattr(tree, "missing_go_to_left") for tree in trees)
+
+        start = 0
+        for i, (tree, value) in enumerate(zip(trees, values)):
+            children_left = tree.children_left
+            children_right = tree.children_right
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            # order[j] is the original id of new node start + j
+            order = [0]
+            for original in order:
+                if children_left[original] != -1:
+                    order.append(children_left[original])
+                    order.append(children_right[original])
+            order = np.asarray(order, dtype=np.intp)
+            new_id = np.empty(tree.node_count, dtype=np.intp)
+            new_id[order] = np.arange(start, start + tree.node_count)
+
+            nodes = slice(start, start + tree.node_count)
+            is_split = children_left[order] != -1
+            self.left[nodes] = np.where(is_split, new_id[np.where(is_split, children_left[order], order)], new_id[order])
+            self.feature[nodes] = np.where(is_split, tree.feature[order], 0)
+            self.threshold[nodes] = np.where(is_split, tree.threshold[order], np.inf)
+            if missing_left is not None:
+                self.missing_left[nodes] = np.where(is_split, np.asarray(missing_left, dtype=bool)[order], True)
+            self.value[nodes] = value[order]
+            self.roots[i] = start
+            start += tree.node_count
+
+        self.is_leaf = self.left == np.arange(n_nodes)
+        self.threshold32 = _float32_threshold(self.threshold)
+
+    def leaves(self, X):
+        """
+        Leaf reached in every tree by every row
+
+        Args:
+            X: C-contiguous float32 array of shape (n_samples, n_features)
+
+        Returns:
+            np.ndarray: (n_samples, n_trees) node indices
+        """
+        n_samples, n_features = X.shape
+        out = np.empty(n_samples * self.n_trees, dtype=np.intp)
+        flat = X.ravel()
+        for start in range(0, n_samples, CHUNK_ROWS):
+            rows = min(CHUNK_ROWS, n_samples - start)
+            # One cell per (row, tree); cells whose tree has reached a leaf are dropped as they finish
+            cells = np.arange(start * self.n_trees, (start + rows) * self.n_trees)
+            nodes = np.tile(self.roots, rows)
+            offsets = cells // self.n_trees * n_features
+            has_missing = np.isnan(flat[start * n_features:(start + rows) * n_features]).any()
+            if self.depth == 0:
+                out[cells] = nodes
+            for level in range(self.depth):
+                x = flat[offsets + self.feature[nodes]]
+                go_right = x > self.threshold32[nodes]
+                if has_missing:
+                    go_right = np.where(np.isnan(x), ~self.missing_left[nodes], go_right)
+                nodes = self.left[nodes] + go_right
+                done = self.is_leaf[nodes]
+                n_done = np.count_nonzero(done)
+                # Compacting costs a pass over the cells, so only do it once enough have finished
+                if n_done == len(nodes) or level == self.depth - 1:
+                    out[cells] = nodes
+                    break
+                if n_done > len(nodes) // 4:
+                    out[cells[done]] = nodes[done]
+                    keep = ~done
+                    cells = cells[keep]
+                    nodes = nodes[keep]
+                    offsets = offsets[keep]
+        return out.reshape(n_samples, self.n_trees)
+
+
+def _check_input(model, X, allow_nan=False):
+    """Validate and convert X like the estimator's predict would (float32, same feature names)"""
+    fitted_names = getattr(model, "feature_names_in_", None)
+    columns = getattr(X, "columns", None)
+    if fitted_names is not None and columns is not None and all(isinstance(c, str) for c in columns):
+        if list(columns) != list(fitted_names):
+            raise ValueError("The feature names should match those that were passed during fit.")
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim != 2:
+        raise ValueError(f"Expected 2D array, got {X.ndim}D array instead")
+    if X.shape[1] != model.n_features_in_:
+        raise ValueError(f"X has {X.shape[1]} features, but {type(model).__name__} "
+                         f"is expecting {model.n_features_in_} features as input.")
+    if np.isinf(X).any():
+        raise ValueError("Input X contains infinity or a value too large for dtype('float32').")
+    if not allow_nan and np.isnan(X).any():
+        raise ValueError("Input X contains NaN.")
+    return np.ascontiguousarray(X)
+
+
+def _tree_proba_is_normalized():
+    """scikit-learn before 1.4 stored class counts in the tree and normalized them in predict_proba"""
+    import sklearn
+    major, minor = (int(part) for part in sklearn.__version__.split(".")[:2])
+    return (major, minor) < (1, 4)
+
+
+class _CompiledModel:
+    """
+    Common behaviour: anything not compiled is looked up on the original estimator.
+
+    Gathering node by node in NumPy has a higher cost per row than the
+    estimator's Cython loops, so batches of more than max_rows rows are
+    passed to the estimator itself (the results are the same either way).
+    """
+
+    # Default max_rows, around where the estimator catches up on one CPU
+    default_max_rows = None
+
+    def __init__(self, model, max_rows=None):
+        self.model = model
+        self.max_rows = self.default_max_rows if max_rows is None else max_rows
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the compiled model itself
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    @property
+    def n_jobs(self):
+        return self.model.n_jobs
+
+    @n_jobs.setter
+    def n_jobs(self, value):
+        self.model.n_jobs = value
+
+    def _use_estimator(self, X):
+        return self.max_rows is not None and len(X) > self.max_rows
+
+
+class CompiledRandomForestClassifier(_CompiledModel):
+    default_max_rows = 512
+
+    def __init__(self, model, max_rows=None):
+        super().__init__(model, max_rows)
+        if model.n_outputs_ != 1:
+            raise TypeError("Only single-output forests can be compiled")
+        n_classes = int(model.n_classes_)
+        values = []
+        for estimator in model.estimators_:
+            value = estimator.tree_.value[:, 0, :n_classes].astype(np.float64)
+            if _tree_proba_is_normalized():
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+        self.trees = CompiledTrees([estimator.tree_ for estimator in model.estimators_], values)
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X):
+        """Mean of the trees' class probabilities, identical to the forest's predict_proba"""
+        if self._use_estimator(X):
+            return self.model.predict_proba(X)
+        return self._predict_proba(X)
+
+    def _predict_proba(self, X):
+        X = _check_input(self.model, X, allow_nan=self.trees.supports_missing)
+        leaves = self.trees.leaves(X)
+        proba = np.empty((len(X), self.trees.value.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = leaves[start:start + CHUNK_ROWS]
+            # The forest adds the trees up one after another; keep that order so the sums match
+            total = np.zeros((len(chunk), proba.shape[1]), dtype=np.float64)
+            for tree in range(self.trees.n_trees):
+                total += self.trees.value[chunk[:, tree]]
+            proba[start:start + CHUNK_ROWS] = total
+        proba /= self.trees.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class CompiledAdaBoostRegressor(_CompiledModel):
+    default_max_rows = 8192
+
+    def __init__(self, model, max_rows=None):
+        super().__init__(model, max_rows)
+        estimators = model.estimators_
+        self.trees = CompiledTrees([estimator.tree_ for estimator in estimators],
+                                   [estimator.tree_.value[:, 0, :1].astype(np.float64) for estimator in estimators])
+        self.estimator_weights = np.asarray(model.estimator_weights_[:len(estimators)], dtype=np.float64)
+
+    def predict(self, X):
+        """Weighted median of the trees' predictions, identical to AdaBoostRegressor.predict"""
+        if self._use_estimator(X):
+            return self.model.predict(X)
+        return self._predict(X)
+
+    def _predict(self, X):
+        X = _check_input(self.model, X)
+        predictions = self.trees.value[self.trees.leaves(X), 0]
+
+        # Same steps as AdaBoostRegressor._get_median_predict
+        sorted_idx = np.argsort(predictions, axis=1)
+        weight_cdf = np.cumsum(self.estimator_weights[sorted_idx], axis=1)
+        median_or_above = weight_cdf >= 0.5 * weight_cdf[:, -1][:, np.newaxis]
+        median_idx = median_or_above.argmax(axis=1)
+        rows = np.arange(len(X))
+        median_estimators = sorted_idx[rows, median_idx]
+        return predictions[rows, median_estimators]
+
+
+def compile_model(model, max_rows=None):
+    """
+    Compile a fitted tree ensemble, or return the model unchanged if it is not supported
+
+    Supported: RandomForestClassifier and AdaBoostRegressor over decision trees.
+    The compiled model has the same predict (and predict_proba) and forwards
+    every other attribute to the original model.
+
+    Args:
+        model: Fitted estimator
+        max_rows: Largest batch evaluated on the node arrays (default: per model type)
+    """
+    from sklearn.ensemble import AdaBoostRegressor, RandomForestClassifier
+    from sklearn.tree import BaseDecisionTree
+
+    try:
+        if isinstance(model, RandomForestClassifier):
+            return CompiledRandomForestClassifier(model, max_rows)
+        if isinstance(model, AdaBoostRegressor) and all(isinstance(e, BaseDecisionTree) for e in model.estimators_):
+            return CompiledAdaBoostRegressor(model, max_rows)
+    except Exception as e:
+        print(f"Could not compile {type(model).__name__}, using it as is: {str(e)}")
+    return model
+
+
+def compiled_loader(loader):
+    """Wrap a model registry loader so the loaded model is compiled (unless TREE_COMPILE=0)"""
+    def load(path):
+        model = loader(path)
+        if os.environ.get("TREE_COMPILE", "1") == "0":
+            return model
+        max_rows = os.environ.get("TREE_COMPILE_MAX_ROWS")
+        return compile_model(model, int(max_rows) if max_rows else None)
+    return load
+
+
+def _random_rows(n, low, high, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(low, high, size=(n, len(low)))
+
+
+# Input ranges of the two models (the page widgets' ranges)
+CROP_RANGES = ([0, 0, 0, 0.0, 0.0, 3.0, 0.0], [150, 150, 210, 45.0, 100.0, 10.0, 3000.0])
+YIELD_RANGES = ([0, 0, 0.1, 0.0, 10.0, 10.0, 10.0, 4.0, 0.1], [55, 30, 100.0, 100.0, 45.0, 100.0, 3000.0, 10.0, 10.0])
+
+
+def _time(fn, X, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark(rows=(1, 100, 1000000), repeat=5):
+    """
+    Time scikit-learn against the node-array evaluation and check the outputs match exactly
+
+    The compiled evaluation is timed at every batch size, including the ones
+    the compiled models would hand to scikit-learn.
+
+    Returns:
+        list: One dict per (model, rows) with seconds for both, speed-up and whether outputs are identical
+    """
+    import warnings
+    from backend.model_registry import pickle_loader, crop_model_path
+    from backend.yield_model import load_yield_model, yield_model_path
+
+    models = [
+        ("crop predict_proba", pickle_loader(crop_model_path), "predict_proba", CROP_RANGES),
+        ("yield predict", load_yield_model(yield_model_path), "predict", YIELD_RANGES),
+    ]
+    report = []
+    for label, model, method, (low, high) in models:
+        compiled = compile_model(model)
+        for n in rows:
+            X = _random_rows(n, low, high)
+            # Large batches are timed once - the point there is throughput, not call overhead
+            runs = repeat if n <= 1000 else 1
+            with warnings.catch_warnings():
+                # Plain arrays for models fitted on DataFrames
+                warnings.simplefilter("ignore", UserWarning)
+                sklearn_seconds, expected = _time(getattr(model, method), X, runs)
+            compiled_seconds, actual = _time(getattr(compiled, "_" + method), X, runs)
+            report.append({
+                "model": label,
+                "rows": n,
+                "sklearn_seconds": sklearn_seconds,
+                "compiled_seconds": compiled_seconds,
+                "speedup": sklearn_seconds / compiled_seconds if compiled_seconds else 0.0,
+                "identical": bool(np.array_equal(expected, actual)),
+            })
+    return report
+
+
+def format_report(report):
+    lines = [
+        "Tree ensemble benchmark (python -m backend.tree_compiler)",
+        f"Python {platform.python_version()}, NumPy {np.__version__}, {os.cpu_count()} CPUs",
+        f"Compiled models pass batches above {CompiledRandomForestClassifier.default_max_rows} rows (crop) "
+        f"and {CompiledAdaBoostRegressor.default_max_rows} rows (yield) to scikit-learn",
+        "",
+        f"{'model':<20} {'rows':>9} {'sklearn':>12} {'compiled':>12} {'speed-up':>9}  identical",
+    ]
+    for entry in report:
+        lines.append(f"{entry['model']:<20} {entry['rows']:>9} {entry['sklearn_seconds'] * 1000:>10.2f}ms "
+                     f"{entry['compiled_seconds'] * 1000:>10.2f}ms {entry['speedup']:>8.1f}x  {entry['identical']}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compiled tree ensembles against scikit-learn")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 1000000], help="Batch sizes (default: 1 100 1000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions for small batches, best is reported")
+    parser.add_argument("--output", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.rows, args.repeat)
+    text = format_report(report)
+    print(text, end="")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if not all(entry["identical"] for entry in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Default location of the on-disk cache databases
+cache_dir = os.environ.get(
+    "PLANTX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+)
+
+
+class TTLCache:
+    """
+    Time-to-live cache with an in-memory LRU tier and an optional SQLite store.
+
+    Values must be JSON serializable when a database is used. Concurrent
+    requests for the same missing key share a single call to the fetch
+    function; failures are never cached.
+    """
+
+    def __init__(self, name, ttl=3600, max_entries=1024, db_path=None):
+        """
+        Args:
+            name: Namespace of the entries (one SQLite table per name)
+            ttl: Seconds an entry stays fresh
+            max_entries: Maximum entries kept in memory and on disk (least recently used are evicted)
+            db_path: SQLite file for the persistent tier, or None for memory only
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if db_path is not None:
+            self._open_db()
+
+    def _open_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        # One connection shared by all threads, serialized with _db_lock
+        self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            # WAL lets several app processes read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.name}" ('
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _db_get(self, key, now):
+        with self._db_lock:
+            row = self._db.execute(
+                f'SELECT value, expires_at FROM "{self.name}" WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+            self._db.execute(f'UPDATE "{self.name}" SET last_access = ? WHERE key = ?', (now, key))
+            self._db.commit()
+            return json.loads(row[0]), row[1]
+
+    def _db_put(self, key, value, expires_at, now):
+        with self._db_lock:
+            self._db.execute(
+                f'INSERT OR REPLACE INTO "{self.name}" (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), expires_at, now)
+            )
+            # Drop expired rows, then the least recently used ones beyond max_entries
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE expires_at <= ?', (now,))
+            self._db.execute(
+                f'DELETE FROM "{self.name}" WHERE key IN (SELECT key FROM "{self.name}" '
+                "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the fresh cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+        if self._db is not None:
+            stored = self._db_get(key, now)
+            if stored is not None:
+                with self._lock:
+                    self._remember(key, stored[0], stored[1])
+                return stored[0]
+        return None
+
+    def put(self, key, value, ttl=None):
+        """Store a value for key, valid for ttl seconds (defaults to the cache TTL)"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            self._db_put(key, value, expires_at, now)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for key, calling fetch() to fill it on a miss
+
+        Only one fetch per key runs at a time; other callers wait for its result.
+        """
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            with self._lock:
+                self.hits += 1
+            return future.result()
+
+        try:
+            # Another caller may have filled the entry between our get() and taking the lead
+            value = self.get(key)
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+                value = fetch()
+                self.put(key, value)
+            else:
+                with self._lock:
+                    self.hits += 1
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+                self._db.commit()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hits, misses, hit rate and number of entries held in memory
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._memory),
+            }
@@ -0,0 +1,389 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+
+# Allow running as a script as well as a module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.model_registry import model_registry, model_dir
+from backend.tree_compiler import compiled_loader
+
+# Retrained AdaBoost yield model
+yield_model_path = os.path.join(model_dir, "adaboost_yield_model_retrained.pkl")
+env_data_path = os.path.join(model_dir, "state_env_data.json")
+
+# Crop and State mappings
+crop_map = {
+    'Arecanut': 0, 'Arhar/Tur': 1, 'Bajra': 2, 'Banana': 3, 'Barley': 4,
+    'Black pepper': 5, 'Cardamom': 6, 'Cashewnut': 7, 'Castor seed': 8,
+    'Coconut ': 9, 'Coriander': 10, 'Cotton(lint)': 11, 'Cowpea(Lobia)': 12,
+    'Dry chillies': 13, 'Garlic': 14, 'Ginger': 15, 'Gram': 16,
+    'Groundnut': 17, 'Guar seed': 18, 'Horse-gram': 19, 'Jowar': 20,
+    'Jute': 21, 'Khesari': 22, 'Linseed': 23, 'Maize': 24,
+    'Masoor': 25, 'Mesta': 26, 'Moong(Green Gram)': 27, 'Moth': 28,
+    'Niger seed': 29, 'Oilseeds total': 30, 'Onion': 31,
+    'Other  Rabi pulses': 32, 'Other Cereals': 33, 'Other Kharif pulses': 34,
+    'Other Summer Pulses': 35, 'Peas & beans (Pulses)': 36,
+    'Potato': 37, 'Ragi': 38, 'Rapeseed &Mustard': 39, 'Rice': 40,
+    'Safflower': 41, 'Sannhamp': 42, 'Sesamum': 43, 'Small millets': 44,
+    'Soyabean': 45, 'Sugarcane': 46, 'Sunflower': 47, 'Sweet potato': 48,
+    'Tapioca': 49, 'Tobacco': 50, 'Turmeric': 51, 'Urad': 52,
+    'Wheat': 53, 'other oilseeds': 54
+}
+
+state_map = {
+    'Andhra Pradesh': 0, 'Arunachal Pradesh': 1, 'Assam': 2, 'Bihar': 3,
+    'Chhattisgarh': 4, 'Delhi': 5, 'Goa': 6, 'Gujarat': 7, 'Haryana': 8,
+    'Himachal Pradesh': 9, 'Jammu and Kashmir': 10, 'Jharkhand': 11,
+    'Karnataka': 12, 'Kerala': 13, 'Madhya Pradesh': 14, 'Maharashtra': 15,
+    'Manipur': 16, 'Meghalaya': 17, 'Mizoram': 18, 'Nagaland': 19,
+    'Odisha': 20, 'Puducherry': 21, 'Punjab': 22, 'Sikkim': 23,
+    'Tamil Nadu': 24, 'Telangana': 25, 'Tripura': 26, 'Uttar Pradesh': 27,
+    'Uttarakhand': 28, 'West Bengal': 29
+}
+
+# Define typical yield ranges for different crops (tons/hectare)
+crop_yield_ranges = {
+    # High-yield crops
+    'Sugarcane': {'low': 0, 'moderate': 40, 'high': 70},
+    'Banana': {'low': 0, 'moderate': 15, 'high': 30},
+    'Sweet potato': {'low': 0, 'moderate': 8, 'high': 15},
+    'Potato': {'low': 0, 'moderate': 10, 'high': 20},
+    'Tapioca': {'low': 0, 'moderate': 12, 'high': 25},
+
+    # Medium-yield crops
+    'Rice': {'low': 0, 'moderate': 3, 'high': 6},
+    'Wheat': {'low': 0, 'moderate': 2.5, 'high': 5},
+    'Maize': {'low': 0, 'moderate': 3, 'high': 7},
+    'Onion': {'low': 0, 'moderate': 15, 'high': 30},
+    'Garlic': {'low': 0, 'moderate': 5, 'high': 10},
+    'Ginger': {'low': 0, 'moderate': 7, 'high': 15},
+    'Turmeric': {'low': 0, 'moderate': 5, 'high': 10},
+
+    # Spice crops
+    'Cardamom': {'low': 0, 'moderate': 0.15, 'high': 0.25},
+    'Black pepper': {'low': 0, 'moderate': 0.5, 'high': 2.0},
+    'Coriander': {'low': 0, 'moderate': 0.8, 'high': 1.5},
+
+    # Low-yield crops
+    'Groundnut': {'low': 0, 'moderate': 1, 'high': 2.5},
+    'Soyabean': {'low': 0, 'moderate': 1.2, 'high': 2.5},
+    'Sunflower': {'low': 0, 'moderate': 0.8, 'high': 1.5},
+    'Cotton(lint)': {'low': 0, 'moderate': 0.5, 'high': 1.5},
+    'Tobacco': {'low': 0, 'moderate': 1, 'high': 2}
+}
+
+# Default yield range for crops not in the specific list
+default_yield_range = {'low': 0, 'moderate': 1.5, 'high': 3}
+
+# Define crop-specific base yield values (tons/ha)
+crop_base_yields = {
+    'Sugarcane': 60.0,
+    'Banana': 25.0,
+    'Sweet potato': 12.0,
+    'Potato': 15.0,
+    'Tapioca': 20.0,
+    'Rice': 4.5,
+    'Wheat': 3.5,
+    'Maize': 5.0,
+    'Onion': 20.0,
+    'Garlic': 8.0,
+    'Ginger': 12.0,
+    'Turmeric': 7.0,
+    'Cardamom': 0.2,
+    'Black pepper': 1.5,
+    'Cashewnut': 1.2,
+    'Coconut ': 10.0,
+    'Groundnut': 2.0,
+    'Soyabean': 1.8,
+    'Cotton(lint)': 1.0,
+}
+
+# Default base yield for crops not in the specific list
+default_base_yield = 2.0
+
+# States known for high productivity of specific crops
+crop_state_bonuses = {
+    'Cardamom': ['Kerala', 'Karnataka', 'Tamil Nadu'],
+    'Black pepper': ['Kerala', 'Karnataka', 'Tamil Nadu'],
+    'Rice': ['West Bengal', 'Punjab', 'Uttar Pradesh', 'Bihar'],
+    'Wheat': ['Punjab', 'Haryana', 'Uttar Pradesh'],
+    'Sugarcane': ['Uttar Pradesh', 'Maharashtra', 'Karnataka']
+}
+
+# Kerala, Karnataka and Tamil Nadu are best for cardamom
+cardamom_states = ["Kerala", "Karnataka", "Tamil Nadu"]
+
+# Optimal conditions used by the adjustment factors
+temp_opt = 25
+ph_opt = 6.5
+
+# Model input in the correct order (9 features)
+feature_names = ['crop_id', 'state_id', 'area', 'pesticide',
+                 'temperature', 'humidity', 'rainfall', 'soil_pH', 'organic_carbon']
+
+
+def load_yield_model(path):
+    """
+    Load the yield model, trying joblib first (more robust for sklearn models)
+    and falling back to pickle
+
+    Raises:
+        ValueError: If the file does not contain a usable model
+    """
+    # sklearn and joblib are imported on first use to keep page imports fast
+    import joblib
+    from sklearn.ensemble import AdaBoostRegressor
+
+    try:
+        model = joblib.load(path)
+    except Exception:
+        # Fall back to pickle if joblib fails
+        with open(path, "rb") as f:
+            model_data = pickle.load(f)
+
+        # Check if the loaded object is already a model
+        if hasattr(model_data, 'predict'):
+            model = model_data
+        elif isinstance(model_data, np.ndarray):
+            print("Yield model loaded as array, reconstructing AdaBoost model...")
+            # Create a new model instance and set estimators
+            model = AdaBoostRegressor(n_estimators=50, random_state=42, learning_rate=1.0)
+            model.estimators_ = model_data
+        else:
+            raise ValueError(f"Model format not recognized: {type(model_data)}")
+
+    # Verify the model has predict method
+    if not hasattr(model, 'predict'):
+        raise ValueError("Loaded model doesn't have a predict method")
+    return model
+
+
+def create_backup_model():
+    """Create a simple backup model for demonstration purposes"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    # This model will generate more realistic yield predictions with variability
+    model = RandomForestRegressor(n_estimators=10, random_state=42)
+
+    # Create synthetic training data - very simple
+    # Features: crop_id, state_id, area, pesticide, temp, humidity, rainfall, pH, organic_carbon
+    X = np.random.rand(100, 9)
+    X[:, 0] = np.random.randint(0, 55, size=100)  # crop_id
+    X[:, 1] = np.random.randint(0, 30, size=100)  # state_id
+
+    # Generate synthetic yields based on features - fixed multiline syntax
+    y = (2.0
+        + X[:, 2] * 0.2    # area
+        + X[:, 3] * 0.1    # pesticide
+        + np.sin((X[:, 4] - 0.5) * 3) * 2    # temperature effect (optimal in middle)
+        + X[:, 5] * 2      # humidity
+        + X[:, 6] * 3      # rainfall
+        + np.sin((X[:, 7] - 0.5) * 6) * 1    # pH effect (optimal in middle)
+        + X[:, 8] * 1)     # organic carbon
+
+    # Add some crop-specific effects (e.g., sugarcane high yield, groundnut low yield)
+    for i in range(len(y)):
+        crop_id = int(X[i, 0])
+        if crop_id in [3, 37, 46, 48, 49]:  # Banana, Potato, Sugarcane, Sweet potato, Tapioca
+            y[i] *= 10  # High-yield crops
+        elif crop_id in [17, 45, 47, 11, 50]:  # Groundnut, Soyabean, Sunflower, Cotton, Tobacco
+            y[i] *= 0.5  # Low-yield crops
+        elif crop_id == 6:  # Cardamom
+            y[i] = 0.2  # Typical cardamom yield
+        elif crop_id == 5:  # Black pepper
+            y[i] = 1.5  # Typical black pepper yield
+
+    # Fit the model
+    model.fit(X, y)
+    return model
+
+
+model_registry.register("yield", yield_model_path, compiled_loader(load_yield_model))
+# The backup model is trained once per process instead of on every page run
+model_registry.register("yield_backup", None, create_backup_model)
+
+
+def load_state_environment(path=env_data_path):
+    """
+    Load per-state soil and climate defaults
+
+    Returns:
+        tuple: (soil_data, climate_data) dicts keyed by state index
+    """
+    with open(path, 'r') as f:
+        environmental_data = json.load(f)
+    soil_data = {item["state_index"]: {"soil_pH": item["soil_pH"]/10, "organic_carbon": item["organic_carbon"]}
+                 for item in environmental_data["soil_data"]}
+    climate_data = {item["index"]: {"temperature": item["temperature"],
+                                   "humidity": item["humidity"],
+                                   "rainfall": item["rainfall"]}
+                    for item in environmental_data["climate_data"]}
+    return soil_data, climate_data
+
+
+def predict_yield_batch(samples, model=None):
+    """
+    Predict yields for many (crop, state, farm, climate, soil) rows in one pass
+
+    The AdaBoost prediction and every adjustment factor are evaluated as array
+    operations in the same order as the interactive Yield Prediction page, so a
+    single row gives exactly the numbers the page shows.
+
+    Args:
+        samples: DataFrame with columns crop, state, area, pesticide, temperature,
+            humidity, rainfall, soil_pH and organic_carbon
+        model: Yield model to use. Defaults to the shared registry model, falling
+            back to the backup model if it cannot be loaded
+
+    Returns:
+        pandas.DataFrame: Input columns plus the adjustment factors, whether the
+        backup calculation was used, predicted_yield (tons/ha) and yield_level
+    """
+    if model is None:
+        try:
+            model = model_registry.get("yield")
+        except Exception as e:
+            print(f"Failed to load yield model: {str(e)}. Using backup model.")
+            model = model_registry.get("yield_backup")
+
+    crops = samples["crop"].astype(str).to_numpy()
+    states = samples["state"].astype(str).to_numpy()
+    n = len(samples)
+
+    unknown_crops = set(crops) - set(crop_map)
+    unknown_states = set(states) - set(state_map)
+    if unknown_crops or unknown_states:
+        raise ValueError(f"Unknown crops {sorted(unknown_crops)} or states {sorted(unknown_states)}")
+
+    area = samples["area"].to_numpy(dtype=np.float64)
+    temperature = samples["temperature"].to_numpy(dtype=np.float64)
+    rainfall = samples["rainfall"].to_numpy(dtype=np.float64)
+    soil_pH = samples["soil_pH"].to_numpy(dtype=np.float64)
+    organic_carbon = samples["organic_carbon"].to_numpy(dtype=np.float64)
+
+    # Per-row lookups done once per distinct crop/state rather than per row
+    base_yield = pd.Series(crops).map(lambda c: crop_base_yields.get(c, default_base_yield)).to_numpy(dtype=np.float64)
+    bonus_pairs = {(crop, state) for crop, states_ in crop_state_bonuses.items() for state in states_}
+    state_bonus = np.fromiter(((c, s_) in bonus_pairs for c, s_ in zip(crops, states)), dtype=bool, count=n)
+    state_bonus = np.where(state_bonus, 1.2, 1.0)
+
+    input_df = pd.DataFrame({
+        'crop_id': pd.Series(crops).map(crop_map).to_numpy(),
+        'state_id': pd.Series(states).map(state_map).to_numpy(),
+        'area': area,
+        'pesticide': samples["pesticide"].to_numpy(dtype=np.float64),
+        'temperature': temperature,
+        'humidity': samples["humidity"].to_numpy(dtype=np.float64),
+        'rainfall': rainfall,
+        'soil_pH': soil_pH,
+        'organic_carbon': organic_carbon,
+    }, columns=feature_names)
+
+    # Random factor to ensure variability if using backup model (1.0 to 1.5)
+    from sklearn.ensemble import RandomForestRegressor
+    if isinstance(model, RandomForestRegressor):
+        random_factor = 1.0 + (0.5 * np.random.random(n))
+    else:
+        random_factor = np.ones(n)
+
+    try:
+        prediction_raw = np.asarray(model.predict(input_df), dtype=np.float64)
+        # If prediction is too low (less than 0.1), use backup calculation
+        use_backup_calculation = prediction_raw < 0.1
+    except Exception:
+        prediction_raw = np.zeros(n)
+        use_backup_calculation = np.ones(n, dtype=bool)
+
+    # Temperature adjustment - most crops do well in 20-30°C range
+    temp_factor = 1 - np.minimum(np.abs(temperature - temp_opt) / 15, 0.3)
+    # Rainfall adjustment
+    rainfall_factor = np.minimum(rainfall / 1000, 1.3)
+    # pH adjustment - most crops do well in 5.5-7.5 range
+    ph_factor = 1 - np.minimum(np.abs(soil_pH - ph_opt) / 3, 0.2)
+    # Organic carbon adjustment (higher is better up to a point)
+    oc_factor = np.minimum(1.0 + (organic_carbon / 20), 1.3)
+    # Area effect (diminishing returns for larger areas)
+    area_factor = np.where(area <= 10, 1.0, 0.9)
+
+    adjustment = temp_factor * rainfall_factor * ph_factor * oc_factor * area_factor * state_bonus
+
+    prediction_value = np.where(use_backup_calculation,
+                                base_yield * adjustment,
+                                prediction_raw * adjustment * random_factor)
+
+    # Make sure prediction is positive and realistic
+    prediction_value = np.maximum(prediction_value, base_yield * 0.3)  # At least 30% of base yield
+
+    # Special handling for cardamom (typically 0.15-0.25 tons/ha in good conditions)
+    is_cardamom = crops == "Cardamom"
+    cardamom_value = np.maximum(0.15, np.minimum(prediction_value, 0.35))
+    cardamom_value = np.where(np.isin(states, cardamom_states), cardamom_value * 1.2, cardamom_value)
+    prediction_value = np.where(is_cardamom, cardamom_value, prediction_value)
+
+    # Determine yield level based on crop-specific thresholds
+    moderate = pd.Series(crops).map(lambda c: crop_yield_ranges.get(c, default_yield_range)['moderate']).to_numpy(dtype=np.float64)
+    high = pd.Series(crops).map(lambda c: crop_yield_ranges.get(c, default_yield_range)['high']).to_numpy(dtype=np.float64)
+    yield_level = np.where(prediction_value >= high, "high",
+                           np.where(prediction_value >= moderate, "moderate", "low"))
+
+    result = samples.reset_index(drop=True).copy()
+    result["temp_factor"] = temp_factor
+    result["rainfall_factor"] = rainfall_factor
+    result["ph_factor"] = ph_factor
+    result["oc_factor"] = oc_factor
+    result["area_factor"] = area_factor
+    result["state_bonus"] = state_bonus
+    result["used_backup_calculation"] = use_backup_calculation
+    result["predicted_yield"] = prediction_value
+    result["yield_level"] = yield_level
+    return result
+
+
+def build_crop_state_grid(area=5.0, pesticide=10.0):
+    """
+    Build one sample per crop x state pair using each state's climate and soil defaults
+
+    Values are clipped to the ranges the Yield Prediction page sliders accept.
+
+    Returns:
+        pandas.DataFrame: Samples ready for predict_yield_batch
+    """
+    soil_data, climate_data = load_state_environment()
+    rows = []
+    for state, state_index in state_map.items():
+        climate = climate_data.get(state_index, {"temperature": 25.0, "humidity": 60.0, "rainfall": 1000.0})
+        soil = soil_data.get(state_index, {"soil_pH": 6.5, "organic_carbon": 0.8})
+        for crop in crop_map:
+            rows.append({
+                "crop": crop,
+                "state": state,
+                "area": area,
+                "pesticide": pesticide,
+                "temperature": min(max(climate["temperature"], 5.0), 40.0),
+                "humidity": min(max(climate["humidity"], 10.0), 100.0),
+                "rainfall": min(max(climate["rainfall"], 10.0), 3000.0),
+                "soil_pH": min(max(soil["soil_pH"], 4.0), 10.0),
+                "organic_carbon": min(max(soil["organic_carbon"], 0.1), 10.0),
+            })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch yield prediction")
+    parser.add_argument("--input", help="CSV of samples (default: every crop x state pair)")
+    parser.add_argument("--output", required=True, help="CSV file to write the yield table to")
+    parser.add_argument("--area", type=float, default=5.0, help="Farm area for the crop x state table (ha)")
+    parser.add_argument("--pesticide", type=float, default=10.0, help="Pesticide for the crop x state table (kg)")
+    args = parser.parse_args(argv)
+
+    samples = pd.read_csv(args.input) if args.input else build_crop_state_grid(args.area, args.pesticide)
+    predict_yield_batch(samples).to_csv(args.output, index=False)
+    print(f"Wrote {len(samples)} yield predictions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
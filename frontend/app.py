@@ -1,5 +1,4 @@
 import streamlit as st
-from pages import Crop_Recommendation, Yield_Prediction, Climate_Risk_Alerts, Plant_Disease_Detection, Soil_Analysis
 import base64
 from PIL import Image
 import os
@@ -12,8 +11,16 @@ import json
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Page modules are imported only when their page is opened: they pull in the ML stacks
+# (torch and transformers, TensorFlow, scikit-learn), which Home never needs
+
 # Import API services
 from backend.api_services import get_visualcrossing_weather, get_location_from_ip
+from backend.geocode_cache import geocode_cache
+from backend.model_warmup import model_warmup, start_warmup
+
+# Load and warm up the models in the background once per process, before anyone opens a page
+start_warmup()
 
 # Function to add background image and enhanced styling
 def add_custom_styling():
@@ -364,6 +371,17 @@ with st.sidebar:
     if detected_location not in location_options:
         location_options.insert(1, detected_location)
 
+    # Type-ahead search over every place in the local geocode cache
+    location_query = st.text_input("🔎 Search places", value="", placeholder="Start typing a city or district...")
+    if location_query:
+        for suggestion in geocode_cache.suggest(location_query, limit=10):
+            if suggestion not in location_options:
+                location_options.append(suggestion)
+
+    # Keep a previously searched location selectable after the search box is cleared
+    if st.session_state.user_location_preference and st.session_state.user_location_preference not in location_options:
+        location_options.append(st.session_state.user_location_preference)
+
     # Get current selected location
     current_location = st.session_state.user_location_preference or "Select Your Location..."
 
@@ -431,7 +449,34 @@ with st.sidebar:
     # Progress indicator
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown("""<p style="color: white; font-size: 14px;">AI System Status</p>""", unsafe_allow_html=True)
-    st.progress(0.98, "Models ready (98%)")
+    warmup_status = model_warmup.status()
+    warming = [s for s in warmup_status.values() if s["state"] != "skipped"]
+    ready_count = sum(1 for s in warming if s["state"] == "ready")
+    progress_label = f"Models ready ({ready_count}/{len(warming)})"
+    if len(warming) < len(warmup_status):
+        # e.g. the image models, which by default load when their page is first used
+        progress_label += f", {len(warmup_status) - len(warming)} loaded on demand"
+    st.progress(model_warmup.progress(), progress_label)
+    with st.expander("Model details"):
+        state_icons = {"pending": "⏳", "loading": "🔄", "ready": "✅", "failed": "⚠️", "skipped": "💤"}
+        for model_status in warmup_status.values():
+            details = model_status["state"]
+            if model_status["load_time"] is not None:
+                details += f" in {model_status['load_time']:.1f}s"
+            if model_status["memory"]:
+                details += f", {model_status['memory'] / 1e6:.0f} MB"
+            if model_status["note"]:
+                details += f" ({model_status['note']})"
+            if model_status["error"]:
+                details += f" - {model_status['error']}"
+            st.caption(f"{state_icons.get(model_status['state'], '')} {model_status['label']}: {details}")
+        # Only once a crop recommendation has been made here (importing it would pull in pandas)
+        crop_recommendation = sys.modules.get("backend.crop_recommendation")
+        if crop_recommendation is not None:
+            cache_stats = crop_recommendation.crop_recommender.stats()
+            st.caption(f"Crop recommendation cache: {cache_stats['hit_rate'] * 100:.0f}% hits "
+                       f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}, "
+                       f"{cache_stats['entries']} entries)")
 
     # User profile section
     st.markdown("<br>", unsafe_allow_html=True)
@@ -622,20 +667,25 @@ if clean_selection == "Home":
 elif clean_selection == "Crop Recommendation":
     with st.spinner('Loading Crop Recommendation System...'):
         time.sleep(0.5)
+        from pages import Crop_Recommendation
     Crop_Recommendation.show()
 elif clean_selection == "Yield Prediction":
     with st.spinner('Loading Yield Prediction System...'):
         time.sleep(0.5)
+        from pages import Yield_Prediction
     Yield_Prediction.show()
 elif clean_selection == "Climate Risk Alerts":
     with st.spinner('Loading Climate Risk Alert System...'):
         time.sleep(0.5)
+        from pages import Climate_Risk_Alerts
     Climate_Risk_Alerts.show()
 elif clean_selection == "Plant Disease Detection":
     with st.spinner('Loading Plant Disease Detection System...'):
         time.sleep(0.5)
+        from pages import Plant_Disease_Detection
     Plant_Disease_Detection.show()
 elif clean_selection == "Soil Analysis":
     with st.spinner('Loading Soil Analysis System...'):
         time.sleep(0.5)
+        from pages import Soil_Analysis
     Soil_Analysis.show()
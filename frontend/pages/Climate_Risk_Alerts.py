@@ -1,10 +1,14 @@
 import streamlit as st
-import pickle
-import numpy as np
 import time
 import os
+import sys
 from datetime import datetime
 
+# Add project root directory to path so we can import from backend
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+from backend.prediction_client import prediction_client
+
 def show():
     st.header("🌦️ Climate Risk Alerts")
 
@@ -274,67 +278,37 @@ def show():
                 time.sleep(1.5)  # Simulate processing time
 
             try:
-                # Load the model (with improved error handling)
-                model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models", "climate_risk_model.pkl")
-
-                # Initialize to use mock prediction by default (as fallback)
-                mock_prediction = True
-
-                try:
-                    if not os.path.exists(model_path):
-                        st.warning(f"Model file not found at: {model_path}")
-                        st.info("Using fallback prediction method based on input parameters.")
-                    else:
-                        try:
-                            with open(model_path, "rb") as f:
-                                model = pickle.load(f)
-                            # Successfully loaded the model
-                            mock_prediction = False
-                            st.success("Climate risk model loaded successfully.")
-                        except Exception as e:
-                            st.error(f"Error loading model: {str(e)}")
-                            st.info("Using fallback prediction method based on input parameters.")
-                except Exception as e:
-                    st.error(f"Unexpected error: {str(e)}")
-
-                # Convert categorical inputs to numbers
-                land_cover_map = {"Forest":0, "Urban":1, "Agriculture":2, "Water":3}
-                soil_type_map = {"Sandy":0, "Clay":1, "Silt":2, "Peat":3, "Chalk":4, "Loam":5}
-
-                input_features = np.array([[
-                    latitude,
-                    longitude,
-                    rainfall,
-                    temperature,
-                    humidity,
-                    river_discharge,
-                    water_level,
-                    elevation,
-                    land_cover_map[land_cover],
-                    soil_type_map[soil_type],
-                    population_density,
-                    infrastructure,
-                    historical_floods
-                ]])
-
-                # Make prediction
-                if not mock_prediction:
-                    flood_risk_prob = model.predict_proba(input_features)[0][1] if hasattr(model, 'predict_proba') else 0.65
-                    prediction = model.predict(input_features)[0]
+                # Make prediction (through the prediction service when one is configured).
+                # The service falls back to an estimate from the inputs if the model is unavailable.
+                result = prediction_client.climate_risk({
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "rainfall": rainfall,
+                    "temperature": temperature,
+                    "humidity": humidity,
+                    "river_discharge": river_discharge,
+                    "water_level": water_level,
+                    "elevation": elevation,
+                    "land_cover": land_cover,
+                    "soil_type": soil_type,
+                    "population_density": population_density,
+                    "infrastructure": infrastructure,
+                    "historical_floods": historical_floods
+                })
+                if not result["success"]:
+                    raise RuntimeError(result["error"])
+
+                if result["model_status"] == "missing":
+                    st.warning("Climate risk model file not found.")
+                    st.info("Using fallback prediction method based on input parameters.")
+                elif result["model_status"] == "failed":
+                    st.error(f"Error loading model: {result['model_error']}")
+                    st.info("Using fallback prediction method based on input parameters.")
                 else:
-                    # Generate mock prediction based on input values
-                    # Higher rainfall, river discharge, previous floods, and lower elevation increase risk
-                    base_risk = 0.2
-                    if rainfall > 100: base_risk += 0.2
-                    if river_discharge > 200: base_risk += 0.15
-                    if historical_floods > 3: base_risk += 0.1
-                    if elevation < 50: base_risk += 0.15
-                    if water_level > 4: base_risk += 0.2
-                    if land_cover == "Urban": base_risk += 0.05
-                    if soil_type == "Clay": base_risk += 0.05
-
-                    flood_risk_prob = min(base_risk, 0.95)
-                    prediction = 1 if flood_risk_prob > 0.5 else 0
+                    st.success("Climate risk model loaded successfully.")
+
+                flood_risk_prob = result["flood_risk_probability"]
+                prediction = result["prediction"]
 
                 # Display results
                 if prediction == 1:
@@ -1,10 +1,14 @@
 import streamlit as st
-import pickle
-import numpy as np
 import os
+import sys
 import time
 import pandas as pd
 
+# Add project root directory to path so we can import from backend
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+from backend.prediction_client import prediction_client
+
 def show():
     st.header("🌾 Crop Recommendation System")
 
@@ -154,18 +158,14 @@ def show():
             time.sleep(1)  # Simulate processing time
 
         try:
-            # Use relative path to load model
-            model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models", "crop_recommendation_model.pkl")
-
-            with open(model_path, "rb") as model_file:
-                model = pickle.load(model_file)
-
-            # Input for prediction
-            input_data = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]])
-
-            # Make prediction
-            prediction = model.predict(input_data)
-            recommended_crop = prediction[0].capitalize()
+            # Make prediction (through the prediction service when one is configured)
+            result = prediction_client.crop({
+                "N": nitrogen, "P": phosphorus, "K": potassium, "temperature": temperature,
+                "humidity": humidity, "ph": ph, "rainfall": rainfall
+            })
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+            recommended_crop = result["crop"].capitalize()
 
             # Display result with animation
             st.balloons()
@@ -179,6 +179,13 @@ def show():
             </div>
             """, unsafe_allow_html=True)
 
+            # Runner-up crops with the model's confidence in each
+            alternatives = result["top_k"][1:]
+            if alternatives:
+                st.markdown("**Other suitable crops:** " + ", ".join(
+                    f"{option['crop'].capitalize()} ({option['probability'] * 100:.0f}%)" for option in alternatives
+                ))
+
             # Create a function to display crop information based on prediction
             def display_crop_info(crop_name):
                 # Dictionary of crop information
@@ -254,8 +261,6 @@ def show():
             # Display crop information
             display_crop_info(recommended_crop)
 
-        except FileNotFoundError:
-            st.error("❌ Model file not found. Please ensure 'crop_recommendation_model.pkl' is inside the 'models/' folder.")
         except Exception as e:
             st.error(f"⚠️ Error while predicting: {e}")
 
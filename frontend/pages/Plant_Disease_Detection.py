@@ -14,6 +14,7 @@ from datetime import datetime
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 from backend.disease_detection import disease_detector
+from backend.prediction_client import prediction_client
 
 def show():
     st.header("🔬 Plant Disease Detection")
@@ -182,12 +183,14 @@ def process_disease_detection(image_bytes):
             # Add a slight delay to simulate processing
             time.sleep(1.5)
 
-            # Make prediction using disease detector
-            # Pass image bytes directly without re-opening (it's already loaded as bytes)
-            results = disease_detector.detect_disease(io.BytesIO(image_bytes))
+            # Make prediction using disease detector, batched with other concurrent uploads
+            # (through the prediction service when one is configured)
+            results = prediction_client.disease(image_bytes)
 
             if results["success"]:
                 predictions = results["predictions"]
+                if results.get("degraded"):
+                    st.info("The service is under heavy load, so this result comes from the faster compact model.")
 
                 # Display top prediction
                 top_prediction = predictions[0]
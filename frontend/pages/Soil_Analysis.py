@@ -3,13 +3,12 @@ import os
 import sys
 import time
 from PIL import Image
-import io
 import requests
 
 # Add project root directory to path so we can import from backend
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
-from backend.soil_classifier import soil_classifier
+from backend.prediction_client import prediction_client
 
 def show():
     st.header("🌱 Soil Type Analysis")
@@ -204,11 +203,13 @@ def process_soil_analysis(image_bytes):
             # Add a slight delay to simulate processing
             time.sleep(1.5)
 
-            # Make prediction using soil classifier
-            results = soil_classifier.classify_soil(io.BytesIO(image_bytes))
+            # Make prediction using soil classifier (through the prediction service when one is configured)
+            results = prediction_client.soil(image_bytes)
 
             if results["success"]:
                 predictions = results["predictions"]
+                if results.get("degraded"):
+                    st.info("The service is under heavy load, so this is a quick colour-based estimate.")
 
                 # Display top prediction
                 top_prediction = predictions[0]
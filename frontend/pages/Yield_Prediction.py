@@ -1,12 +1,12 @@
 import streamlit as st
-import numpy as np
-import pickle
 import os
-import json
 import sys
-import pandas as pd
-from sklearn.ensemble import AdaBoostRegressor, RandomForestRegressor
-import joblib
+
+# Add project root directory to path so we can import from backend
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+from backend.prediction_client import prediction_client
+from backend.yield_model import crop_map, state_map, temp_opt, ph_opt, load_state_environment
 
 # Function to show page content
 def show():
@@ -15,59 +15,11 @@ def show():
 
     # Define paths using relative path for better portability
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    model_path = os.path.join(base_dir, "models", "adaboost_yield_model_retrained.pkl")
     env_data_path = os.path.join(base_dir, "models", "state_env_data.json")
 
-    # Load the model with improved error handling
-    try:
-        # Create a backup model first, in case all loading attempts fail
-        backup_model = create_backup_model()
-
-        # Try loading with joblib first (more robust for sklearn models)
-        try:
-            model = joblib.load(model_path)
-            st.success("Model loaded successfully using joblib")
-        except:
-            try:
-                # Fall back to pickle if joblib fails
-                with open(model_path, "rb") as f:
-                    model_data = pickle.load(f)
-
-                # Check if the loaded object is already a model
-                if hasattr(model_data, 'predict'):
-                    model = model_data
-                elif isinstance(model_data, np.ndarray):
-                    st.warning("Model loaded as array, reconstructing AdaBoost model...")
-                    # Create a new model instance and set estimators
-                    model = AdaBoostRegressor(n_estimators=50, random_state=42, learning_rate=1.0)
-                    model.estimators_ = model_data
-                else:
-                    st.error(f"Model format not recognized: {type(model_data)}. Using backup model.")
-                    model = backup_model
-            except Exception as e:
-                st.error(f"Error loading model with pickle: {str(e)}. Using backup model.")
-                model = backup_model
-
-        # Verify the model has predict method
-        if not hasattr(model, 'predict'):
-            st.error("Loaded model doesn't have a predict method. Using backup model.")
-            model = backup_model
-
-    except Exception as e:
-        st.error(f"Failed to load model: {str(e)}")
-        st.info(f"Using a backup simple model for demonstration purposes.")
-        model = backup_model
-
     # Load environmental data for states
     try:
-        with open(env_data_path, 'r') as f:
-            environmental_data = json.load(f)
-            soil_data = {item["state_index"]: {"soil_pH": item["soil_pH"]/10, "organic_carbon": item["organic_carbon"]}
-                         for item in environmental_data["soil_data"]}
-            climate_data = {item["index"]: {"temperature": item["temperature"],
-                                          "humidity": item["humidity"],
-                                          "rainfall": item["rainfall"]}
-                         for item in environmental_data["climate_data"]}
+        soil_data, climate_data = load_state_environment(env_data_path)
         st.success("Environmental data loaded successfully")
     except Exception as e:
         st.error(f"Failed to load environmental data: {str(e)}")
@@ -75,105 +27,6 @@ def show():
         soil_data = {}
         climate_data = {}
 
-    # Crop and State mappings
-    crop_map = {
-        'Arecanut': 0, 'Arhar/Tur': 1, 'Bajra': 2, 'Banana': 3, 'Barley': 4,
-        'Black pepper': 5, 'Cardamom': 6, 'Cashewnut': 7, 'Castor seed': 8,
-        'Coconut ': 9, 'Coriander': 10, 'Cotton(lint)': 11, 'Cowpea(Lobia)': 12,
-        'Dry chillies': 13, 'Garlic': 14, 'Ginger': 15, 'Gram': 16,
-        'Groundnut': 17, 'Guar seed': 18, 'Horse-gram': 19, 'Jowar': 20,
-        'Jute': 21, 'Khesari': 22, 'Linseed': 23, 'Maize': 24,
-        'Masoor': 25, 'Mesta': 26, 'Moong(Green Gram)': 27, 'Moth': 28,
-        'Niger seed': 29, 'Oilseeds total': 30, 'Onion': 31,
-        'Other  Rabi pulses': 32, 'Other Cereals': 33, 'Other Kharif pulses': 34,
-        'Other Summer Pulses': 35, 'Peas & beans (Pulses)': 36,
-        'Potato': 37, 'Ragi': 38, 'Rapeseed &Mustard': 39, 'Rice': 40,
-        'Safflower': 41, 'Sannhamp': 42, 'Sesamum': 43, 'Small millets': 44,
-        'Soyabean': 45, 'Sugarcane': 46, 'Sunflower': 47, 'Sweet potato': 48,
-        'Tapioca': 49, 'Tobacco': 50, 'Turmeric': 51, 'Urad': 52,
-        'Wheat': 53, 'other oilseeds': 54
-    }
-
-    # Define typical yield ranges for different crops (tons/hectare)
-    crop_yield_ranges = {
-        # High-yield crops
-        'Sugarcane': {'low': 0, 'moderate': 40, 'high': 70},
-        'Banana': {'low': 0, 'moderate': 15, 'high': 30},
-        'Sweet potato': {'low': 0, 'moderate': 8, 'high': 15},
-        'Potato': {'low': 0, 'moderate': 10, 'high': 20},
-        'Tapioca': {'low': 0, 'moderate': 12, 'high': 25},
-
-        # Medium-yield crops
-        'Rice': {'low': 0, 'moderate': 3, 'high': 6},
-        'Wheat': {'low': 0, 'moderate': 2.5, 'high': 5},
-        'Maize': {'low': 0, 'moderate': 3, 'high': 7},
-        'Onion': {'low': 0, 'moderate': 15, 'high': 30},
-        'Garlic': {'low': 0, 'moderate': 5, 'high': 10},
-        'Ginger': {'low': 0, 'moderate': 7, 'high': 15},
-        'Turmeric': {'low': 0, 'moderate': 5, 'high': 10},
-
-        # Spice crops
-        'Cardamom': {'low': 0, 'moderate': 0.15, 'high': 0.25},
-        'Black pepper': {'low': 0, 'moderate': 0.5, 'high': 2.0},
-        'Coriander': {'low': 0, 'moderate': 0.8, 'high': 1.5},
-
-        # Low-yield crops
-        'Groundnut': {'low': 0, 'moderate': 1, 'high': 2.5},
-        'Soyabean': {'low': 0, 'moderate': 1.2, 'high': 2.5},
-        'Sunflower': {'low': 0, 'moderate': 0.8, 'high': 1.5},
-        'Cotton(lint)': {'low': 0, 'moderate': 0.5, 'high': 1.5},
-        'Tobacco': {'low': 0, 'moderate': 1, 'high': 2}
-    }
-
-    # Default yield range for crops not in the specific list
-    default_yield_range = {'low': 0, 'moderate': 1.5, 'high': 3}
-
-    # Define crop-specific base yield values (tons/ha)
-    crop_base_yields = {
-        'Sugarcane': 60.0,
-        'Banana': 25.0,
-        'Sweet potato': 12.0,
-        'Potato': 15.0,
-        'Tapioca': 20.0,
-        'Rice': 4.5,
-        'Wheat': 3.5,
-        'Maize': 5.0,
-        'Onion': 20.0,
-        'Garlic': 8.0,
-        'Ginger': 12.0,
-        'Turmeric': 7.0,
-        'Cardamom': 0.2,
-        'Black pepper': 1.5,
-        'Cashewnut': 1.2,
-        'Coconut ': 10.0,
-        'Groundnut': 2.0,
-        'Soyabean': 1.8,
-        'Cotton(lint)': 1.0,
-    }
-
-    # Default base yield for crops not in the specific list
-    default_base_yield = 2.0
-
-    state_map = {
-        'Andhra Pradesh': 0, 'Arunachal Pradesh': 1, 'Assam': 2, 'Bihar': 3,
-        'Chhattisgarh': 4, 'Delhi': 5, 'Goa': 6, 'Gujarat': 7, 'Haryana': 8,
-        'Himachal Pradesh': 9, 'Jammu and Kashmir': 10, 'Jharkhand': 11,
-        'Karnataka': 12, 'Kerala': 13, 'Madhya Pradesh': 14, 'Maharashtra': 15,
-        'Manipur': 16, 'Meghalaya': 17, 'Mizoram': 18, 'Nagaland': 19,
-        'Odisha': 20, 'Puducherry': 21, 'Punjab': 22, 'Sikkim': 23,
-        'Tamil Nadu': 24, 'Telangana': 25, 'Tripura': 26, 'Uttar Pradesh': 27,
-        'Uttarakhand': 28, 'West Bengal': 29
-    }
-
-    # States known for high productivity of specific crops
-    crop_state_bonuses = {
-        'Cardamom': ['Kerala', 'Karnataka', 'Tamil Nadu'],
-        'Black pepper': ['Kerala', 'Karnataka', 'Tamil Nadu'],
-        'Rice': ['West Bengal', 'Punjab', 'Uttar Pradesh', 'Bihar'],
-        'Wheat': ['Punjab', 'Haryana', 'Uttar Pradesh'],
-        'Sugarcane': ['Uttar Pradesh', 'Maharashtra', 'Karnataka']
-    }
-
     # Create reverse mapping for displaying state names
     state_names_by_index = {v: k for k, v in state_map.items()}
 
@@ -233,98 +86,34 @@ def show():
     with col2:
         organic_carbon = st.slider("Organic Carbon (%)", min_value=0.1, max_value=10.0, value=default_organic_carbon, step=0.1)
 
-    # Encode categorical inputs
-    encoded_crop = crop_map[selected_crop]
-    encoded_state = state_map[selected_state]
-
-    # Prepare input in the correct order (9 features)
-    # Create a dataframe with named features to avoid scikit-learn warnings
-    feature_names = ['crop_id', 'state_id', 'area', 'pesticide',
-                    'temperature', 'humidity', 'rainfall', 'soil_pH', 'organic_carbon']
-    input_df = pd.DataFrame([[encoded_crop, encoded_state, area, pesticide,
-                              temperature, humidity, rainfall, soil_pH, organic_carbon]],
-                              columns=feature_names)
+    # One sample in the same shape the batch yield predictor takes
+    sample = {
+        "crop": selected_crop, "state": selected_state, "area": area, "pesticide": pesticide,
+        "temperature": temperature, "humidity": humidity, "rainfall": rainfall,
+        "soil_pH": soil_pH, "organic_carbon": organic_carbon
+    }
 
     # Predict yield
     if st.button("🚜 Predict Yield"):
         try:
-            # Get base yield for the crop
-            base_yield = crop_base_yields.get(selected_crop, default_base_yield)
-
-            # Check if the state is known for this crop (apply bonus if yes)
-            state_bonus = 1.2 if selected_state in crop_state_bonuses.get(selected_crop, []) else 1.0
-
-            # Try using the model
-            use_backup_calculation = False
-            try:
-                # Get a random factor to ensure variability if using backup model (1.0 to 1.5)
-                random_factor = 1.0 + (0.5 * np.random.random()) if isinstance(model, RandomForestRegressor) else 1.0
-
-                # Make prediction with model using named features
-                prediction_raw = model.predict(input_df)
-
-                # If prediction is too low (less than 0.1), use backup calculation
-                if prediction_raw[0] < 0.1:
-                    use_backup_calculation = True
-
-            except Exception:
-                use_backup_calculation = True
-
-            # Apply adjustments based on actual values compared to defaults
-            # More favorable conditions lead to higher yields
-
-            # Temperature adjustment - most crops do well in 20-30°C range
-            temp_opt = 25
-            temp_factor = 1 - min(abs(temperature - temp_opt) / 15, 0.3)
-
-            # Rainfall adjustment
-            rainfall_factor = min(rainfall / 1000, 1.3)  # More rainfall generally better up to a point
-
-            # pH adjustment - most crops do well in 5.5-7.5 range
-            ph_opt = 6.5
-            ph_factor = 1 - min(abs(soil_pH - ph_opt) / 3, 0.2)
-
-            # Organic carbon adjustment (higher is better up to a point)
-            oc_factor = min(1.0 + (organic_carbon / 20), 1.3)
-
-            # Area effect (diminishing returns for larger areas)
-            area_factor = 1.0 if area <= 10 else 0.9
-
-            # Apply all adjustments
-            adjustment = temp_factor * rainfall_factor * ph_factor * oc_factor * area_factor * state_bonus
-
-            # Final prediction depends on whether we're using the model or backup calculation
-            if use_backup_calculation:
-                prediction_value = base_yield * adjustment
-            else:
-                prediction_value = prediction_raw[0] * adjustment * random_factor
-
-            # Make sure prediction is positive and realistic
-            prediction_value = max(prediction_value, base_yield * 0.3)  # At least 30% of base yield
-
-            # Special handling for cardamom
-            if selected_crop == "Cardamom":
-                # Cardamom yields are typically 0.15-0.25 tons/ha in good conditions
-                prediction_value = max(0.15, min(prediction_value, 0.35))
-
-                # Kerala, Karnataka and Tamil Nadu are best for cardamom
-                if selected_state in ["Kerala", "Karnataka", "Tamil Nadu"]:
-                    prediction_value *= 1.2  # 20% boost for suitable regions
+            # Model prediction plus all adjustment factors (shared with the batch yield tables),
+            # through the prediction service when one is configured
+            result = prediction_client.yield_(sample)
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+            if result["model"] == "yield_backup":
+                st.info("Yield model could not be loaded - using a backup simple model for demonstration purposes.")
+            temp_factor = result["temp_factor"]
+            rainfall_factor = result["rainfall_factor"]
+            ph_factor = result["ph_factor"]
+            oc_factor = result["oc_factor"]
+            state_bonus = result["state_bonus"]
+            prediction_value = result["predicted_yield"]
+            yield_level = result["yield_level"]
 
             # Display the prediction
             st.success(f"🌾 Estimated Yield: {prediction_value:.2f} tons/ha")
 
-            # Get appropriate yield ranges for this crop
-            yield_range = crop_yield_ranges.get(selected_crop, default_yield_range)
-
-            # Determine yield level based on crop-specific thresholds
-            if prediction_value >= yield_range['high']:
-                yield_level = "high"
-            elif prediction_value >= yield_range['moderate']:
-                yield_level = "moderate"
-            else:
-                yield_level = "low"
-
             st.info(f"This is considered a {yield_level} yield for {selected_crop} in {selected_state}.")
 
             # Show detailed factors affecting the yield
@@ -359,43 +148,6 @@ def show():
             st.error(f"Error during prediction: {str(e)}")
             st.info("Please make sure all input values are appropriate for yield prediction.")
 
-def create_backup_model():
-    """Create a simple backup model for demonstration purposes"""
-    # This model will generate more realistic yield predictions with variability
-    model = RandomForestRegressor(n_estimators=10, random_state=42)
-
-    # Create synthetic training data - very simple
-    # Features: crop_id, state_id, area, pesticide, temp, humidity, rainfall, pH, organic_carbon
-    X = np.random.rand(100, 9)
-    X[:, 0] = np.random.randint(0, 55, size=100)  # crop_id
-    X[:, 1] = np.random.randint(0, 30, size=100)  # state_id
-
-    # Generate synthetic yields based on features - fixed multiline syntax
-    y = (2.0
-        + X[:, 2] * 0.2    # area
-        + X[:, 3] * 0.1    # pesticide
-        + np.sin((X[:, 4] - 0.5) * 3) * 2    # temperature effect (optimal in middle)
-        + X[:, 5] * 2      # humidity
-        + X[:, 6] * 3      # rainfall
-        + np.sin((X[:, 7] - 0.5) * 6) * 1    # pH effect (optimal in middle)
-        + X[:, 8] * 1)     # organic carbon
-
-    # Add some crop-specific effects (e.g., sugarcane high yield, groundnut low yield)
-    for i in range(len(y)):
-        crop_id = int(X[i, 0])
-        if crop_id in [3, 37, 46, 48, 49]:  # Banana, Potato, Sugarcane, Sweet potato, Tapioca
-            y[i] *= 10  # High-yield crops
-        elif crop_id in [17, 45, 47, 11, 50]:  # Groundnut, Soyabean, Sunflower, Cotton, Tobacco
-            y[i] *= 0.5  # Low-yield crops
-        elif crop_id == 6:  # Cardamom
-            y[i] = 0.2  # Typical cardamom yield
-        elif crop_id == 5:  # Black pepper
-            y[i] = 1.5  # Typical black pepper yield
-
-    # Fit the model
-    model.fit(X, y)
-    return model
-
 def get_recommendations(crop, state, yield_level, temperature, rainfall, soil_pH):
     """Generate recommendations based on crop, state and yield level."""
     recommendations = []